@@ -23,6 +23,7 @@ if config.config_file_name is not None:
 from app.database import Base
 from app.models.user import User, FcmToken  # noqa: F401
 from app.models.device import Device, SensorLog, DeviceAssignment  # noqa: F401
+from app.models.rollup import SensorRollupHourly, SensorRollupDaily  # noqa: F401
 
 target_metadata = Base.metadata
 
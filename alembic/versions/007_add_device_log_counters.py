@@ -0,0 +1,52 @@
+"""add log_count / alert_count counters to devices
+
+Revision ID: 007_device_log_counters
+Revises: 006_light_level
+Create Date: 2026-10-19
+
+Adds per-device counters for sensor_logs so paginated log/alert
+endpoints can report a total without SELECT count(*) per request.
+
+The counters are maintained by the application: a Session after_flush
+listener (app/models/device.py) increments them with one UPDATE per
+flush for all new SensorLog rows, and the retention cleanup (admin
+endpoint, partition retention and scripts/cleanup_logs.sh) decrements
+them in the same transaction as the DELETE. Bulk and Core inserts
+bypass the listener.
+
+The backfill is a single grouped scan of sensor_logs.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '007_device_log_counters'
+down_revision: Union[str, None] = '006_light_level'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('devices', sa.Column('log_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('devices', sa.Column('alert_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute("""
+        UPDATE devices AS d
+        SET log_count = c.log_count,
+            alert_count = c.alert_count
+        FROM (
+            SELECT device_id,
+                   count(*) AS log_count,
+                   count(*) FILTER (WHERE is_alert) AS alert_count
+            FROM sensor_logs
+            GROUP BY device_id
+        ) AS c
+        WHERE d.id = c.device_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('devices', 'alert_count')
+    op.drop_column('devices', 'log_count')
@@ -0,0 +1,65 @@
+"""add sensor_rollup_hourly and sensor_rollup_daily tables
+
+Revision ID: 008_sensor_rollups
+Revises: 007_device_log_counters
+Create Date: 2026-10-19
+
+Per-device hourly and daily aggregates of sensor_logs. Each row holds the
+sample count, the alert count, and count/sum/min/max for every metric.
+A Session after_flush listener (app/models/rollup.py) keeps them up to
+date with one multi-row INSERT ... ON CONFLICT DO UPDATE per table per
+flush. Bulk and Core inserts bypass it. /devices/{id}/stats/daily reads
+the daily table instead of running GROUP BY over raw rows.
+
+After upgrading, fill the tables from existing data:
+
+    python -m app.core.rollups
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+
+revision: str = '008_sensor_rollups'
+down_revision: Union[str, None] = '007_device_log_counters'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+METRICS = ("temperature", "humidity", "ammonia")
+
+
+def _metric_columns() -> list:
+    columns = [
+        sa.Column('sample_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('alert_count', sa.Integer(), nullable=False, server_default='0'),
+    ]
+    for metric in METRICS:
+        columns += [
+            sa.Column(f'{metric}_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column(f'{metric}_sum', sa.Float(), nullable=False, server_default='0'),
+            sa.Column(f'{metric}_min', sa.Float(), nullable=True),
+            sa.Column(f'{metric}_max', sa.Float(), nullable=True),
+        ]
+    return columns
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sensor_rollup_hourly',
+        sa.Column('device_id', UUID(as_uuid=True), sa.ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('bucket', sa.DateTime(timezone=True), primary_key=True),
+        *_metric_columns(),
+    )
+    op.create_table(
+        'sensor_rollup_daily',
+        sa.Column('device_id', UUID(as_uuid=True), sa.ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        *_metric_columns(),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('sensor_rollup_daily')
+    op.drop_table('sensor_rollup_hourly')
@@ -0,0 +1,152 @@
+"""partition sensor_logs by month on timestamp
+
+Revision ID: 009_partition_sensor_logs
+Revises: 008_sensor_rollups
+Create Date: 2026-10-19
+
+Converts sensor_logs into a PostgreSQL range-partitioned table
+(PARTITION BY RANGE (timestamp)) with one partition per UTC month,
+named sensor_logs_YYYY_MM, plus sensor_logs_default for anything
+outside the existing ranges.
+
+- The primary key becomes (id, timestamp), because the partition key
+  must be part of every unique constraint. id keeps using the existing
+  sequence, so ids stay unique and keep increasing.
+- timestamp becomes NOT NULL. Legacy rows without a timestamp get now().
+- Partitions are created from the oldest existing month up to
+  3 months ahead. The app creates later months automatically
+  (app/core/partitions.py, SENSOR_LOG_PARTITION_MONTHS_AHEAD).
+- Retention (admin cleanup, scripts/cleanup_logs.sh) then drops whole
+  partitions instead of deleting rows in batches.
+
+Existing rows are copied into the new table, so the upgrade takes time
+proportional to the table size and holds an exclusive lock on
+sensor_logs meanwhile. Stop the MQTT worker while it runs.
+
+Other dialects (SQLite in tests) are left unchanged.
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '009_partition_sensor_logs'
+down_revision: Union[str, None] = '008_sensor_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+COLUMNS = "id, device_id, temperature, humidity, ammonia, light_level, is_alert, alert_message"
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    op.execute("CREATE INDEX ix_sensor_logs_id ON sensor_logs (id)")
+    op.execute("CREATE INDEX ix_sensor_logs_device_id ON sensor_logs (device_id)")
+    op.execute("CREATE INDEX ix_sensor_logs_timestamp ON sensor_logs (timestamp)")
+    op.execute("CREATE INDEX ix_sensor_logs_device_timestamp ON sensor_logs (device_id, timestamp DESC)")
+
+
+def _drop_indexes() -> None:
+    for name in ("ix_sensor_logs_id", "ix_sensor_logs_device_id", "ix_sensor_logs_timestamp", "ix_sensor_logs_device_timestamp"):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    # Tabel lama disingkirkan dulu; nama index/constraint dibebaskan untuk tabel baru
+    op.execute("LOCK TABLE sensor_logs IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE sensor_logs RENAME TO sensor_logs_legacy")
+    op.execute("ALTER TABLE sensor_logs_legacy RENAME CONSTRAINT sensor_logs_pkey TO sensor_logs_legacy_pkey")
+    op.execute("ALTER TABLE sensor_logs_legacy RENAME CONSTRAINT sensor_logs_device_id_fkey TO sensor_logs_legacy_device_id_fkey")
+    _drop_indexes()
+    op.execute("ALTER SEQUENCE sensor_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE sensor_logs (
+            id integer NOT NULL DEFAULT nextval('sensor_logs_id_seq'),
+            device_id uuid,
+            temperature double precision,
+            humidity double precision,
+            ammonia double precision,
+            light_level integer,
+            is_alert boolean,
+            alert_message varchar,
+            timestamp timestamptz NOT NULL DEFAULT now(),
+            CONSTRAINT sensor_logs_pkey PRIMARY KEY (id, timestamp),
+            CONSTRAINT sensor_logs_device_id_fkey FOREIGN KEY (device_id)
+                REFERENCES devices (id) ON DELETE CASCADE
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE sensor_logs_id_seq OWNED BY sensor_logs.id")
+
+    oldest = bind.execute(sa.text("SELECT min(timestamp) FROM sensor_logs_legacy")).scalar()
+    now = datetime.now(timezone.utc)
+    month = date((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(date(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        upper = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE sensor_logs_{month:%Y_%m} PARTITION OF sensor_logs "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+        )
+        month = upper
+    op.execute("CREATE TABLE sensor_logs_default PARTITION OF sensor_logs DEFAULT")
+
+    op.execute(f"""
+        INSERT INTO sensor_logs ({COLUMNS}, timestamp)
+        SELECT {COLUMNS}, COALESCE(timestamp, now()) FROM sensor_logs_legacy
+    """)
+    op.execute("DROP TABLE sensor_logs_legacy")
+
+    # Index dibuat setelah copy (lebih cepat daripada maintain index per baris)
+    _create_indexes()
+    op.execute("ANALYZE sensor_logs")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+
+    op.execute("LOCK TABLE sensor_logs IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE sensor_logs RENAME TO sensor_logs_partitioned")
+    op.execute("ALTER TABLE sensor_logs_partitioned RENAME CONSTRAINT sensor_logs_pkey TO sensor_logs_partitioned_pkey")
+    op.execute("ALTER TABLE sensor_logs_partitioned RENAME CONSTRAINT sensor_logs_device_id_fkey TO sensor_logs_partitioned_device_id_fkey")
+    _drop_indexes()
+    op.execute("ALTER SEQUENCE sensor_logs_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE sensor_logs (
+            id integer NOT NULL DEFAULT nextval('sensor_logs_id_seq'),
+            device_id uuid,
+            temperature double precision,
+            humidity double precision,
+            ammonia double precision,
+            light_level integer,
+            is_alert boolean,
+            alert_message varchar,
+            timestamp timestamptz DEFAULT now(),
+            CONSTRAINT sensor_logs_pkey PRIMARY KEY (id),
+            CONSTRAINT sensor_logs_device_id_fkey FOREIGN KEY (device_id)
+                REFERENCES devices (id) ON DELETE CASCADE
+        )
+    """)
+    op.execute("ALTER SEQUENCE sensor_logs_id_seq OWNED BY sensor_logs.id")
+    op.execute(f"""
+        INSERT INTO sensor_logs ({COLUMNS}, timestamp)
+        SELECT {COLUMNS}, timestamp FROM sensor_logs_partitioned
+    """)
+    # DROP tabel partisi ikut menghapus semua partisinya
+    op.execute("DROP TABLE sensor_logs_partitioned")
+    _create_indexes()
+    op.execute("ANALYZE sensor_logs")
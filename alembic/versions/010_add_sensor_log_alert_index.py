@@ -0,0 +1,79 @@
+"""add partial alert index on sensor_logs (device_id, timestamp DESC, id DESC) WHERE is_alert
+
+Revision ID: 010_alert_index
+Revises: 009_partition_sensor_logs
+Create Date: 2026-10-19
+
+Alerts are rare, so the alert listing used to walk a device's whole
+history to find them. This partial index covers only the alert rows,
+in the exact order /devices/{id}/alerts pages by (timestamp DESC,
+id DESC). Keyset paging becomes an index range scan whose cost does
+not depend on total log volume.
+
+The index is built with CREATE INDEX CONCURRENTLY, outside the
+migration transaction, so ingest is not blocked. A partitioned
+sensor_logs (migration 009) cannot be indexed concurrently in one
+step. In that case the parent index is created ON ONLY (invalid).
+Each partition is then indexed concurrently and attached. Once all
+partitions are attached, the parent index becomes valid. Partitions
+created later inherit the index automatically.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '010_alert_index'
+down_revision: Union[str, None] = '009_partition_sensor_logs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX_NAME = "ix_sensor_logs_device_alerts"
+INDEX_COLUMNS = "(device_id, timestamp DESC, id DESC) WHERE is_alert"
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.create_index(
+            INDEX_NAME, "sensor_logs", ["device_id", sa.text("timestamp DESC"), sa.text("id DESC")],
+            sqlite_where=sa.text("is_alert = 1"),
+        )
+        return
+
+    partitions = bind.execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('sensor_logs')"
+    )).scalars().all()
+    partitioned = bool(bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('sensor_logs')"
+    )).scalar())
+
+    with op.get_context().autocommit_block():
+        if not partitioned:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} ON sensor_logs {INDEX_COLUMNS}")
+            return
+
+        op.execute(f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON ONLY sensor_logs {INDEX_COLUMNS}")
+        for partition in partitions:
+            child_index = f"{partition}_alerts_idx"
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child_index} ON {partition} {INDEX_COLUMNS}")
+            op.execute(f"ALTER INDEX {INDEX_NAME} ATTACH PARTITION {child_index}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.drop_index(INDEX_NAME, table_name="sensor_logs")
+        return
+
+    partitioned = bool(bind.execute(sa.text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('sensor_logs')"
+    )).scalar())
+    if partitioned:
+        # DROP INDEX CONCURRENTLY tidak didukung untuk index partisi; index partisi ikut terhapus
+        op.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+    else:
+        with op.get_context().autocommit_block():
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}")
@@ -0,0 +1,40 @@
+"""add row_version to devices
+
+Revision ID: 011_device_row_version
+Revises: 010_alert_index
+Create Date: 2026-10-19
+
+Adds a per-device content version. The application bumps it when a
+field shown in responses changes: rename, MAC address, claim and
+unclaim (a before_update listener on Device). The partition retention,
+scripts/cleanup_logs.sh, the admin cleanup and the rollup rebuild bump
+it explicitly. Heartbeats and the log/alert counter increments made on
+every sensor log insert do not touch it.
+
+Read endpoints (/devices/, /devices/{id}/status, /devices/{id}/stats/daily)
+derive their ETag from this version, combined with a heartbeat
+truncated to the online-timeout window (list, status) or the log
+count (stats). An unchanged poll is answered with 304 Not Modified
+after one small query, without building the response body.
+
+Adding a column with a constant default is a metadata-only change on
+PostgreSQL 11+, so no table rewrite happens.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '011_device_row_version'
+down_revision: Union[str, None] = '010_alert_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('devices', sa.Column('row_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('devices', 'row_version')
@@ -0,0 +1,157 @@
+"""
+Agregasi data sensor per bucket waktu (5 menit s/d 1 bulan).
+
+Sumber data dipilih yang paling kasar tapi masih cukup untuk bucket & agregat
+yang diminta (lihat choose_source):
+    daily  — rollup per hari, untuk bucket kelipatan hari (1d, 1w, 1mo)
+    hourly — rollup per jam, untuk bucket kelipatan jam (1h, 6h, 12h)
+    raw    — sensor_logs mentah, untuk bucket < 1 jam atau agregat persentil
+
+Rollup menyimpan count/sum/min/max per metrik, sehingga bucket besar bisa
+dirakit dari bucket kecil tanpa kehilangan presisi. Penggabungan dilakukan
+vectorized dengan NumPy (bincount / fmin.at / fmax.at), jadi biaya per request
+sebanding dengan jumlah baris sumber, bukan jumlah reading mentah.
+"""
+
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Ukuran bucket (detik). None = bulan kalender (UTC).
+BUCKET_SECONDS = {
+    "5m": 300,
+    "15m": 900,
+    "30m": 1800,
+    "1h": 3600,
+    "6h": 6 * 3600,
+    "12h": 12 * 3600,
+    "1d": 86400,
+    "1w": 7 * 86400,
+    "1mo": None,
+}
+
+BASIC_AGGS = ("avg", "min", "max", "count")
+_PERCENTILE = re.compile(r"^p(\d{1,2})$")
+
+# Epoch 0 jatuh pada hari Kamis; bucket mingguan dimulai Senin (ISO)
+_WEEK_OFFSET = 4 * 86400
+
+
+def parse_aggs(values: Sequence[str]) -> List[str]:
+    """Validasi nama agregat: avg/min/max/count atau persentil p1..p99. Raise ValueError jika tidak valid."""
+    aggs = []
+    for value in values:
+        match = _PERCENTILE.match(value)
+        if value not in BASIC_AGGS and not (match and 1 <= int(match.group(1)) <= 99):
+            raise ValueError(value)
+        if value not in aggs:
+            aggs.append(value)
+    return aggs
+
+
+def choose_source(bucket: str, aggs: Sequence[str]) -> str:
+    """Sumber data paling kasar yang masih memenuhi bucket & agregat: daily, hourly, atau raw."""
+    if any(_PERCENTILE.match(agg) for agg in aggs):
+        # Persentil tidak bisa dirakit dari count/sum/min/max
+        return "raw"
+    seconds = BUCKET_SECONDS[bucket]
+    if seconds is None or seconds % 86400 == 0:
+        return "daily"
+    if seconds % 3600 == 0:
+        return "hourly"
+    return "raw"
+
+
+def bucket_start(epoch_s: np.ndarray, bucket: str) -> np.ndarray:
+    """Awal bucket (epoch detik, UTC) untuk setiap timestamp."""
+    epoch_s = np.asarray(epoch_s, dtype=np.int64)
+    seconds = BUCKET_SECONDS[bucket]
+    if seconds is None:
+        months = epoch_s.astype("datetime64[s]").astype("datetime64[M]")
+        return months.astype("datetime64[s]").astype(np.int64)
+    if bucket == "1w":
+        return (epoch_s - _WEEK_OFFSET) // seconds * seconds + _WEEK_OFFSET
+    return epoch_s // seconds * seconds
+
+
+def raw_partials(values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Ubah reading mentah (NaN = NULL) ke bentuk partial count/sum/min/max + values untuk persentil."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    return {
+        "count": valid.astype(np.float64),
+        "sum": np.where(valid, values, 0.0),
+        "min": values,
+        "max": values,
+        "values": values,
+    }
+
+
+def _percentiles(inverse: np.ndarray, values: np.ndarray, groups: int, q: float) -> np.ndarray:
+    """Persentil per grup (interpolasi linear, sama dengan np.percentile) tanpa loop per grup."""
+    valid = ~np.isnan(values)
+    inverse, values = inverse[valid], values[valid]
+    order = np.lexsort((values, inverse))
+    sorted_values = values[order]
+    counts = np.bincount(inverse, minlength=groups)
+    starts = np.cumsum(counts) - counts
+
+    result = np.full(groups, np.nan)
+    has_data = counts > 0
+    position = q / 100.0 * (counts[has_data] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.ceil(position).astype(np.int64)
+    base = starts[has_data]
+    low_values = sorted_values[base + lower]
+    high_values = sorted_values[base + upper]
+    result[has_data] = low_values + (high_values - low_values) * (position - lower)
+    return result
+
+
+def _to_list(values: np.ndarray, has_data: np.ndarray) -> list:
+    return [round(float(v), 4) if ok else None for v, ok in zip(values, has_data)]
+
+
+def aggregate_buckets(epoch_s: np.ndarray, bucket: str, metrics: Dict[str, Dict[str, np.ndarray]], aggs: Sequence[str]) -> dict:
+    """
+    Gabungkan baris sumber (raw atau rollup) ke bucket yang diminta.
+
+    Args:
+        epoch_s: Timestamp / awal bucket sumber per baris (epoch detik)
+        metrics: {metrik: {"count", "sum", "min", "max"[, "values"]}} — array sepanjang epoch_s.
+                 "values" (reading mentah) wajib jika aggs berisi persentil.
+        aggs: Nama agregat (lihat parse_aggs)
+
+    Returns:
+        {"t": [awal bucket, epoch ms], "series": {metrik: {agg: [nilai|None]}}}.
+        Hanya bucket yang punya baris sumber yang dikembalikan; nilai None = tidak ada reading non-NULL.
+    """
+    if len(epoch_s) == 0:
+        return {"t": [], "series": {metric: {agg: [] for agg in aggs} for metric in metrics}}
+
+    starts, inverse = np.unique(bucket_start(epoch_s, bucket), return_inverse=True)
+    groups = len(starts)
+
+    series = {}
+    for metric, parts in metrics.items():
+        counts = np.bincount(inverse, weights=parts["count"], minlength=groups)
+        has_data = counts > 0
+        result = {}
+        for agg in aggs:
+            if agg == "count":
+                result[agg] = [int(c) for c in counts]
+                continue
+            if agg == "avg":
+                sums = np.bincount(inverse, weights=parts["sum"], minlength=groups)
+                values = np.divide(sums, counts, out=np.zeros(groups), where=has_data)
+            elif agg in ("min", "max"):
+                reduce = np.fmin if agg == "min" else np.fmax
+                values = np.full(groups, np.nan)
+                reduce.at(values, inverse, np.asarray(parts[agg], dtype=np.float64))
+            else:
+                values = _percentiles(inverse, parts["values"], groups, float(agg[1:]))
+            result[agg] = _to_list(values, has_data)
+        series[metric] = result
+
+    return {"t": [int(s) * 1000 for s in starts], "series": series}
@@ -0,0 +1,177 @@
+"""
+Cache principal (identitas user) dan hak akses device.
+
+Principal adalah snapshot ringan dari baris User (id, email, role, is_active)
+— cukup untuk keputusan autentikasi/otorisasi tanpa hydrate ORM object.
+get_current_user mengembalikan AuthenticatedUser di atas principal ini; baris
+User lengkap baru di-query jika handler memang membutuhkannya.
+
+Hak akses device disimpan sebagai peta per user {device_id: level} yang
+di-load dengan satu query saat pertama dipakai. Setelah itu setiap cek akses
+(HTTP maupun WebSocket) cukup satu lookup dict.
+"""
+
+from typing import NamedTuple, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import literal, select
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.models.device import Device, DeviceAssignment
+from app.models.user import User, UserRole
+
+
+class Principal(NamedTuple):
+    id: UUID
+    email: str
+    role: str
+    is_active: bool
+
+
+principal_cache = TTLCache(ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+# Level akses device. "owner" = admin pemilik (dan super_admin untuk semua device);
+# "operator"/"viewer" = role pada DeviceAssignment.
+ACCESS_OWNER = "owner"
+
+# (user_id, role) -> {device_id: level}. super_admin tidak dimaterialisasi (akses semua).
+# Role ikut jadi bagian key agar perubahan role tidak memakai peta lama.
+device_acl_cache = TTLCache(ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def load_principal(user_id: UUID, db: Session) -> Optional[Principal]:
+    """Ambil principal dari cache, atau dari DB (hanya 4 kolom) jika belum ada."""
+    principal = principal_cache.get(user_id)
+    if principal is not MISSING:
+        return principal
+
+    row = db.query(User.id, User.email, User.role, User.is_active).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    principal = Principal(id=row.id, email=row.email, role=row.role, is_active=bool(row.is_active))
+    principal_cache.set(user_id, principal)
+    return principal
+
+
+class AuthenticatedUser:
+    """
+    User yang sedang login, dibangun dari Principal (cache) tanpa query.
+
+    id/email/role/is_active dibaca langsung dari principal. Atribut lain
+    (full_name, picture, ...) memicu load baris User lengkap satu kali lewat
+    session request. Handler yang mengubah/menghapus user harus memakai .orm.
+    """
+
+    __slots__ = ("_principal", "_db", "_orm")
+
+    def __init__(self, principal: Principal, db: Session):
+        self._principal = principal
+        self._db = db
+        self._orm = None
+
+    @property
+    def id(self) -> UUID:
+        return self._principal.id
+
+    @property
+    def email(self) -> str:
+        return self._principal.email
+
+    @property
+    def role(self) -> str:
+        return self._principal.role
+
+    @property
+    def is_active(self) -> bool:
+        return self._principal.is_active
+
+    @property
+    def principal(self) -> Principal:
+        return self._principal
+
+    @property
+    def orm(self) -> User:
+        """Baris User lengkap (lazy, attached ke session request)."""
+        if self._orm is None:
+            self._orm = self._db.get(User, self._principal.id)
+            if self._orm is None:
+                # User dihapus setelah principal di-cache
+                invalidate_user(self._principal.id)
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User tidak ditemukan")
+        return self._orm
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.orm, name)
+
+    def __repr__(self) -> str:
+        return f"<AuthenticatedUser {self._principal.email} ({self._principal.role})>"
+
+
+def _acl_statement(user):
+    """Query (device_id, level) untuk peta akses user; None jika role tidak punya akses device."""
+    if user.role == UserRole.ADMIN.value:
+        return select(Device.id, literal(ACCESS_OWNER)).where(Device.user_id == user.id)
+    if user.role in [UserRole.OPERATOR.value, UserRole.VIEWER.value]:
+        return select(DeviceAssignment.device_id, DeviceAssignment.role).where(DeviceAssignment.user_id == user.id)
+    return None
+
+
+def load_device_acl(user, db: Session) -> Optional[dict]:
+    """
+    Peta {device_id: level} milik user, dari cache atau satu query.
+    Returns None untuk super_admin (akses ke semua device).
+    """
+    if user.role == UserRole.SUPER_ADMIN.value:
+        return None
+    key = (user.id, user.role)
+    acl = device_acl_cache.get(key)
+    if acl is not MISSING:
+        return acl
+    statement = _acl_statement(user)
+    acl = {device_id: level for device_id, level in db.execute(statement)} if statement is not None else {}
+    device_acl_cache.set(key, acl)
+    return acl
+
+
+async def aload_device_acl(user, db) -> Optional[dict]:
+    """Sama dengan load_device_acl, untuk ReadSession (app.database.get_read_db)."""
+    if user.role == UserRole.SUPER_ADMIN.value:
+        return None
+    key = (user.id, user.role)
+    acl = device_acl_cache.get(key)
+    if acl is not MISSING:
+        return acl
+    statement = _acl_statement(user)
+    acl = {device_id: level for device_id, level in (await db.execute(statement)).all()} if statement is not None else {}
+    device_acl_cache.set(key, acl)
+    return acl
+
+
+def device_access_level(acl: Optional[dict], device_id) -> Optional[str]:
+    """Level akses dari peta hasil load_device_acl; None = tidak punya akses."""
+    if acl is None:
+        return ACCESS_OWNER
+    return acl.get(device_id)
+
+
+def invalidate_acl(user_id: UUID) -> None:
+    """Buang peta akses device satu user (claim/unclaim/hapus device miliknya)."""
+    device_acl_cache.invalidate_where(lambda key: key[0] == user_id)
+
+
+def invalidate_user(user_id: UUID) -> None:
+    """Buang principal dan peta akses device milik satu user (role/assignment berubah)."""
+    principal_cache.invalidate(user_id)
+    invalidate_acl(user_id)
+
+
+def clear_auth_caches() -> None:
+    """Kosongkan semua cache auth (dipakai di test dan saat perubahan massal)."""
+    principal_cache.clear()
+    device_acl_cache.clear()
@@ -0,0 +1,73 @@
+"""
+TTL cache in-memory (process-local) yang thread-safe.
+
+Dipakai untuk data kecil yang sering dibaca tapi jarang berubah
+(principal user, hak akses device). Setiap worker Uvicorn punya cache
+sendiri, jadi TTL harus pendek agar perubahan di worker lain tetap
+terlihat dalam waktu singkat.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Sentinel untuk membedakan "tidak ada di cache" dari nilai None yang di-cache
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Cache key -> value dengan masa berlaku (TTL) dan batas ukuran (LRU).
+    Semua operasi dilindungi lock — aman dipanggil dari threadpool.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Ambil value jika ada dan belum expired, selain itu return default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if self._clock() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Simpan value. Entry paling lama dibuang jika cache penuh."""
+        if (ttl if ttl is not None else self.ttl) <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock() + (ttl if ttl is not None else self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Hapus semua entry yang key-nya memenuhi predicate."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
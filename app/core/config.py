@@ -16,6 +16,18 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str  # Wajib dari .env
+
+    # Pool engine sync per worker (PostgreSQL): tulis, auth cache miss, handshake/replay
+    # WebSocket, range/aggregate/alerts, dan export streaming (memegang koneksi selama download).
+    DB_POOL_SIZE: int = 3
+    DB_MAX_OVERFLOW: int = 7
+
+    # Async engine (asyncpg) untuk endpoint baca — pool terpisah dari engine sync.
+    # Hanya aktif untuk PostgreSQL jika asyncpg terpasang.
+    # Total koneksi per worker = DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW.
+    DB_ASYNC_ENABLED: bool = True
+    DB_ASYNC_POOL_SIZE: int = 3
+    DB_ASYNC_MAX_OVERFLOW: int = 4
     
     # JWT Authentication
     SECRET_KEY: str  # Wajib dari .env
@@ -39,9 +51,47 @@ class Settings(BaseSettings):
     # Default 120 detik (2 menit) — toleransi 2x interval heartbeat normal (60 detik).
     DEVICE_ONLINE_TIMEOUT_SECONDS: int = 120
     
+    # WebSocket liveness — interval ping server (detik) dan toleransi tambahan
+    # sebelum socket yang tidak membalas pong di-reap. 0 = disable ping.
+    WS_PING_INTERVAL_SECONDS: int = 30
+    WS_PING_GRACE_SECONDS: int = 30
+
+    # Batas koneksi WebSocket per user dan per worker process (0 = tanpa batas).
+    # Mencegah client yang reconnect loop menghabiskan file descriptor & poll thread.
+    WS_MAX_CONNECTIONS_PER_USER: int = 20
+    WS_MAX_CONNECTIONS_PER_PROCESS: int = 2000
+
+    # Cache principal user & hak akses device (detik, per worker process).
+    # Pendek agar perubahan role/assignment di worker lain cepat terlihat. 0 = disable.
+    AUTH_CACHE_TTL_SECONDS: int = 10
+
+    # Verifikasi Firebase ID token lokal (sertifikat Google di-cache sesuai max-age).
+    # PROJECT_ID kosong = ambil dari firebase-adminsdk.json. TOKEN_CACHE = lama token
+    # yang sudah terverifikasi di-cache (detik, tidak melewati exp token). 0 = disable.
+    FIREBASE_PROJECT_ID: str = ""
+    FIREBASE_TOKEN_CACHE_SECONDS: int = 300
+
+    # TTL cache total pagination untuk endpoint dengan count mode "cached" (detik).
+    PAGINATION_COUNT_CACHE_SECONDS: int = 30
+
+    # Cache statistik harian untuk hari yang sudah selesai (UTC) — per (device, hari).
+    # SIZE = jumlah entry LRU in-memory (0 = disable). PATH = file SQLite opsional
+    # agar cache bertahan saat restart ("" = hanya in-memory). Hari dianggap final
+    # FINAL_AFTER_MINUTES menit setelah tengah malam UTC (toleransi data terlambat).
+    DAILY_STATS_CACHE_SIZE: int = 20000
+    DAILY_STATS_CACHE_PATH: str = ""
+    DAILY_STATS_FINAL_AFTER_MINUTES: int = 15
+
     # Data Retention — berapa hari sensor logs disimpan sebelum dihapus otomatis.
     # Default 365 hari (1 tahun). Set 0 untuk disable (simpan selamanya).
     SENSOR_LOG_RETENTION_DAYS: int = 365
+
+    # Partisi bulanan sensor_logs (PostgreSQL, setelah migration 009): jumlah bulan
+    # ke depan yang partisinya dibuat otomatis, dan interval pengecekannya (detik).
+    # DETACH_ONLY = partisi kadaluarsa hanya di-detach (untuk diarsip), tidak di-drop.
+    SENSOR_LOG_PARTITION_MONTHS_AHEAD: int = 3
+    SENSOR_LOG_PARTITION_CHECK_SECONDS: int = 21600
+    SENSOR_LOG_RETENTION_DETACH_ONLY: bool = False
     
     # Admin Seed - Email yang otomatis dijadikan admin saat pertama kali login
     # Digunakan untuk bootstrap admin pertama (chicken-and-egg problem)
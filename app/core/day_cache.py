@@ -0,0 +1,162 @@
+"""
+Cache statistik harian per (device, hari) untuk hari yang sudah selesai.
+
+Rollup hari yang sudah lewat tidak berubah lagi, jadi hasilnya cukup dihitung
+sekali. Entry disimpan di LRU in-memory (per worker process) dan — jika
+DAILY_STATS_CACHE_PATH diisi — juga di file SQLite agar bertahan saat restart
+dan bisa dipakai bersama oleh beberapa worker.
+
+Value berupa dict field DailyTemperatureStats, atau None untuk hari tanpa data
+(supaya hari kosong juga tidak di-query ulang). Key menyertakan versi device
+(Device.row_version): rebuild rollup menaikkan versi itu, jadi entry lama — termasuk
+None yang tersimpan sebelum backfill — otomatis tidak terpakai di semua worker,
+tanpa perlu invalidasi lintas proses. Cache bersifat best-effort: error pada file
+persistence hanya di-log, request tetap dilayani dari database.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Hashable, Iterable, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DayStatsCache:
+    """LRU (device_id, versi, day) -> statistik harian, dengan persistence SQLite opsional."""
+
+    def __init__(self, maxsize: int = 20000, path: str = ""):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Optional[dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path and maxsize > 0:
+            try:
+                self._db = sqlite3.connect(path, timeout=5, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                columns = {row[1] for row in self._db.execute("PRAGMA table_info(daily_stats)")}
+                if columns and "version" not in columns:
+                    # File dari format lama (tanpa versi) — isinya cache, aman dibuang
+                    self._db.execute("DROP TABLE daily_stats")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS daily_stats (device_id TEXT NOT NULL, version INTEGER NOT NULL, "
+                    "day TEXT NOT NULL, stats TEXT, PRIMARY KEY (device_id, version, day))"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Persistence cache statistik harian ({path}) tidak tersedia: {e}")
+                self._db = None
+
+    @property
+    def persistent(self) -> bool:
+        """True jika cache juga membaca/menulis file SQLite (blocking I/O)."""
+        return self._db is not None
+
+    def _remember(self, key: Hashable, value: Optional[dict]) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_many(self, device_id, days: Iterable[date], version: int = 0) -> dict:
+        """Returns {day: stats|None} untuk hari yang ada di cache versi ini. Hari yang tidak ada di-skip."""
+        if self.maxsize <= 0:
+            return {}
+        device_key = str(device_id)
+        found, missing = {}, []
+        with self._lock:
+            for day in days:
+                key = (device_key, version, day)
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    found[day] = self._data[key]
+                else:
+                    missing.append(day)
+
+            if missing and self._db is not None:
+                wanted = {day.isoformat(): day for day in missing}
+                try:
+                    rows = self._db.execute(
+                        f"SELECT day, stats FROM daily_stats WHERE device_id = ? AND version = ? "
+                        f"AND day IN ({','.join('?' * len(wanted))})",
+                        [device_key, version, *wanted],
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    logger.warning(f"Baca cache statistik harian gagal: {e}")
+                    rows = []
+                for day_iso, stats in rows:
+                    day = wanted[day_iso]
+                    value = json.loads(stats) if stats is not None else None
+                    self._remember((device_key, version, day), value)
+                    found[day] = value
+
+            self.hits += len(found)
+            self.misses += sum(1 for day in missing if day not in found)
+        return found
+
+    def set_many(self, device_id, entries: dict, version: int = 0) -> None:
+        """
+        Simpan {day: stats|None} untuk hari yang sudah final pada versi device ini.
+        Entry versi lama di file persistence dibuang; di memory cukup tergusur LRU.
+        """
+        if self.maxsize <= 0 or not entries:
+            return
+        device_key = str(device_id)
+        with self._lock:
+            for day, value in entries.items():
+                self._remember((device_key, version, day), value)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "DELETE FROM daily_stats WHERE device_id = ? AND version <> ?", (device_key, version),
+                    )
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO daily_stats (device_id, version, day, stats) VALUES (?, ?, ?, ?)",
+                        [
+                            (device_key, version, day.isoformat(), json.dumps(value) if value is not None else None)
+                            for day, value in entries.items()
+                        ],
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Tulis cache statistik harian gagal: {e}")
+
+    def invalidate_device(self, device_id=None) -> None:
+        """Hapus entry satu device (atau semua jika device_id None), termasuk di file persistence."""
+        with self._lock:
+            if device_id is None:
+                self._data.clear()
+            else:
+                device_key = str(device_id)
+                for key in [k for k in self._data if k[0] == device_key]:
+                    del self._data[key]
+            if self._db is not None:
+                try:
+                    if device_id is None:
+                        self._db.execute("DELETE FROM daily_stats")
+                    else:
+                        self._db.execute("DELETE FROM daily_stats WHERE device_id = ?", (str(device_id),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Invalidasi cache statistik harian gagal: {e}")
+
+    def clear(self) -> None:
+        """Kosongkan LRU in-memory saja (file persistence tidak disentuh)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+daily_stats_cache = DayStatsCache(
+    maxsize=settings.DAILY_STATS_CACHE_SIZE,
+    path=settings.DAILY_STATS_CACHE_PATH,
+)
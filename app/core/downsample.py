@@ -0,0 +1,128 @@
+"""
+Downsampling data sensor untuk grafik.
+
+Grafik di dashboard/mobile tidak butuh ribuan titik — cukup beberapa ratus.
+Modul ini mengecilkan deret reading ke jumlah titik maksimum tertentu
+sehingga ukuran payload tetap, berapa pun panjang rentang waktunya.
+"""
+
+from datetime import datetime
+from typing import List, Sequence
+
+import numpy as np
+
+# Field numerik yang dirata-rata per bucket
+AVERAGED_FIELDS = ("temperature", "humidity", "ammonia")
+
+
+def _to_epoch(ts: datetime) -> float:
+    return ts.timestamp()
+
+
+def bucket_average(readings: Sequence[dict], max_points: int) -> List[dict]:
+    """
+    Kelompokkan reading (urut ascending by timestamp) ke max_points bucket
+    dengan lebar waktu yang sama, lalu ambil rata-rata per bucket.
+
+    Per bucket:
+    - temperature/humidity/ammonia: rata-rata
+    - id, timestamp, light_level: dari reading terakhir di bucket
+      (id terakhir bisa langsung dipakai sebagai since_id untuk resume)
+    - is_alert: True jika ada satu saja reading alert di bucket
+    - alert_message: pesan alert terakhir di bucket
+    - samples: jumlah reading asli di bucket
+
+    Jika jumlah reading <= max_points, reading dikembalikan apa adanya (samples=1).
+    """
+    if max_points <= 0 or not readings:
+        return []
+
+    if len(readings) <= max_points:
+        return [{**r, "samples": 1} for r in readings]
+
+    start = _to_epoch(readings[0]["timestamp"])
+    end = _to_epoch(readings[-1]["timestamp"])
+    width = (end - start) / max_points or 1.0
+
+    buckets: List[List[dict]] = []
+    current_index = None
+    for reading in readings:
+        index = min(int((_to_epoch(reading["timestamp"]) - start) / width), max_points - 1)
+        if index != current_index:
+            buckets.append([])
+            current_index = index
+        buckets[-1].append(reading)
+
+    result = []
+    for bucket in buckets:
+        last = bucket[-1]
+        point = {
+            "id": last["id"],
+            "timestamp": last["timestamp"],
+            "light_level": last.get("light_level"),
+            "is_alert": any(r["is_alert"] for r in bucket),
+            "alert_message": next(
+                (r["alert_message"] for r in reversed(bucket) if r.get("alert_message")), None
+            ),
+            "samples": len(bucket),
+        }
+        for field in AVERAGED_FIELDS:
+            values = [r[field] for r in bucket if r[field] is not None]
+            point[field] = round(sum(values) / len(values), 2) if values else None
+        result.append(point)
+
+    return result
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: pilih max_points index dari deret (x, y)
+    yang mempertahankan bentuk visual grafik (puncak/lembah tetap terlihat,
+    tidak diratakan seperti bucket_average).
+
+    x harus urut ascending. Titik pertama dan terakhir selalu ikut.
+    Loop Python hanya per bucket (<= max_points); perhitungan luas segitiga
+    di dalam bucket di-vektorisasi dengan NumPy.
+    """
+    n = len(x)
+    if max_points >= n:
+        return np.arange(n)
+    if max_points <= 2:
+        return np.array([0, n - 1][:max(max_points, 0)], dtype=np.int64)
+
+    # max_points - 2 bucket di antara titik pertama dan terakhir
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_end = max(next_end, next_start + 1)
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        area = np.abs((x[a] - avg_x) * (bucket_y - y[a]) - (x[a] - bucket_x) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+
+def lttb_series(epoch_ms: np.ndarray, values: np.ndarray, max_points: int) -> dict:
+    """
+    Downsample satu metrik ke max_points titik dengan LTTB.
+    Nilai NaN (reading tanpa metrik ini) dibuang dulu.
+
+    Returns {"t": [epoch ms], "v": [nilai]} siap di-serialize.
+    """
+    mask = ~np.isnan(values)
+    t, v = epoch_ms[mask], values[mask]
+    if len(t) == 0:
+        return {"t": [], "v": []}
+    index = lttb_indices(t.astype(np.float64), v, max_points)
+    return {"t": t[index].astype(np.int64).tolist(), "v": np.round(v[index], 2).tolist()}
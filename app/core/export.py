@@ -0,0 +1,139 @@
+"""
+Encoder export riwayat sensor (CSV, NDJSON, MessagePack, Parquet) yang bekerja per chunk.
+
+Input berupa iterator partisi baris (list of Row dari yield_per), output berupa
+iterator bytes yang langsung dikirim oleh StreamingResponse — tidak ada
+file/list penuh di memory, berapa pun jumlah barisnya.
+
+MessagePack dikirim columnar: satu map {kolom: [nilai, ...]} per partisi,
+dibaca client dengan streaming unpacker (msgpack.Unpacker).
+
+Parquet butuh pyarrow (dependency opsional). Setiap partisi ditulis sebagai
+satu row group, jadi memory tetap sebesar satu chunk.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterable, Iterator, Sequence
+
+from app.core.negotiation import MSGPACK_MEDIA_TYPE, packb
+
+EXPORT_COLUMNS = (
+    "id", "timestamp", "temperature", "humidity", "ammonia",
+    "light_level", "is_alert", "alert_message",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "msgpack": MSGPACK_MEDIA_TYPE,
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _iso(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_chunks(partitions: Iterable[Sequence]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_iso(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode()
+
+
+def ndjson_chunks(partitions: Iterable[Sequence]) -> Iterator[bytes]:
+    for rows in partitions:
+        lines = [
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_iso, row))), separators=(",", ":"))
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode()
+
+
+def msgpack_chunks(partitions: Iterable[Sequence]) -> Iterator[bytes]:
+    for rows in partitions:
+        columns = list(zip(*rows)) or [()] * len(EXPORT_COLUMNS)
+        yield packb({name: list(values) for name, values in zip(EXPORT_COLUMNS, columns)})
+
+
+class _ChunkSink(io.RawIOBase):
+    """File-like tujuan ParquetWriter: menampung bytes sampai di-drain, posisi (tell) tetap kumulatif."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def parquet_chunks(partitions: Iterable[Sequence]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("temperature", pa.float64()),
+        ("humidity", pa.float64()),
+        ("ammonia", pa.float64()),
+        ("light_level", pa.int32()),
+        ("is_alert", pa.bool_()),
+        ("alert_message", pa.string()),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in partitions:
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+    "msgpack": msgpack_chunks,
+    "parquet": parquet_chunks,
+}
@@ -0,0 +1,197 @@
+"""
+Verifikasi Firebase ID token secara lokal (PyJWT + sertifikat publik Google).
+
+Sertifikat penandatangan diambil dari endpoint x509 Google dan di-cache sesuai
+Cache-Control max-age yang diiklankan, jadi request jaringan hanya terjadi saat
+cache habis atau muncul key id (kid) baru karena rotasi (paling sering sekali
+per MIN_REFRESH_INTERVAL_SECONDS). Fetch bersifat single-flight: saat login
+burst hanya satu thread yang mengambil sertifikat, sisanya menunggu hasilnya.
+
+Token yang sudah lolos verifikasi di-cache sebentar (FIREBASE_TOKEN_CACHE_SECONDS,
+tidak melewati exp token), sehingga retry login dengan token yang sama tidak
+mengulang verifikasi RSA.
+
+Semua fungsi di sini blocking — panggil dari endpoint sync (threadpool) atau
+via asyncio.to_thread, jangan langsung dari event loop.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import urllib.request
+from typing import Callable, Dict, Optional, Tuple
+
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ISSUER_PREFIX = "https://securetoken.google.com/"
+
+# Dipakai jika response tidak mengirim max-age
+DEFAULT_CERTS_MAX_AGE = 3600
+# Jarak minimum antar refresh karena kid tidak dikenal — token dengan kid acak
+# tidak boleh membuat setiap request fetch ulang ke Google
+MIN_REFRESH_INTERVAL_SECONDS = 60
+# Toleransi selisih jam server (detik) untuk iat/exp/auth_time
+CLOCK_SKEW_SECONDS = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class InvalidFirebaseToken(Exception):
+    """Token Firebase tidak valid (signature, audience, issuer, atau claim)."""
+
+
+class ExpiredFirebaseToken(InvalidFirebaseToken):
+    """Token Firebase sudah kedaluwarsa."""
+
+
+def fetch_google_certificates() -> Tuple[Dict[str, str], int]:
+    """Ambil {kid: PEM certificate} dari Google beserta max-age (detik) dari Cache-Control."""
+    with urllib.request.urlopen(GOOGLE_CERTS_URL, timeout=10) as response:
+        certificates = json.loads(response.read().decode())
+        match = _MAX_AGE.search(response.headers.get("Cache-Control", ""))
+    return certificates, int(match.group(1)) if match else DEFAULT_CERTS_MAX_AGE
+
+
+class CertificateCache:
+    """Public key penandatangan per kid, di-refresh sesuai max-age yang diiklankan."""
+
+    def __init__(
+        self,
+        fetch: Callable[[], Tuple[Dict[str, str], int]] = fetch_google_certificates,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._fetch = fetch
+        self._clock = clock
+        self._keys: dict = {}
+        self._expires_at = 0.0
+        self._fetched_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def _refresh(self) -> None:
+        certificates, max_age = self._fetch()
+        self._keys = {
+            kid: load_pem_x509_certificate(pem.encode()).public_key()
+            for kid, pem in certificates.items()
+        }
+        self._fetched_at = self._clock()
+        self._expires_at = self._fetched_at + max_age
+        self.fetches += 1
+        logger.info(f"Sertifikat Firebase di-refresh ({len(self._keys)} key, berlaku {max_age} detik)")
+
+    def get(self, kid: str):
+        """Public key untuk kid, atau None jika kid tidak dikenal setelah refresh."""
+        if self._clock() < self._expires_at and kid in self._keys:
+            return self._keys[kid]
+        with self._lock:
+            # Cek ulang: thread lain mungkin sudah refresh selama kita menunggu lock
+            now = self._clock()
+            if now >= self._expires_at:
+                self._refresh()
+            elif kid not in self._keys and now - self._fetched_at >= MIN_REFRESH_INTERVAL_SECONDS:
+                # Kemungkinan rotasi key: Google sudah menerbitkan sertifikat baru
+                self._refresh()
+            return self._keys.get(kid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = {}
+            self._expires_at = 0.0
+            self._fetched_at = None
+
+
+certificate_cache = CertificateCache()
+
+# sha256(token) -> claims yang sudah terverifikasi
+verified_token_cache = TTLCache(ttl=settings.FIREBASE_TOKEN_CACHE_SECONDS)
+
+
+def _token_key(id_token: str) -> str:
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+def verify_id_token(id_token: str, project_id: str) -> dict:
+    """
+    Verifikasi Firebase ID token dan kembalikan claims-nya.
+
+    Aturan sama dengan firebase_admin.auth.verify_id_token: RS256, kid dikenal,
+    aud = project_id, iss = https://securetoken.google.com/<project_id>,
+    sub tidak kosong, auth_time tidak di masa depan.
+
+    Raises:
+        ExpiredFirebaseToken: token sudah lewat exp
+        InvalidFirebaseToken: token tidak valid
+    """
+    if not project_id:
+        raise InvalidFirebaseToken("Project ID Firebase belum dikonfigurasi")
+
+    key = _token_key(id_token)
+    cached = verified_token_cache.get(key)
+    if cached is not MISSING:
+        if cached["exp"] > time.time():
+            return cached
+        verified_token_cache.invalidate(key)
+
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except jwt.PyJWTError as e:
+        raise InvalidFirebaseToken(str(e)) from e
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise InvalidFirebaseToken("Header token tidak valid")
+
+    public_key = certificate_cache.get(header["kid"])
+    if public_key is None:
+        raise InvalidFirebaseToken("Key id token tidak dikenal")
+
+    try:
+        claims = jwt.decode(
+            id_token,
+            public_key,
+            algorithms=["RS256"],
+            audience=project_id,
+            issuer=ISSUER_PREFIX + project_id,
+            leeway=CLOCK_SKEW_SECONDS,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+    except jwt.ExpiredSignatureError as e:
+        raise ExpiredFirebaseToken(str(e)) from e
+    except jwt.PyJWTError as e:
+        raise InvalidFirebaseToken(str(e)) from e
+
+    if not isinstance(claims["sub"], str) or not claims["sub"] or len(claims["sub"]) > 128:
+        raise InvalidFirebaseToken("Claim sub tidak valid")
+    if claims.get("auth_time", 0) > time.time() + CLOCK_SKEW_SECONDS:
+        raise InvalidFirebaseToken("Claim auth_time di masa depan")
+    claims["uid"] = claims["sub"]
+
+    ttl = min(settings.FIREBASE_TOKEN_CACHE_SECONDS, claims["exp"] - time.time())
+    if ttl > 0:
+        verified_token_cache.set(key, claims, ttl=ttl)
+    return claims
+
+
+def clear_firebase_caches() -> None:
+    """Kosongkan cache sertifikat & token (dipakai di test)."""
+    certificate_cache.clear()
+    verified_token_cache.clear()
+
+
+def resolve_project_id(credentials_file: str) -> Optional[str]:
+    """FIREBASE_PROJECT_ID dari settings, atau project_id di file service account."""
+    if settings.FIREBASE_PROJECT_ID:
+        return settings.FIREBASE_PROJECT_ID
+    try:
+        with open(credentials_file) as f:
+            return json.load(f).get("project_id")
+    except (OSError, ValueError):
+        return None
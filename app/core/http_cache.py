@@ -0,0 +1,85 @@
+"""
+Helper conditional request HTTP (ETag / Last-Modified → 304 Not Modified).
+
+Endpoint menghitung validator dari data response, lalu:
+
+    etag = make_etag(payload)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    set_validators(response, etag, last_modified)
+
+Client (dashboard) cukup mengirim ulang If-None-Match / If-Modified-Since;
+jika data tidak berubah, body tidak dikirim ulang.
+
+Payload make_etag tidak harus response itu sendiri. Untuk endpoint yang sering
+di-poll, pakai token versi murah (mis. Device.row_version, naik saat nama/pemilik
+device berubah) agar 304 dijawab sebelum response dibangun.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+# Response boleh disimpan client, tapi wajib divalidasi ulang setiap kali dipakai
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag dari hash konten (JSON-serializable; date/UUID via str)."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str).encode()
+    return f'W/"{hashlib.sha256(raw).hexdigest()[:32]}"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def format_http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    True jika conditional header request masih cocok dengan versi saat ini.
+    If-None-Match diutamakan; If-Modified-Since hanya dipakai jika If-None-Match tidak ada (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        current = _strip_weak(etag)
+        return any(_strip_weak(tag) == current for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        # Presisi HTTP-date hanya sampai detik
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(response: Response, etag: str, last_modified: Optional[datetime] = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_http_date(last_modified)
+
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    response = Response(status_code=304)
+    set_validators(response, etag, last_modified)
+    return response
@@ -0,0 +1,103 @@
+"""
+Content negotiation untuk response list data sensor (logs, alerts, statistik).
+
+Response list default berupa array of object — nama field (temperature,
+humidity, timestamp, ...) terulang di setiap baris. Client bisa meminta
+bentuk yang lebih ringkas:
+
+- "json" (default): bentuk lama, array of object.
+- "columnar": JSON berorientasi kolom, list diganti {"field": [nilai, ...]}.
+- "msgpack": bentuk columnar yang di-encode MessagePack (binary).
+
+Dipilih lewat query ?format= (diutamakan) atau header Accept:
+
+    Accept: application/msgpack              → msgpack
+    Accept: application/vnd.columnar+json    → columnar
+
+Field non-list (total, next_cursor, device_id, ...) tidak berubah. Datetime di
+msgpack dikirim sebagai string ISO 8601, sama seperti di JSON.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import List, Literal, Optional, Sequence
+from uuid import UUID
+
+import msgpack
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+ResponseFormat = Literal["json", "columnar", "msgpack"]
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.columnar+json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Alias yang masih umum dipakai library client
+_MSGPACK_ACCEPT = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+FORMAT_DESCRIPTION = "Bentuk response: json (default), columnar, atau msgpack. Bisa juga lewat header Accept."
+
+
+def negotiate_format(request: Request, requested: Optional[str] = None) -> ResponseFormat:
+    """Format response dari ?format= atau header Accept (default json)."""
+    if requested:
+        return requested
+    accept = request.headers.get("accept", "").lower()
+    if any(media_type in accept for media_type in _MSGPACK_ACCEPT):
+        return "msgpack"
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return "columnar"
+    return "json"
+
+
+def to_columns(items: List[dict], keys: Optional[Sequence[str]] = None) -> dict:
+    """[{a: 1, b: 2}, {a: 3, b: 4}] → {a: [1, 3], b: [2, 4]}. keys menjaga kolom tetap ada saat list kosong."""
+    if keys is None:
+        keys = list(items[0]) if items else []
+    return {key: [item.get(key) for item in items] for key in keys}
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipe {type(value).__name__} tidak bisa di-encode ke msgpack")
+
+
+def packb(payload) -> bytes:
+    return msgpack.packb(payload, default=_msgpack_default, use_bin_type=True)
+
+
+def columnar_body(payload: dict, list_key: str = "data", keys: Optional[Sequence[str]] = None) -> dict:
+    """Payload dengan list di payload[list_key] diganti bentuk kolom."""
+    items = [item if isinstance(item, dict) else item.model_dump() for item in payload[list_key]]
+    return {**payload, list_key: to_columns(items, keys)}
+
+
+def render(
+    payload: dict,
+    fmt: ResponseFormat,
+    response: Optional[Response] = None,
+    list_key: Optional[str] = "data",
+    keys: Optional[Sequence[str]] = None,
+):
+    """
+    Response sesuai format. Untuk json, payload dikembalikan apa adanya (diserialisasi
+    FastAPI seperti biasa); header Vary tetap dipasang lewat `response` agar cache
+    tidak mencampur bentuk response. list_key=None: payload sudah columnar
+    (mis. /aggregate), hanya encoding yang berubah.
+    """
+    headers = {"Vary": "Accept"}
+    if fmt == "json":
+        if response is not None:
+            response.headers.update(headers)
+        return payload
+
+    body = columnar_body(payload, list_key, keys) if list_key else payload
+    if fmt == "msgpack":
+        return Response(content=packb(body), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    return JSONResponse(jsonable_encoder(body), media_type=COLUMNAR_MEDIA_TYPE, headers=headers)
+
@@ -1,13 +1,131 @@
+import base64
+import json
+import logging
 import math
-from typing import Type
+from datetime import datetime
+from typing import Literal, Optional, Sequence, Type
+from fastapi import HTTPException
 from pydantic import BaseModel
+from sqlalchemy import DateTime, Select, func, select, tuple_
 from sqlalchemy.orm import Query
 
+from app.core.cache import TTLCache, MISSING
+from app.core.config import settings
+from app.core.serializers import RowSerializer
 
-def paginate(query: Query, page: int = 1, limit: int = 20, schema: Type[BaseModel] = None) -> dict:
+logger = logging.getLogger(__name__)
+
+# Cara menghitung total untuk paginate():
+#   exact     — SELECT count(*) setiap request (default, perilaku lama)
+#   cached    — count(*) exact, di-cache per query selama PAGINATION_COUNT_CACHE_SECONDS
+#   estimated — total dari caller (mis. counter per device) atau statistik planner
+#               PostgreSQL (EXPLAIN); dialect lain fallback ke exact
+#   none      — tanpa total; has_more ditentukan dengan mengambil 1 baris ekstra
+CountMode = Literal["exact", "cached", "estimated", "none"]
+
+_count_cache = TTLCache(ttl=settings.PAGINATION_COUNT_CACHE_SECONDS, maxsize=1000)
+
+
+def _serialize(items: list, schema) -> list:
+    """
+    Serialize item via schema jika diberikan: RowSerializer untuk Core row
+    (jalur ringan, lihat app.core.serializers), atau schema Pydantic untuk ORM object.
+    """
+    if isinstance(schema, RowSerializer):
+        return schema(items)
+    if schema:
+        return [schema.model_validate(item).model_dump() for item in items]
+    return items
+
+
+def encode_cursor(item, columns: Sequence) -> str:
+    """
+    Buat cursor opaque dari nilai kolom urutan (mis. timestamp, id) pada item terakhir.
+    Client tidak perlu (dan tidak boleh) mem-parse isinya.
+    """
+    values = []
+    for column in columns:
+        value = getattr(item, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> Optional[list]:
+    """Kebalikan encode_cursor. Returns None jika cursor rusak / tidak cocok dengan kolom."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    try:
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else column.type.python_type(value)
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, NotImplementedError):
+        return None
+
+
+def _count_cache_key(statement) -> tuple:
+    compiled = statement.compile()
+    return (str(compiled), tuple(sorted((key, str(value)) for key, value in compiled.params.items())))
+
+
+def _estimate_count(query: Query) -> Optional[int]:
+    """Perkiraan jumlah baris dari planner PostgreSQL (EXPLAIN, tanpa eksekusi). None jika tidak tersedia."""
+    connection = query.session.connection()
+    if connection.dialect.name != "postgresql":
+        return None
+    compiled = query.statement.compile(dialect=connection.dialect)
+    try:
+        plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception as e:
+        logger.warning(f"Estimasi count gagal, fallback ke exact: {e}")
+        return None
+
+
+def count_total(query: Query, mode: CountMode = "exact", total: Optional[int] = None) -> Optional[int]:
+    """
+    Hitung total untuk pagination sesuai mode (lihat CountMode).
+    total: nilai dari caller (counter yang di-maintain incremental) — dipakai apa adanya.
+    """
+    if total is not None:
+        return total
+    if mode == "none":
+        return None
+    if mode == "estimated":
+        estimate = _estimate_count(query)
+        if estimate is not None:
+            return estimate
+    if mode == "cached":
+        key = _count_cache_key(query.statement)
+        cached = _count_cache.get(key)
+        if cached is not MISSING:
+            return cached
+        total = query.order_by(None).count()
+        _count_cache.set(key, total)
+        return total
+    return query.order_by(None).count()
+
+
+def paginate(
+    query: Query,
+    page: int = 1,
+    limit: int = 20,
+    schema: Type[BaseModel] = None,
+    cursor_columns: Optional[Sequence] = None,
+    count: CountMode = "exact",
+    total: Optional[int] = None,
+) -> dict:
     """
     Apply pagination ke SQLAlchemy query.
-    
+
     Args:
         query: SQLAlchemy query object
         page: Nomor halaman (1-indexed)
@@ -15,26 +133,149 @@ def paginate(query: Query, page: int = 1, limit: int = 20, schema: Type[BaseMode
         schema: Pydantic schema untuk serialization (opsional).
                 Jika diberikan, ORM objects akan di-serialize via schema
                 sehingga hanya field yang didefinisikan di schema yang dikembalikan.
-    
+                Untuk query kolom (db.query(*X_ROWS.columns)) berikan RowSerializer-nya.
+        cursor_columns: Kolom urutan untuk keyset (lihat paginate_keyset). Jika diberikan,
+                response juga berisi next_cursor agar client bisa pindah ke mode cursor.
+        count: Cara menghitung total (lihat CountMode).
+        total: Total yang sudah diketahui caller (mis. Device.log_count) — COUNT(*) di-skip.
+
     Returns:
-        dict dengan keys: data, total, page, limit, total_pages
+        dict dengan keys: data, total, page, limit, total_pages, has_more, count_mode (+ next_cursor).
+        total/total_pages bernilai None pada mode "none".
     """
-    total = query.count()
-    total_pages = math.ceil(total / limit) if limit > 0 else 0
+    total = count_total(query, count, total)
 
     offset = (page - 1) * limit
-    items = query.offset(offset).limit(limit).all()
+    # Tanpa total: ambil 1 baris ekstra untuk tahu masih ada halaman berikutnya
+    items = query.offset(offset).limit(limit + 1 if total is None else limit).all()
+    return _page_result(items, total, page, limit, schema, cursor_columns, count)
 
-    # Serialize via schema jika diberikan
-    if schema:
-        data = [schema.model_validate(item).model_dump() for item in items]
+
+def _page_result(
+    items: list,
+    total: Optional[int],
+    page: int,
+    limit: int,
+    schema: Optional[Type[BaseModel]],
+    cursor_columns: Optional[Sequence],
+    count: CountMode,
+) -> dict:
+    """Bentuk response paginate() dari item yang sudah diambil (dipakai versi sync & async)."""
+    offset = (page - 1) * limit
+    if total is None:
+        has_more = len(items) > limit
+        items = items[:limit]
+        total_pages = None
     else:
-        data = items
+        has_more = offset + len(items) < total
+        total_pages = math.ceil(total / limit) if limit > 0 else 0
 
-    return {
-        "data": data,
+    result = {
+        "data": _serialize(items, schema),
         "total": total,
         "page": page,
         "limit": limit,
         "total_pages": total_pages,
+        "has_more": has_more and bool(items),
+        "count_mode": count,
+    }
+    if cursor_columns is not None:
+        result["next_cursor"] = encode_cursor(items[-1], cursor_columns) if result["has_more"] else None
+    return result
+
+
+def paginate_keyset(
+    query: Query,
+    columns: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    schema: Type[BaseModel] = None,
+) -> dict:
+    """
+    Keyset (cursor) pagination untuk query yang diurutkan DESC pada `columns`
+    (mis. SensorLog.timestamp, SensorLog.id). Halaman berikutnya difilter dengan
+    row comparison (timestamp, id) < cursor, sehingga database cukup melakukan
+    index range scan — tanpa OFFSET dan tanpa COUNT(*).
+
+    Returns:
+        dict dengan keys: data, limit, next_cursor (None = halaman terakhir)
+    """
+    query = _apply_cursor(query, columns, cursor)
+    # Ambil 1 baris ekstra untuk tahu apakah masih ada halaman berikutnya
+    items = query.limit(limit + 1).all()
+    return _keyset_result(items, columns, limit, schema)
+
+
+def _apply_cursor(query, columns: Sequence, cursor: Optional[str]):
+    """Filter (kolom...) < nilai cursor. Berlaku untuk Query maupun select()."""
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, columns)
+    if values is None:
+        raise HTTPException(status_code=400, detail="Cursor tidak valid.")
+    return query.filter(tuple_(*columns) < tuple_(*values))
+
+
+def _keyset_result(items: list, columns: Sequence, limit: int, schema: Optional[Type[BaseModel]]) -> dict:
+    has_more = len(items) > limit
+    items = items[:limit]
+    return {
+        "data": _serialize(items, schema),
+        "limit": limit,
+        "next_cursor": encode_cursor(items[-1], columns) if has_more else None,
     }
+
+
+# ==========================================
+# Versi async — untuk select() + ReadSession (app.database.get_read_db)
+# ==========================================
+
+async def _fetch(db, statement: Select, schema) -> list:
+    """Row kolom untuk RowSerializer, selain itu ORM object (select(Model))."""
+    if isinstance(schema, RowSerializer):
+        return (await db.execute(statement)).all()
+    return await db.scalars(statement)
+
+
+async def apaginate(
+    db,
+    statement: Select,
+    page: int = 1,
+    limit: int = 20,
+    schema: Type[BaseModel] = None,
+    cursor_columns: Optional[Sequence] = None,
+    count: CountMode = "exact",
+    total: Optional[int] = None,
+) -> dict:
+    """
+    Sama dengan paginate(), tapi untuk select() ORM yang dieksekusi lewat ReadSession.
+    Mode "estimated" tanpa total dari caller dihitung exact (EXPLAIN butuh koneksi sync).
+    """
+    if total is None and count != "none":
+        count_statement = select(func.count()).select_from(statement.order_by(None).subquery())
+        key = _count_cache_key(statement) if count == "cached" else None
+        cached = _count_cache.get(key) if key is not None else MISSING
+        if cached is not MISSING:
+            total = cached
+        else:
+            total = await db.scalar(count_statement)
+            if key is not None:
+                _count_cache.set(key, total)
+
+    offset = (page - 1) * limit
+    items = await _fetch(db, statement.offset(offset).limit(limit + 1 if total is None else limit), schema)
+    return _page_result(items, total, page, limit, schema, cursor_columns, count)
+
+
+async def apaginate_keyset(
+    db,
+    statement: Select,
+    columns: Sequence,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    schema: Type[BaseModel] = None,
+) -> dict:
+    """Sama dengan paginate_keyset(), untuk select() ORM lewat ReadSession."""
+    statement = _apply_cursor(statement, columns, cursor)
+    items = await _fetch(db, statement.limit(limit + 1), schema)
+    return _keyset_result(items, columns, limit, schema)
@@ -0,0 +1,278 @@
+"""
+Partisi bulanan sensor_logs (PostgreSQL, PARTITION BY RANGE (timestamp)).
+
+Setelah migration 009, sensor_logs adalah tabel partisi dengan satu partisi
+per bulan (UTC) bernama sensor_logs_YYYY_MM, plus sensor_logs_default untuk
+reading di luar rentang partisi yang ada. Modul ini:
+
+- membuat partisi bulan berjalan + SENSOR_LOG_PARTITION_MONTHS_AHEAD bulan ke depan
+  (dipanggil periodik dari lifespan app, atau manual lewat CLI). Reading bulan itu
+  yang telanjur masuk sensor_logs_default dipindah ke partisi baru;
+- menjalankan retention dengan DETACH/DROP PARTITION untuk bulan yang seluruhnya
+  lebih tua dari cutoff — O(1) per bulan, tanpa DELETE massal & tanpa bloat —
+  plus DELETE reading kedaluwarsa di sensor_logs_default.
+
+Pada database tanpa partisi (SQLite test, atau sebelum migration 009) semua
+fungsi no-op dan caller fallback ke DELETE per batch.
+
+    python -m app.core.partitions ensure
+    python -m app.core.partitions retention --days 365
+"""
+
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "sensor_logs"
+DEFAULT_PARTITION = "sensor_logs_default"
+_PARTITION_NAME = re.compile(r"^sensor_logs_(\d{4})_(\d{2})$")
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_{month:%Y_%m}"
+
+
+def _bounds(month: date) -> str:
+    """Rentang partisi bulanan [awal bulan, awal bulan berikutnya) dalam UTC."""
+    return f"FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+
+
+def create_partition_sql(month: date) -> str:
+    """DDL satu partisi bulanan kosong."""
+    return f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF {PARENT_TABLE} FOR VALUES {_bounds(month)}"
+
+
+def has_default_partition(db: Session) -> bool:
+    return bool(db.execute(
+        text("SELECT to_regclass(:table) IS NOT NULL"), {"table": DEFAULT_PARTITION},
+    ).scalar())
+
+
+def _month_range(month: date) -> dict:
+    next_month = add_months(month, 1)
+    return {
+        "start": datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        "end": datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc),
+    }
+
+
+def _default_has_rows(db: Session, month: date) -> bool:
+    return bool(db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"),
+        _month_range(month),
+    ).scalar())
+
+
+def _create_from_default(db: Session, month: date) -> int:
+    """
+    Buat partisi bulan `month` yang reading-nya sudah ada di sensor_logs_default.
+    CREATE ... PARTITION OF langsung akan gagal (row default melanggar rentang baru),
+    jadi dalam satu transaksi: kunci default partition (insert baru menunggu),
+    pindahkan row bulan itu ke tabel baru, lalu ATTACH. Counter device tidak
+    berubah — row hanya berpindah partisi. Returns jumlah row yang dipindah.
+    """
+    name = partition_name(month)
+    db.execute(text(f"LOCK TABLE {DEFAULT_PARTITION} IN EXCLUSIVE MODE"))
+    db.execute(text(f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = db.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        _month_range(month),
+    ).rowcount
+    db.execute(text(f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+    return moved
+
+
+def is_partitioned(db: Session) -> bool:
+    """True jika sensor_logs adalah tabel partisi PostgreSQL."""
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": PARENT_TABLE},
+    ).scalar())
+
+
+def list_partitions(db: Session) -> List[date]:
+    """Bulan (tanggal 1) dari setiap partisi bulanan yang terpasang, urut ascending."""
+    names = db.execute(
+        text("SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:table)"),
+        {"table": PARENT_TABLE},
+    ).scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def ensure_partitions(db: Session, months_ahead: int = settings.SENSOR_LOG_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    Pastikan partisi bulan berjalan s/d months_ahead bulan ke depan sudah ada.
+    Returns nama partisi yang baru dibuat.
+    """
+    if not is_partitioned(db):
+        return []
+    existing = set(list_partitions(db))
+    current = month_start(datetime.now(timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        try:
+            if has_default_partition(db) and _default_has_rows(db, month):
+                moved = _create_from_default(db, month)
+                logger.warning(f"{moved} reading dipindah dari {DEFAULT_PARTITION} ke {partition_name(month)}")
+            else:
+                db.execute(text(create_partition_sql(month)))
+            db.commit()
+            created.append(partition_name(month))
+        except Exception as e:
+            # Mis. worker lain membuat partisi yang sama pada saat bersamaan
+            db.rollback()
+            logger.error(f"Gagal membuat partisi {partition_name(month)}: {e}")
+    if created:
+        logger.info(f"Partisi sensor_logs dibuat: {', '.join(created)}")
+    return created
+
+
+def _decrement_counters(db: Session, counts) -> int:
+    """Kurangi counter log/alert per device dari baris (device_id, log_count, alert_count). Returns total log."""
+    total = 0
+    for device_id, log_count, alert_count in counts:
+        db.execute(
+            text(
+                "UPDATE devices SET log_count = log_count - :logs, alert_count = alert_count - :alerts, "
+                "row_version = row_version + 1 WHERE id = :id"
+            ),
+            {"logs": log_count, "alerts": alert_count, "id": device_id},
+        )
+        total += log_count
+    return total
+
+
+def drop_expired_partitions(db: Session, cutoff: datetime, detach_only: bool = settings.SENSOR_LOG_RETENTION_DETACH_ONLY) -> dict:
+    """
+    Lepas (DETACH) lalu DROP partisi bulanan yang seluruh isinya lebih tua dari cutoff.
+    Bulan yang baru sebagian melewati cutoff dipertahankan sampai bulan itu habis.
+    Reading kedaluwarsa di sensor_logs_default dihapus per baris.
+
+    DETACH dijalankan lebih dulu, baru tabel yang sudah lepas dihitung: reading yang
+    masuk bersamaan menunggu lock DETACH lalu masuk partisi lain, jadi counter
+    log/alert per device dikurangi tepat sebanyak yang dilepas (transaksi yang sama).
+    DETACH ... CONCURRENTLY tidak dipakai: PostgreSQL menolaknya selama
+    sensor_logs_default ada.
+
+    Returns:
+        {"partitions": [nama], "deleted_count": jumlah reading yang dilepas/dihapus}
+    """
+    removed, deleted_count = [], 0
+    for month in list_partitions(db):
+        next_month = add_months(month, 1)
+        if datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc) > cutoff:
+            break
+        name = partition_name(month)
+        db.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        partition_count = _decrement_counters(db, db.execute(text(
+            f"SELECT device_id, count(*) AS log_count, count(*) FILTER (WHERE is_alert) AS alert_count "
+            f"FROM {name} GROUP BY device_id"
+        )).all())
+        if not detach_only:
+            db.execute(text(f"DROP TABLE {name}"))
+        db.commit()
+        removed.append(name)
+        deleted_count += partition_count
+        logger.warning(f"Retention: partisi {name} {'di-detach' if detach_only else 'di-drop'} ({partition_count} reading)")
+
+    if has_default_partition(db):
+        default_count = _decrement_counters(db, db.execute(
+            text(
+                f"WITH deleted AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff RETURNING device_id, is_alert) "
+                f"SELECT device_id, count(*) AS log_count, count(*) FILTER (WHERE is_alert) AS alert_count "
+                f"FROM deleted GROUP BY device_id"
+            ),
+            {"cutoff": cutoff},
+        ).all())
+        db.commit()
+        if default_count:
+            deleted_count += default_count
+            logger.warning(f"Retention: {default_count} reading dihapus dari {DEFAULT_PARTITION}")
+    return {"partitions": removed, "deleted_count": deleted_count}
+
+
+def _maintain() -> None:
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        ensure_partitions(db)
+    except Exception as e:
+        logger.error(f"Maintenance partisi sensor_logs gagal: {e}")
+    finally:
+        db.close()
+
+
+async def run_maintenance_loop(interval_seconds: float) -> None:
+    """Buat partisi bulan mendatang secara periodik (jalan di lifespan app)."""
+    while True:
+        await asyncio.to_thread(_maintain)
+        await asyncio.sleep(interval_seconds)
+
+
+def main() -> None:
+    from app.core.logging_config import setup_logging
+    from app.database import SessionLocal
+
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Maintenance partisi bulanan sensor_logs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ensure = sub.add_parser("ensure", help="Buat partisi bulan berjalan + bulan mendatang")
+    ensure.add_argument("--months-ahead", type=int, default=settings.SENSOR_LOG_PARTITION_MONTHS_AHEAD)
+    retention = sub.add_parser("retention", help="DETACH/DROP partisi yang lebih tua dari retention")
+    retention.add_argument("--days", type=int, default=settings.SENSOR_LOG_RETENTION_DAYS)
+    retention.add_argument("--detach-only", action="store_true", default=settings.SENSOR_LOG_RETENTION_DETACH_ONLY)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            logger.error("sensor_logs belum dipartisi (jalankan 'alembic upgrade head' di PostgreSQL).")
+            raise SystemExit(1)
+        if args.command == "ensure":
+            ensure_partitions(db, args.months_ahead)
+        elif args.days > 0:
+            cutoff = datetime.now(timezone.utc) - timedelta(days=args.days)
+            result = drop_expired_partitions(db, cutoff, args.detach_only)
+            logger.info(f"Retention selesai: {len(result['partitions'])} partisi, {result['deleted_count']} reading")
+        else:
+            logger.info("Retention di-disable (SENSOR_LOG_RETENTION_DAYS=0). Skip.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Rollup sensor per jam dan per hari (tabel sensor_rollup_hourly / sensor_rollup_daily).
+
+Rollup di-update incremental saat reading di-insert lewat ORM session (listener
+after_flush di app/models/rollup.py). INSERT lewat Core/bulk tidak memicu listener
+itu. Modul ini menyediakan backfill dari data mentah yang sudah ada, misalnya
+setelah migration pertama kali atau setelah import massal:
+
+    python -m app.core.rollups                 # rebuild semua device
+    python -m app.core.rollups --device <uuid> # rebuild satu device
+
+Rebuild menghapus rollup lama lalu mengisinya ulang dengan satu
+INSERT ... SELECT ... GROUP BY per tabel, dalam satu transaksi. Jalankan saat
+ingest sepi: reading yang masuk selama rebuild bisa terhitung dua kali.
+"""
+
+import argparse
+import logging
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.day_cache import daily_stats_cache
+from app.models.device import Device, SensorLog
+from app.models.rollup import ROLLUP_METRICS, SensorRollupDaily, SensorRollupHourly
+
+logger = logging.getLogger(__name__)
+
+
+def _bucket_expressions(dialect_name: str) -> tuple:
+    """Ekspresi SQL awal jam & tanggal (UTC) dari SensorLog.timestamp sesuai dialect."""
+    if dialect_name == "postgresql":
+        utc = func.timezone("UTC", SensorLog.timestamp)
+        return func.timezone("UTC", func.date_trunc("hour", utc)), func.date(utc)
+    # SQLite: timestamp disimpan sebagai string UTC
+    return func.strftime("%Y-%m-%d %H:00:00.000000", SensorLog.timestamp), func.date(SensorLog.timestamp)
+
+
+def _aggregate_columns() -> list:
+    columns = [
+        func.count(SensorLog.id).label("sample_count"),
+        func.count(case((SensorLog.is_alert == True, 1))).label("alert_count"),  # noqa: E712
+    ]
+    for metric in ROLLUP_METRICS:
+        column = getattr(SensorLog, metric)
+        columns += [
+            func.count(column).label(f"{metric}_count"),
+            func.coalesce(func.sum(column), 0.0).label(f"{metric}_sum"),
+            func.min(column).label(f"{metric}_min"),
+            func.max(column).label(f"{metric}_max"),
+        ]
+    return columns
+
+
+def rebuild_rollups(db: Session, device_id: Optional[UUID] = None) -> dict:
+    """
+    Bangun ulang rollup jam & hari dari sensor_logs (semua device atau satu device).
+    Returns jumlah baris rollup yang ditulis per tabel.
+    """
+    hour_bucket, day_bucket = _bucket_expressions(db.get_bind().dialect.name)
+    aggregates = _aggregate_columns()
+    target_columns = ["sample_count", "alert_count"] + [
+        f"{metric}_{part}" for metric in ROLLUP_METRICS for part in ("count", "sum", "min", "max")
+    ]
+
+    written = {}
+    for model, key_column, bucket in (
+        (SensorRollupHourly, "bucket", hour_bucket),
+        (SensorRollupDaily, "day", day_bucket),
+    ):
+        source = select(SensorLog.device_id, bucket.label(key_column), *aggregates).where(
+            SensorLog.timestamp.isnot(None)
+        )
+        cleanup = delete(model)
+        if device_id is not None:
+            source = source.where(SensorLog.device_id == device_id)
+            cleanup = cleanup.where(model.device_id == device_id)
+        source = source.group_by(SensorLog.device_id, bucket)
+
+        db.execute(cleanup)
+        result = db.execute(insert(model).from_select(["device_id", key_column] + target_columns, source))
+        written[model.__tablename__] = result.rowcount
+
+    # Statistik berubah tanpa reading baru — naikkan versi device agar ETag stats/daily ikut berubah
+    bump = update(Device).values(row_version=Device.row_version + 1)
+    if device_id is not None:
+        bump = bump.where(Device.id == device_id)
+    db.execute(bump)
+
+    db.commit()
+    # Statistik hari yang sudah selesai di-cache sebagai immutable — buang setelah rebuild
+    daily_stats_cache.invalidate_device(device_id)
+    return written
+
+
+def main() -> None:
+    from app.core.logging_config import setup_logging
+    from app.database import SessionLocal
+
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Backfill rollup sensor per jam & per hari dari sensor_logs.")
+    parser.add_argument("--device", type=UUID, default=None, help="Rebuild satu device saja (UUID)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db, args.device)
+    finally:
+        db.close()
+    for table, rows in written.items():
+        logger.info(f"Rollup {table}: {rows} baris ditulis")
+
+
+if __name__ == "__main__":
+    main()
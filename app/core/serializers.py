@@ -0,0 +1,73 @@
+"""
+Jalur baca ringan untuk endpoint list.
+
+paginate() dengan schema Pydantic meng-hydrate ORM object penuh (identity map)
+lalu memanggil model_validate().model_dump() per baris. Untuk halaman besar,
+biaya CPU per baris itu lebih besar dari query-nya sendiri.
+
+RowSerializer memilih hanya kolom yang dibutuhkan (Core row, tanpa ORM) dan
+mengubah setiap row ke dict dengan urutan field yang sudah disusun sekali.
+Field turunan seperti is_online dihitung sekali per batch terhadap satu `now`.
+Output identik dengan model_dump() schema padanannya (lihat test).
+
+    query = db.query(*DEVICE_ROWS.columns).filter(...)
+    return paginate(query, page, limit, schema=DEVICE_ROWS)
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Sequence
+
+from app.core.config import settings
+from app.models.device import Device, SensorLog
+from app.models.user import User
+
+# Fungsi field turunan: menerima list dict satu batch, mengembalikan nilai per item
+BatchField = Callable[[List[dict]], Iterable]
+
+
+class RowSerializer:
+    """Kolom yang di-select + cara mengubah row (tuple) menjadi dict response."""
+
+    def __init__(self, columns: Sequence, batch_fields: Dict[str, BatchField] = None):
+        self.columns = tuple(columns)
+        self.keys = tuple(column.key for column in self.columns)
+        self.batch_fields = dict(batch_fields or {})
+
+    def __call__(self, rows: Iterable) -> List[dict]:
+        keys = self.keys
+        items = [dict(zip(keys, row)) for row in rows]
+        if items:
+            for name, compute in self.batch_fields.items():
+                for item, value in zip(items, compute(items)):
+                    item[name] = value
+        return items
+
+
+def _online_flags(items: List[dict]) -> List[bool]:
+    """Sama dengan DeviceResponse.is_online, dengan satu `now` untuk seluruh batch."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
+    flags = []
+    for item in items:
+        last_hb = item["last_heartbeat"]
+        if last_hb is not None and last_hb.tzinfo is None:
+            last_hb = last_hb.replace(tzinfo=timezone.utc)
+        flags.append(last_hb is not None and last_hb >= cutoff)
+    return flags
+
+
+# Padanan DeviceResponse
+DEVICE_ROWS = RowSerializer(
+    (Device.id, Device.mac_address, Device.name, Device.user_id, Device.last_heartbeat),
+    batch_fields={"is_online": _online_flags},
+)
+
+# Padanan LogResponse
+LOG_ROWS = RowSerializer((
+    SensorLog.id, SensorLog.temperature, SensorLog.humidity, SensorLog.ammonia,
+    SensorLog.light_level, SensorLog.is_alert, SensorLog.alert_message, SensorLog.timestamp,
+))
+
+# Padanan UserResponse
+USER_ROWS = RowSerializer((
+    User.id, User.email, User.full_name, User.picture, User.provider, User.is_active, User.role,
+))
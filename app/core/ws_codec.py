@@ -0,0 +1,83 @@
+"""
+Encoding frame WebSocket per subscriber.
+
+- "json" (default): pesan dikirim apa adanya sebagai JSON text frame.
+- "msgpack": pesan dikirim sebagai MessagePack binary frame. Untuk
+  sensor_data, frame pertama per device berisi state lengkap ("full": true);
+  frame berikutnya hanya berisi field yang berubah dibanding frame terakhir
+  yang dikirim ke subscriber ini ("full": false). Field statis seperti
+  device_name praktis hanya terkirim sekali.
+
+Client msgpack menyimpan state terakhir per device_id dan me-merge delta:
+top-level field ditimpa, field di "latest" ditimpa per key. Delta hanya bisa
+menimpa, jadi jika ada key yang hilang atau "latest" berubah dari/menjadi
+None, server mengirim frame full yang menggantikan state client.
+"""
+
+from typing import Dict, Literal
+
+import msgpack
+from fastapi import WebSocket
+
+Encoding = Literal["json", "msgpack"]
+
+# Field yang selalu ada di setiap frame sensor_data (kunci untuk merge di client)
+_FRAME_KEYS = ("type", "device_id")
+
+
+def _needs_full_frame(previous: dict, message: dict) -> bool:
+    """True jika perubahan tidak bisa dinyatakan sebagai delta (key hilang / latest dari atau ke None)."""
+    if not previous.keys() <= message.keys():
+        return True
+    latest, previous_latest = message.get("latest"), previous.get("latest")
+    if (latest is None) != (previous_latest is None):
+        return True
+    return latest is not None and not previous_latest.keys() <= latest.keys()
+
+
+class FrameEncoder:
+    """
+    Encoder untuk SATU koneksi WebSocket.
+    Menyimpan frame sensor_data terakhir per device untuk menghitung delta.
+    """
+
+    def __init__(self, encoding: Encoding = "json"):
+        self.encoding = encoding
+        self._previous: Dict[str, dict] = {}
+
+    def forget(self, device_id: str) -> None:
+        """Reset state device (mis. setelah unsubscribe) agar frame berikutnya full."""
+        self._previous.pop(device_id, None)
+
+    def encode(self, message: dict) -> dict:
+        """Return frame yang akan di-pack (delta untuk sensor_data, selain itu apa adanya)."""
+        if message.get("type") != "sensor_data":
+            return message
+
+        device_id = message["device_id"]
+        previous = self._previous.get(device_id)
+        self._previous[device_id] = message
+
+        if previous is None or _needs_full_frame(previous, message):
+            return {**message, "full": True}
+
+        frame = {key: message[key] for key in _FRAME_KEYS}
+        frame["full"] = False
+        for key, value in message.items():
+            if key in _FRAME_KEYS or key == "latest":
+                continue
+            if previous.get(key) != value:
+                frame[key] = value
+
+        latest, previous_latest = message.get("latest") or {}, previous.get("latest") or {}
+        changed = {key: value for key, value in latest.items() if previous_latest.get(key) != value}
+        if changed:
+            frame["latest"] = changed
+        return frame
+
+    async def send(self, websocket: WebSocket, message: dict) -> None:
+        """Kirim pesan sesuai encoding yang dinegosiasikan saat connect."""
+        if self.encoding == "msgpack":
+            await websocket.send_bytes(msgpack.packb(self.encode(message), use_bin_type=True))
+        else:
+            await websocket.send_json(message)
@@ -2,23 +2,73 @@
 WebSocket Connection Manager.
 Mengelola active WebSocket connections per device.
 Dirancang untuk single asyncio event loop (bukan multi-threaded).
+
+Liveness: setiap socket yang di-track dikirimi {"type": "ping"} secara
+periodik. Client yang pernah membalas {"action": "pong"} wajib terus
+membalas — jika diam lebih dari interval + grace, socket di-reap (close 4008).
+Client lama yang tidak pernah membalas pong tidak dikenai deadline di sini;
+socket half-open mereka ditutup oleh ping level protokol Uvicorn
+(--ws-ping-interval / --ws-ping-timeout di supervisord.conf), yang dijawab
+otomatis oleh browser. Endpoint lalu menerima disconnect dan memanggil untrack,
+sehingga slot admission ikut bebas.
 """
 
+import asyncio
 import logging
-from typing import Dict, Set
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+from uuid import UUID
 from fastapi import WebSocket
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Close code saat socket tidak menjawab ping dalam interval + grace
+WS_CLOSE_PING_TIMEOUT = 4008
+
+# Close code saat koneksi ditolak karena batas per user / per process penuh
+WS_CLOSE_TOO_MANY_CONNECTIONS = 4029
+
+
+class ConnectionInfo:
+    """Metadata liveness satu socket WebSocket."""
+
+    __slots__ = ("user_id", "connected_at", "last_seen", "answers_ping", "send")
+
+    def __init__(self, user_id: UUID, send: Callable[[dict], Awaitable[None]], now: float):
+        self.user_id = user_id
+        self.connected_at = now
+        self.last_seen = now
+        self.answers_ping = False
+        self.send = send
+
 
 class ConnectionManager:
     """
     Mengelola WebSocket connections.
     Setiap device bisa punya banyak subscriber (browser tabs).
+
+    Socket multiplexed (satu socket untuk banyak device) mendaftarkan
+    revoke handler, sehingga saat device dihapus/di-unclaim hanya
+    subscription device itu yang dilepas — socket-nya tetap hidup.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        max_per_user: int = settings.WS_MAX_CONNECTIONS_PER_USER,
+        max_per_process: int = settings.WS_MAX_CONNECTIONS_PER_PROCESS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.revoke_handlers: Dict[WebSocket, Callable[[str, int, str], Awaitable[None]]] = {}
+        self.connections: Dict[WebSocket, ConnectionInfo] = {}
+        self.user_connections: Dict[UUID, int] = {}
+        self.max_per_user = max_per_user
+        self.max_per_process = max_per_process
+        self.reaped_total = 0
+        self.rejected_total = 0
+        self._clock = clock
 
     def register(self, device_id: str, websocket: WebSocket):
         """Register WebSocket connection (accept sudah dilakukan di caller)."""
@@ -35,6 +85,125 @@ class ConnectionManager:
                 del self.active_connections[device_id]
         logger.debug(f"WS disconnected: device {device_id}")
 
+    def set_revoke_handler(self, websocket: WebSocket, handler: Callable[[str, int, str], Awaitable[None]]):
+        """Daftarkan handler untuk socket multiplexed: handler(device_id, code, reason)."""
+        self.revoke_handlers[websocket] = handler
+
+    def clear_revoke_handler(self, websocket: WebSocket):
+        """Hapus revoke handler (dipanggil saat socket multiplexed ditutup)."""
+        self.revoke_handlers.pop(websocket, None)
+
+    # ==========================================
+    # LIVENESS (PING/PONG + REAPING)
+    # ==========================================
+
+    def admission_error(self, user_id: UUID) -> Optional[str]:
+        """Alasan penolakan jika user/process sudah mencapai batas koneksi, None jika boleh. 0 = tanpa batas."""
+        if self.max_per_process and len(self.connections) >= self.max_per_process:
+            return "Server penuh, coba lagi nanti"
+        if self.max_per_user and self.user_connections.get(user_id, 0) >= self.max_per_user:
+            return "Terlalu banyak koneksi untuk user ini"
+        return None
+
+    def track(self, websocket: WebSocket, user_id: UUID, send: Callable[[dict], Awaitable[None]]) -> Optional[ConnectionInfo]:
+        """
+        Admission + mulai track liveness socket (setelah autentikasi berhasil).
+        send: coroutine pengirim pesan sesuai encoding socket (dipakai untuk ping).
+
+        Returns None jika batas koneksi penuh — caller menutup socket
+        dengan WS_CLOSE_TOO_MANY_CONNECTIONS.
+        """
+        reason = self.admission_error(user_id)
+        if reason is not None:
+            self.rejected_total += 1
+            logger.warning(f"WS ditolak untuk user {user_id}: {reason}")
+            return None
+        info = ConnectionInfo(user_id, send, self._clock())
+        self.connections[websocket] = info
+        self.user_connections[user_id] = self.user_connections.get(user_id, 0) + 1
+        return info
+
+    def untrack(self, websocket: WebSocket):
+        """Berhenti track socket (dipanggil di finally endpoint)."""
+        info = self.connections.pop(websocket, None)
+        if info is None:
+            return
+        remaining = self.user_connections.get(info.user_id, 0) - 1
+        if remaining > 0:
+            self.user_connections[info.user_id] = remaining
+        else:
+            self.user_connections.pop(info.user_id, None)
+
+    def touch(self, websocket: WebSocket, pong: bool = False):
+        """Catat aktivitas client. pong=True menandai client mendukung ping/pong."""
+        info = self.connections.get(websocket)
+        if info is None:
+            return
+        info.last_seen = self._clock()
+        if pong:
+            info.answers_ping = True
+
+    async def _reap(self, websocket: WebSocket, reason: str):
+        """Tutup socket mati dan lepas dari semua registry."""
+        self.untrack(websocket)
+        self.revoke_handlers.pop(websocket, None)
+        for device_id in list(self.active_connections):
+            self.disconnect(device_id, websocket)
+        self.reaped_total += 1
+        try:
+            await websocket.close(code=WS_CLOSE_PING_TIMEOUT, reason=reason)
+        except Exception:
+            pass  # Koneksi sudah mati
+
+    async def ping_and_reap(self, interval: float, grace: float) -> int:
+        """
+        Satu putaran liveness: reap socket yang melewati deadline pong,
+        kirim ping ke sisanya. Returns jumlah socket yang di-reap.
+        """
+        now = self._clock()
+        reaped = 0
+        for websocket, info in list(self.connections.items()):
+            if info.answers_ping and now - info.last_seen > interval + grace:
+                await self._reap(websocket, "Ping timeout")
+                reaped += 1
+                continue
+            try:
+                await info.send({"type": "ping", "ts": round(time.time(), 3)})
+            except Exception:
+                await self._reap(websocket, "Koneksi terputus")
+                reaped += 1
+        if reaped:
+            logger.info(f"WS reaper: {reaped} socket ditutup (total reaped: {self.reaped_total})")
+        return reaped
+
+    async def run_liveness_loop(self, interval: float, grace: float):
+        """Background task (di-start dari lifespan): ping + reap setiap interval detik."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.ping_and_reap(interval, grace)
+            except Exception as e:
+                logger.error(f"WS reaper error: {e}")
+
+    def stats(self) -> dict:
+        """Gauge koneksi (liveness + admission) untuk monitoring."""
+        now = self._clock()
+        ages = [now - info.connected_at for info in self.connections.values()]
+        return {
+            "connections": len(self.connections),
+            "device_subscriptions": self.get_total_connections(),
+            "devices": len(self.active_connections),
+            "answering_ping": sum(1 for info in self.connections.values() if info.answers_ping),
+            "oldest_age_seconds": round(max(ages), 1) if ages else 0.0,
+            "mean_age_seconds": round(sum(ages) / len(ages), 1) if ages else 0.0,
+            "reaped_total": self.reaped_total,
+            "users": len(self.user_connections),
+            "max_connections_per_user_in_use": max(self.user_connections.values(), default=0),
+            "max_connections_per_user": self.max_per_user,
+            "max_connections_per_process": self.max_per_process,
+            "rejected_total": self.rejected_total,
+        }
+
     async def broadcast(self, device_id: str, data: dict):
         """Kirim data ke semua subscriber device tertentu."""
         if device_id not in self.active_connections:
@@ -75,7 +244,12 @@ class ConnectionManager:
         closed = 0
         for ws in connections:
             try:
-                await ws.close(code=code, reason=reason)
+                handler = self.revoke_handlers.get(ws)
+                if handler is not None:
+                    # Socket multiplexed: lepas subscription device ini saja
+                    await handler(device_id, code, reason)
+                else:
+                    await ws.close(code=code, reason=reason)
                 closed += 1
             except Exception:
                 pass  # Connection mungkin sudah mati
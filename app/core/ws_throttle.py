@@ -0,0 +1,97 @@
+"""
+Throttling per subscriber untuk WebSocket stream.
+
+Viewer dengan koneksi lemah bisa memilih:
+- min_interval: jarak minimum antar update (detik) → batas update rate
+- deadband: perubahan minimum (absolut) pada temperature/humidity/ammonia
+  dibanding nilai yang TERAKHIR DIKIRIM, agar update dikirim
+
+Reading di antaranya tidak di-antrekan: state terbaru menimpa yang lama
+(merge), dan hanya state terbaru yang dikirim saat rate/threshold mengizinkan.
+Alert dan perubahan status online selalu dikirim langsung.
+"""
+
+import time
+from typing import Callable, Optional
+
+# Metrik yang dibandingkan terhadap deadband
+DEADBAND_FIELDS = ("temperature", "humidity", "ammonia")
+
+# Dengan deadband aktif, tetap kirim update minimal sekali per periode ini
+# agar client tahu stream masih hidup dan timestamp tidak basi.
+MAX_SILENCE_SECONDS = 300
+
+
+class StreamThrottle:
+    """
+    State throttle untuk SATU subscriber pada SATU device.
+    Tidak thread-safe — dipakai dari satu task asyncio saja.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.0,
+        deadband: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_interval = max(min_interval, 0.0)
+        self.deadband = max(deadband, 0.0)
+        self._clock = clock
+        self._pending: Optional[dict] = None
+        self._last_sent: Optional[dict] = None
+        self._last_sent_at: Optional[float] = None
+        self.suppressed = 0  # Jumlah reading yang di-merge / tidak pernah dikirim
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_interval > 0 or self.deadband > 0
+
+    def offer(self, payload: dict) -> None:
+        """Simpan reading terbaru. Reading pending sebelumnya ditimpa (merge)."""
+        if self._pending is not None:
+            self.suppressed += 1
+        self._pending = payload
+
+    def take(self) -> Optional[dict]:
+        """Return payload yang boleh dikirim sekarang, atau None."""
+        payload = self._pending
+        if payload is None:
+            return None
+
+        if self._should_send(payload):
+            self._pending = None
+            self._last_sent = payload
+            self._last_sent_at = self._clock()
+            return payload
+        return None
+
+    def _should_send(self, payload: dict) -> bool:
+        if not self.enabled or self._last_sent is None:
+            return True
+
+        latest = payload.get("latest") or {}
+        previous = self._last_sent.get("latest") or {}
+
+        # Alert dan perubahan status tidak boleh ditahan
+        if latest.get("is_alert") or payload.get("is_online") != self._last_sent.get("is_online"):
+            return True
+
+        elapsed = self._clock() - self._last_sent_at
+        if elapsed < self.min_interval:
+            return False
+
+        if self.deadband > 0:
+            if elapsed >= MAX_SILENCE_SECONDS:
+                return True
+            if latest.get("light_level") != previous.get("light_level"):
+                return True
+            for field in DEADBAND_FIELDS:
+                new, old = latest.get(field), previous.get(field)
+                if new is None or old is None:
+                    if new != old:
+                        return True
+                elif abs(new - old) >= self.deadband:
+                    return True
+            return False
+
+        return True
@@ -1,5 +1,9 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
@@ -7,15 +11,31 @@ logger = logging.getLogger(__name__)
 
 logger.info(f"Connecting to database...")
 
+_is_postgres = settings.DATABASE_URL.startswith("postgresql")
+
+# Engine async (asyncpg) untuk endpoint baca yang sering dipanggil (logs, status,
+# stats, list device, poll WebSocket) — tidak memakan slot threadpool AnyIO.
+# Hanya untuk PostgreSQL dan jika asyncpg terpasang; selain itu (SQLite test/dev)
+# get_read_db fallback ke Session sync yang dijalankan di thread.
+_use_async = False
+if _is_postgres and settings.DB_ASYNC_ENABLED:
+    try:
+        import asyncpg  # noqa: F401
+        _use_async = True
+    except ImportError:
+        logger.warning("asyncpg belum terpasang — endpoint baca memakai Session sync (threadpool)")
+
 # Pool parameters optimized for 2GB VPS with 2 Uvicorn workers.
 # SQLite (used in tests) doesn't support QueuePool parameters,
 # so only apply them for PostgreSQL.
 _engine_kwargs = {"pool_pre_ping": True}
 
-if settings.DATABASE_URL.startswith("postgresql"):
+if _is_postgres:
     _engine_kwargs.update({
-        "pool_size": 3,         # 3 persistent connections per worker (default: 5)
-        "max_overflow": 7,      # Up to 10 total per worker under burst (default: 10)
+        "pool_size": settings.DB_POOL_SIZE,
+        # Overflow tetap ada walau engine async aktif: export streaming memegang
+        # koneksi sync selama download dan tidak boleh memblokir endpoint sync lain
+        "max_overflow": settings.DB_MAX_OVERFLOW,
         "pool_timeout": 10,     # Fail fast if pool exhausted (default: 30)
         "pool_recycle": 1800,   # Recycle connections every 30 min
     })
@@ -32,6 +52,37 @@ Base = declarative_base()
 
 logger.info("Database engine created successfully")
 
+async_engine = None
+AsyncSessionLocal = None
+
+if _use_async:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+        pool_pre_ping=True,
+        pool_size=settings.DB_ASYNC_POOL_SIZE,
+        max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+        pool_timeout=10,
+        pool_recycle=1800,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    logger.info("Async database engine (asyncpg) created successfully")
+
+
+def max_connections_per_worker() -> Optional[int]:
+    """Batas koneksi PostgreSQL satu proses (pool sync + async); None untuk SQLite."""
+    if not _is_postgres:
+        return None
+    total = _engine_kwargs["pool_size"] + _engine_kwargs["max_overflow"]
+    if _use_async:
+        total += settings.DB_ASYNC_POOL_SIZE + settings.DB_ASYNC_MAX_OVERFLOW
+    return total
+
+
+if _is_postgres:
+    logger.info(f"Maksimum koneksi database per worker: {max_connections_per_worker()}")
+
 
 def get_db():
     db = SessionLocal()
@@ -43,3 +94,52 @@ def get_db():
         raise
     finally:
         db.close()
+
+
+class ReadSession:
+    """
+    Session baca yang selalu di-await, dengan API yang sama untuk dua backend:
+    AsyncSession (asyncpg) di PostgreSQL, atau Session sync yang dijalankan di
+    thread (SQLite/test). Hasil execute() sudah di-buffer, aman dibaca di event loop.
+    Hanya untuk SELECT dengan select() — tidak ada commit, tidak ada lazy load.
+    """
+
+    def __init__(self, session, is_async: bool):
+        self._session = session
+        self.is_async = is_async
+
+    async def execute(self, statement, params=None):
+        if self.is_async:
+            return await self._session.execute(statement, params)
+        frozen = await asyncio.to_thread(lambda: self._session.execute(statement, params).freeze())
+        return frozen()
+
+    async def scalar(self, statement, params=None):
+        return (await self.execute(statement, params)).scalar()
+
+    async def scalars(self, statement, params=None) -> list:
+        return (await self.execute(statement, params)).scalars().all()
+
+
+@asynccontextmanager
+async def read_session():
+    """Buka ReadSession (async jika tersedia). Dipakai get_read_db & loop poll WebSocket."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            yield ReadSession(session, is_async=True)
+        return
+    session = SessionLocal()
+    try:
+        yield ReadSession(session, is_async=False)
+    finally:
+        session.close()
+
+
+async def get_read_db():
+    """Dependency session baca untuk endpoint async (lihat ReadSession)."""
+    async with read_session() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database read session error: {str(e)}")
+            raise
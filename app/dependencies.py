@@ -1,11 +1,15 @@
 import logging
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from uuid import UUID
-from app.database import get_db
+from app.database import ReadSession, get_db
 from app.models.user import User, UserRole
 from app.core.security import verify_token
+from app.core.auth_cache import (
+    ACCESS_OWNER, AuthenticatedUser, aload_device_acl, device_access_level, load_device_acl, load_principal,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +23,10 @@ def get_current_user(
     """
     Dependency dasar: ambil user yang sedang login dari JWT token.
     Semua endpoint yang butuh autentikasi menggunakan dependency ini.
+
+    Identitas (id, email, role, is_active) diambil dari principal cache, jadi
+    sebagian besar request tidak query tabel users sama sekali. Returns
+    AuthenticatedUser — baris User lengkap di-load lazy (lihat .orm).
     """
     if credentials is None:
         raise HTTPException(
@@ -55,8 +63,8 @@ def get_current_user(
             detail="Token rusak (format ID user tidak valid)",
         )
 
-    user = db.query(User).filter(User.id == user_uuid).first()
-    if user is None:
+    principal = load_principal(user_uuid, db)
+    if principal is None:
         logger.warning(f"Auth GAGAL - User tidak ditemukan di DB: {user_id}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -64,15 +72,15 @@ def get_current_user(
         )
 
     # Cek apakah akun masih aktif
-    if not user.is_active:
-        logger.warning(f"Auth GAGAL - Akun nonaktif: {user.email}")
+    if not principal.is_active:
+        logger.warning(f"Auth GAGAL - Akun nonaktif: {principal.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Akun telah dinonaktifkan",
         )
 
-    logger.debug(f"Auth SUKSES - User {user.email} (role: {user.role})")
-    return user
+    logger.debug(f"Auth SUKSES - User {principal.email} (role: {principal.role})")
+    return AuthenticatedUser(principal, db)
 
 
 def get_current_admin(
@@ -117,41 +125,44 @@ def get_device_with_access(device_id: UUID, current_user: User, db: Session):
     - operator/viewer: akses device yang di-assign via device_assignments
     - user: TIDAK bisa akses device apapun
     
-    Returns: Device object jika punya akses, raise 404 jika tidak.
+    Keputusan akses diambil dari peta akses per user (auth_cache), bukan
+    query assignment per request. Returns: Device object jika punya akses,
+    raise 404 jika tidak.
     """
-    from app.models.device import Device, DeviceAssignment
+    from app.models.device import Device
 
-    # Super Admin bisa akses semua device
-    if current_user.role == UserRole.SUPER_ADMIN.value:
-        device = db.query(Device).filter(Device.id == device_id).first()
-        if not device:
-            raise HTTPException(status_code=404, detail="Device tidak ditemukan")
+    # User default: tidak bisa akses device apapun
+    if current_user.role not in UserRole.device_roles():
+        raise HTTPException(status_code=403, detail="Akses ditolak. Hubungi admin untuk mendapatkan akses ke device.")
+
+    acl = load_device_acl(current_user, db)
+    device = db.get(Device, device_id) if device_access_level(acl, device_id) else None
+    if device:
         return device
+    if current_user.role == UserRole.SUPER_ADMIN.value:
+        raise HTTPException(status_code=404, detail="Device tidak ditemukan")
+    raise HTTPException(status_code=404, detail="Device tidak ditemukan atau akses ditolak")
 
-    # Admin bisa akses device miliknya
-    if current_user.role == UserRole.ADMIN.value:
-        device = db.query(Device).filter(
-            Device.id == device_id,
-            Device.user_id == current_user.id
-        ).first()
-        if device:
-            return device
-        raise HTTPException(status_code=404, detail="Device tidak ditemukan atau akses ditolak")
-
-    # Operator dan Viewer bisa akses device yang di-assign
-    if current_user.role in [UserRole.OPERATOR.value, UserRole.VIEWER.value]:
-        assignment = db.query(DeviceAssignment).filter(
-            DeviceAssignment.device_id == device_id,
-            DeviceAssignment.user_id == current_user.id
-        ).first()
-        if assignment:
-            device = db.query(Device).filter(Device.id == device_id).first()
-            if device:
-                return device
-        raise HTTPException(status_code=404, detail="Device tidak ditemukan atau akses ditolak")
 
-    # User default: tidak bisa akses device apapun
-    raise HTTPException(status_code=403, detail="Akses ditolak. Hubungi admin untuk mendapatkan akses ke device.")
+async def get_device_with_access_async(device_id: UUID, current_user: User, db: ReadSession):
+    """
+    Versi async get_device_with_access untuk endpoint yang memakai get_read_db.
+    Aturan akses sama persis (peta akses yang sama).
+    """
+    from app.models.device import Device
+
+    if current_user.role not in UserRole.device_roles():
+        raise HTTPException(status_code=403, detail="Akses ditolak. Hubungi admin untuk mendapatkan akses ke device.")
+
+    acl = await aload_device_acl(current_user, db)
+    device = None
+    if device_access_level(acl, device_id):
+        device = await db.scalar(select(Device).where(Device.id == device_id))
+    if device:
+        return device
+    if current_user.role == UserRole.SUPER_ADMIN.value:
+        raise HTTPException(status_code=404, detail="Device tidak ditemukan")
+    raise HTTPException(status_code=404, detail="Device tidak ditemukan atau akses ditolak")
 
 
 def check_can_control_device(device_id: UUID, current_user: User, db: Session):
@@ -204,13 +215,8 @@ def get_owned_device(device_id: UUID, current_user: User, db: Session):
             detail="Hanya Admin yang bisa melakukan operasi ini."
         )
 
-    if current_user.role == UserRole.SUPER_ADMIN.value:
-        device = db.query(Device).filter(Device.id == device_id).first()
-    else:
-        device = db.query(Device).filter(
-            Device.id == device_id,
-            Device.user_id == current_user.id
-        ).first()
+    acl = load_device_acl(current_user, db)
+    device = db.get(Device, device_id) if device_access_level(acl, device_id) == ACCESS_OWNER else None
 
     if not device:
         raise HTTPException(status_code=404, detail="Device tidak ditemukan atau bukan milik Anda.")
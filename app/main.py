@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -16,6 +17,8 @@ from app.core.logging_config import setup_logging
 from app.core.config import settings
 from app.core.request_context import request_id_var, generate_request_id
 from app.core.limiter import limiter
+from app.core.ws_manager import ws_manager
+from app.core import partitions
 from app.models.user import User, UserRole
 
 # ==========================================
@@ -72,11 +75,30 @@ async def lifespan(app: FastAPI):
         logger.info("Environment: DEVELOPMENT")
         logger.info("API Docs available at: /docs")
         
+    # WebSocket liveness: ping periodik + reap socket mati (per worker process)
+    liveness_task = None
+    if settings.WS_PING_INTERVAL_SECONDS > 0:
+        liveness_task = asyncio.create_task(
+            ws_manager.run_liveness_loop(settings.WS_PING_INTERVAL_SECONDS, settings.WS_PING_GRACE_SECONDS)
+        )
+
+    # Partisi bulanan sensor_logs: buat partisi bulan mendatang secara periodik
+    # (no-op jika tabel belum dipartisi — lihat app/core/partitions.py)
+    partition_task = None
+    if engine.dialect.name == "postgresql" and settings.SENSOR_LOG_PARTITION_MONTHS_AHEAD > 0:
+        partition_task = asyncio.create_task(
+            partitions.run_maintenance_loop(settings.SENSOR_LOG_PARTITION_CHECK_SECONDS)
+        )
+
     logger.info("Server ready to accept connections")
     
     yield  # Server berjalan
     
     logger.info("Server shutting down...")
+    if liveness_task is not None:
+        liveness_task.cancel()
+    if partition_task is not None:
+        partition_task.cancel()
 
 # ==========================================
 # 3. APP INITIALIZATION
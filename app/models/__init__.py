@@ -1,4 +1,8 @@
 from .user import User, UserRole, FcmToken
 from .device import Device, SensorLog, DeviceAssignment
+from .rollup import SensorRollupHourly, SensorRollupDaily
 
-__all__ = ["User", "UserRole", "FcmToken", "Device", "SensorLog", "DeviceAssignment"]
+__all__ = [
+    "User", "UserRole", "FcmToken", "Device", "SensorLog", "DeviceAssignment",
+    "SensorRollupHourly", "SensorRollupDaily",
+]
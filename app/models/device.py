@@ -1,8 +1,9 @@
 import uuid
-from sqlalchemy import Boolean, Column, String, Float, ForeignKey, DateTime, Integer, UniqueConstraint, Index
+from datetime import datetime, timezone
+from sqlalchemy import Boolean, Column, String, Float, ForeignKey, DateTime, Integer, UniqueConstraint, Index, bindparam, event, inspect, text, update
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship
 from app.database import Base
 
 
@@ -15,6 +16,17 @@ class Device(Base):
     last_heartbeat = Column(DateTime(timezone=True), nullable=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)
 
+    # Counter jumlah sensor log & alert, di-maintain incremental (lihat
+    # _increment_log_counters) agar total pagination tidak perlu COUNT(*).
+    log_count = Column(Integer, nullable=False, default=0, server_default="0")
+    alert_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Versi isi device: naik saat field yang tampil di response berubah (nama, MAC,
+    # pemilik — lihat _bump_row_version), saat rollup di-rebuild, dan saat reading
+    # dihapus retention. Heartbeat & counter per reading TIDAK menaikkannya, jadi
+    # ETag endpoint baca tidak berubah di setiap ingest (migration 011).
+    row_version = Column(Integer, nullable=False, default=0, server_default="0")
+
     owner = relationship("User", back_populates="devices")
     logs = relationship("SensorLog", back_populates="device", cascade="all, delete-orphan")
     assignments = relationship("DeviceAssignment", back_populates="device", cascade="all, delete-orphan")
@@ -22,6 +34,8 @@ class Device(Base):
 
 
 class SensorLog(Base):
+    # Di PostgreSQL tabel ini dipartisi per bulan pada timestamp (migration 009,
+    # PK di database = (id, timestamp)) — lihat app/core/partitions.py.
     __tablename__ = "sensor_logs"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -35,11 +49,20 @@ class SensorLog(Base):
     is_alert = Column(Boolean, default=False)
     alert_message = Column(String, nullable=True)
 
-    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    # Default di sisi Python (UTC) agar timestamp sudah diketahui saat after_flush
+    # (rollup per jam/hari); server_default tetap untuk INSERT di luar ORM.
+    timestamp = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now(), index=True)
     device = relationship("Device", back_populates="logs")
 
     __table_args__ = (
         Index("ix_sensor_logs_device_timestamp", "device_id", timestamp.desc()),
+        # Partial index khusus alert (baris langka): /devices/{id}/alerts cukup
+        # membaca index ini, tidak menyapu seluruh riwayat device (migration 010)
+        Index(
+            "ix_sensor_logs_device_alerts", "device_id", timestamp.desc(), id.desc(),
+            postgresql_where=text("is_alert"),
+            sqlite_where=text("is_alert = 1"),
+        ),
     )
 
 
@@ -69,3 +92,58 @@ class DeviceAssignment(Base):
     __table_args__ = (
         UniqueConstraint("device_id", "user_id", name="uq_device_user_assignment"),
     )
+
+
+# Field Device yang ikut response list/status/stats; perubahannya menaikkan row_version
+VERSIONED_FIELDS = ("name", "mac_address", "user_id")
+
+
+@event.listens_for(Device, "before_update")
+def _bump_row_version(mapper, connection, target):
+    """Naikkan row_version di UPDATE yang sama jika salah satu VERSIONED_FIELDS berubah."""
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in VERSIONED_FIELDS):
+        target.row_version = Device.row_version + 1
+
+
+def flushed_readings(session: Session) -> list:
+    """
+    SensorLog yang baru di-INSERT pada flush ini. Dipanggil dari after_flush:
+    session.new masih berisi objek pra-flush, id & timestamp sudah terisi.
+    """
+    return [obj for obj in session.new if isinstance(obj, SensorLog) and obj.device_id is not None]
+
+
+@event.listens_for(Session, "after_flush")
+def _increment_log_counters(session, flush_context):
+    """
+    Naikkan counter device untuk semua reading di flush ini dengan SATU statement
+    UPDATE (executemany, satu parameter set per device), di transaksi yang sama
+    dengan INSERT. Reading yang masuk sekaligus menjadi heartbeat device, jadi
+    last_heartbeat ikut di-set di UPDATE yang sama (tidak ada UPDATE terpisah).
+
+    INSERT lewat Core/bulk (insert(SensorLog), bulk_insert_mappings) tidak melewati
+    listener ini — caller wajib memperbarui counter & rollup sendiri. Penghapusan
+    log massal (retention cleanup) juga wajib mengurangi counter sendiri.
+    """
+    per_device = {}
+    for log in flushed_readings(session):
+        logs, alerts = per_device.get(log.device_id, (0, 0))
+        per_device[log.device_id] = (logs + 1, alerts + (1 if log.is_alert else 0))
+    if not per_device:
+        return
+
+    table = Device.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c.id == bindparam("b_device_id", type_=table.c.id.type))
+        .values(
+            log_count=table.c.log_count + bindparam("b_logs"),
+            alert_count=table.c.alert_count + bindparam("b_alerts"),
+            last_heartbeat=func.now(),
+        ),
+        [
+            {"b_device_id": device_id, "b_logs": logs, "b_alerts": alerts}
+            for device_id, (logs, alerts) in per_device.items()
+        ],
+    )
@@ -0,0 +1,150 @@
+import math
+from datetime import timezone
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Integer, event, func
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session, declarative_mixin
+from app.database import Base
+from app.models.device import SensorLog, flushed_readings
+
+# Metrik yang di-rollup. Per metrik disimpan count (reading non-NULL), sum, min, max
+# sehingga rata-rata = sum / count bisa digabung lintas bucket tanpa kehilangan presisi.
+ROLLUP_METRICS = ("temperature", "humidity", "ammonia")
+
+
+@declarative_mixin
+class _RollupMetrics:
+    sample_count = Column(Integer, nullable=False, default=0, server_default="0")
+    alert_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    temperature_count = Column(Integer, nullable=False, default=0, server_default="0")
+    temperature_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    temperature_min = Column(Float, nullable=True)
+    temperature_max = Column(Float, nullable=True)
+
+    humidity_count = Column(Integer, nullable=False, default=0, server_default="0")
+    humidity_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    humidity_min = Column(Float, nullable=True)
+    humidity_max = Column(Float, nullable=True)
+
+    ammonia_count = Column(Integer, nullable=False, default=0, server_default="0")
+    ammonia_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    ammonia_min = Column(Float, nullable=True)
+    ammonia_max = Column(Float, nullable=True)
+
+
+class SensorRollupHourly(_RollupMetrics, Base):
+    """Agregat sensor_logs per device per jam (UTC)."""
+    __tablename__ = "sensor_rollup_hourly"
+
+    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Awal jam (UTC)
+
+
+class SensorRollupDaily(_RollupMetrics, Base):
+    """Agregat sensor_logs per device per hari (UTC). Sumber data /stats/daily."""
+    __tablename__ = "sensor_rollup_daily"
+
+    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+
+
+def _dialect_insert(connection):
+    """INSERT dengan dukungan ON CONFLICT sesuai dialect (PostgreSQL produksi, SQLite test)."""
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def upsert_rollups(connection, model, rows: list) -> None:
+    """
+    Gabungkan agregat ke baris rollup dengan SATU INSERT ... ON CONFLICT DO UPDATE
+    multi-row. Setiap row berisi primary key (device_id + bucket/day) dan agregat;
+    key harus unik dalam satu statement (gabungkan dulu dengan _merge_values).
+    count/sum dijumlahkan, min/max dibandingkan — atomic di level database,
+    aman untuk beberapa worker yang ingest bersamaan.
+    """
+    table = model.__table__
+    insert = _dialect_insert(connection)
+    least = func.least if connection.dialect.name == "postgresql" else func.min
+    greatest = func.greatest if connection.dialect.name == "postgresql" else func.max
+
+    stmt = insert(table).values(rows)
+    excluded = stmt.excluded
+    update_set = {
+        "sample_count": table.c.sample_count + excluded.sample_count,
+        "alert_count": table.c.alert_count + excluded.alert_count,
+    }
+    for metric in ROLLUP_METRICS:
+        current_min, new_min = table.c[f"{metric}_min"], excluded[f"{metric}_min"]
+        current_max, new_max = table.c[f"{metric}_max"], excluded[f"{metric}_max"]
+        update_set[f"{metric}_count"] = table.c[f"{metric}_count"] + excluded[f"{metric}_count"]
+        update_set[f"{metric}_sum"] = table.c[f"{metric}_sum"] + excluded[f"{metric}_sum"]
+        # coalesce di kedua sisi: NULL (belum ada nilai) tidak boleh menang
+        update_set[f"{metric}_min"] = least(func.coalesce(current_min, new_min), func.coalesce(new_min, current_min))
+        update_set[f"{metric}_max"] = greatest(func.coalesce(current_max, new_max), func.coalesce(new_max, current_max))
+
+    primary_key = [column.name for column in table.primary_key.columns]
+    connection.execute(stmt.on_conflict_do_update(index_elements=primary_key, set_=update_set))
+
+
+def _reading_values(log: SensorLog) -> dict:
+    values = {"sample_count": 1, "alert_count": 1 if log.is_alert else 0}
+    for metric in ROLLUP_METRICS:
+        value = getattr(log, metric)
+        present = value is not None and not math.isnan(value)
+        values[f"{metric}_count"] = 1 if present else 0
+        values[f"{metric}_sum"] = value if present else 0.0
+        values[f"{metric}_min"] = value if present else None
+        values[f"{metric}_max"] = value if present else None
+    return values
+
+
+def _merge_values(total: dict, values: dict) -> None:
+    """Gabungkan agregat satu reading ke agregat bucket yang sama (di memory)."""
+    total["sample_count"] += values["sample_count"]
+    total["alert_count"] += values["alert_count"]
+    for metric in ROLLUP_METRICS:
+        total[f"{metric}_count"] += values[f"{metric}_count"]
+        total[f"{metric}_sum"] += values[f"{metric}_sum"]
+        for part, pick in (("min", min), ("max", max)):
+            key = f"{metric}_{part}"
+            if values[key] is not None:
+                total[key] = values[key] if total[key] is None else pick(total[key], values[key])
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session, flush_context):
+    """
+    Update rollup jam & hari untuk semua reading di flush ini, di transaksi yang sama
+    dengan INSERT: reading digabung per bucket di memory, lalu satu upsert multi-row
+    per tabel. INSERT lewat Core/bulk tidak melewati listener ini (lihat
+    app.core.rollups untuk rebuild).
+    """
+    hourly, daily = {}, {}
+    for log in flushed_readings(session):
+        timestamp = log.timestamp
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        timestamp = timestamp.astimezone(timezone.utc)
+
+        values = _reading_values(log)
+        for buckets, key in (
+            (hourly, (log.device_id, timestamp.replace(minute=0, second=0, microsecond=0))),
+            (daily, (log.device_id, timestamp.date())),
+        ):
+            if key in buckets:
+                _merge_values(buckets[key], values)
+            else:
+                buckets[key] = dict(values)
+    if not hourly:
+        return
+
+    connection = session.connection()
+    upsert_rollups(connection, SensorRollupHourly, [
+        {"device_id": device_id, "bucket": bucket, **values} for (device_id, bucket), values in hourly.items()
+    ])
+    upsert_rollups(connection, SensorRollupDaily, [
+        {"device_id": device_id, "day": day, **values} for (device_id, day), values in daily.items()
+    ])
@@ -29,6 +29,11 @@ class UserRole(str, enum.Enum):
         """Role yang bisa akses admin dashboard"""
         return [cls.SUPER_ADMIN.value, cls.ADMIN.value]
 
+    @classmethod
+    def device_roles(cls):
+        """Role yang bisa punya akses ke device (semua kecuali user default)"""
+        return [cls.SUPER_ADMIN.value, cls.ADMIN.value, cls.OPERATOR.value, cls.VIEWER.value]
+
 
 class User(Base):
     __tablename__ = "users"
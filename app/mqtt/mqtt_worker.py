@@ -10,7 +10,6 @@ from app.database import SessionLocal
 from app.models.device import Device, SensorLog
 from app.core.config import settings
 from app.core.logging_config import setup_logging
-from sqlalchemy.sql import func
 
 # Setup logging (untuk standalone worker)
 setup_logging()
@@ -188,9 +187,8 @@ def on_message(client, userdata, msg):
 
         alert_msg = alert_msg.strip()
 
-        # Update heartbeat + Simpan log dalam SATU ATOMIC COMMIT
-        device.last_heartbeat = func.now()
-
+        # Simpan log; counter, heartbeat & rollup device di-update listener after_flush
+        # dalam transaksi yang sama (app/models/device.py, app/models/rollup.py)
         new_log = SensorLog(
             device_id=device.id,
             temperature=temp,
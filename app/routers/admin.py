@@ -8,10 +8,12 @@ from app.core.limiter import limiter
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.models.device import Device, DeviceAssignment
-from app.schemas.user import UserResponse
+from app.core.serializers import USER_ROWS
 from app.dependencies import get_current_admin, get_current_super_admin
 from app.core.config import settings
 from app.core.pagination import paginate
+from app.core.partitions import drop_expired_partitions, is_partitioned
+from app.core.ws_manager import ws_manager
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +74,16 @@ def get_admin_stats(
     }
 
 
+@router.get("/ws/stats")
+@limiter.limit("30/minute")
+def get_ws_stats(
+    request: Request,
+    admin_user: User = Depends(get_current_admin)
+):
+    """Gauge koneksi WebSocket di worker process ini (umur koneksi, jumlah di-reap). Khusus Admin+."""
+    return ws_manager.stats()
+
+
 @router.get("/users")
 @limiter.limit("30/minute")
 def get_all_users(
@@ -83,8 +95,9 @@ def get_all_users(
 ):
     """Daftar semua user dengan pagination. Khusus Admin+."""
     logger.info(f"{admin_user.role} {admin_user.email} mengambil daftar user (page={page})")
-    query = db.query(User).order_by(User.created_at.desc())
-    return paginate(query, page, limit, schema=UserResponse)
+    query = db.query(*USER_ROWS.columns).order_by(User.created_at.desc())
+    # Total user jarang berubah — count di-cache singkat
+    return paginate(query, page, limit, schema=USER_ROWS, count="cached")
 
 
 @router.post("/sync-firebase-users")
@@ -183,6 +196,9 @@ def cleanup_old_sensor_logs(
     
     - Jika `days` tidak diberikan, gunakan SENSOR_LOG_RETENTION_DAYS dari .env (default 365).
     - Jika SENSOR_LOG_RETENTION_DAYS = 0, cleanup di-disable (return error).
+    - Jika sensor_logs dipartisi per bulan (PostgreSQL), partisi bulan yang seluruhnya
+      lebih tua dari cutoff di-DETACH/DROP; bulan yang baru sebagian lewat cutoff
+      dipertahankan sampai bulan itu habis. Selain itu fallback ke DELETE per batch.
     """
     from datetime import datetime, timezone, timedelta
     from app.models.device import SensorLog
@@ -197,6 +213,21 @@ def cleanup_old_sensor_logs(
 
     cutoff_date = datetime.now(timezone.utc) - timedelta(days=retention_days)
 
+    if is_partitioned(db):
+        result = drop_expired_partitions(db, cutoff_date)
+        logger.warning(
+            f"CLEANUP oleh {admin_user.email}: {len(result['partitions'])} partisi dilepas, "
+            f"{result['deleted_count']} sensor logs (lebih lama dari {retention_days} hari, cutoff: {cutoff_date.isoformat()})"
+        )
+        return {
+            "status": "success",
+            "message": f"{result['deleted_count']} sensor logs berhasil dihapus ({len(result['partitions'])} partisi).",
+            "deleted_count": result["deleted_count"],
+            "retention_days": retention_days,
+            "cutoff_date": cutoff_date.isoformat(),
+            "partitions": result["partitions"],
+        }
+
     # Hitung dulu berapa yang akan dihapus (estimasi)
     count_to_delete = db.query(func.count(SensorLog.id)).filter(
         SensorLog.timestamp < cutoff_date
@@ -225,6 +256,21 @@ def cleanup_old_sensor_logs(
             break
 
         ids = [row[0] for row in batch_ids]
+
+        # Kurangi counter log/alert per device di transaksi yang sama dengan DELETE;
+        # row_version naik agar ETag stats/daily tidak mengembalikan 304 basi
+        per_device = db.query(
+            SensorLog.device_id,
+            func.count(SensorLog.id),
+            func.count(case((SensorLog.is_alert == True, 1))),
+        ).filter(SensorLog.id.in_(ids)).group_by(SensorLog.device_id).all()
+        for device_id, log_count, alert_count in per_device:
+            db.query(Device).filter(Device.id == device_id).update({
+                Device.log_count: Device.log_count - log_count,
+                Device.alert_count: Device.alert_count - alert_count,
+                Device.row_version: Device.row_version + 1,
+            }, synchronize_session=False)
+
         deleted = db.query(SensorLog).filter(
             SensorLog.id.in_(ids)
         ).delete(synchronize_session=False)
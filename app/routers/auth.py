@@ -7,11 +7,12 @@ from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 import firebase_admin
-from firebase_admin import credentials, auth
+from firebase_admin import credentials
 
 from app.database import get_db
 from app.models.user import User, UserRole
 from app.core.config import settings
+from app.core.firebase_tokens import ExpiredFirebaseToken, InvalidFirebaseToken, resolve_project_id, verify_id_token
 from app.core.security import create_access_token
 from app.core.limiter import limiter
 
@@ -29,16 +30,22 @@ if not firebase_admin._apps:
         cred = credentials.Certificate(FIREBASE_CREDENTIALS_FILE)
         firebase_admin.initialize_app(cred)
 
+FIREBASE_PROJECT_ID = resolve_project_id(FIREBASE_CREDENTIALS_FILE)
+
 class FirebaseLoginRequest(BaseModel):
     id_token: str = Field(max_length=4096)
 
 @router.post("/firebase/login")
 @limiter.limit("10/minute")
-async def firebase_login(request: Request, data: FirebaseLoginRequest, db: Session = Depends(get_db)):
-    """Menerima id_token dari Flutter (Firebase), memverifikasi, dan membuat/melanjutkan sesi lokal"""
+def firebase_login(request: Request, data: FirebaseLoginRequest, db: Session = Depends(get_db)):
+    """
+    Menerima id_token dari Flutter (Firebase), memverifikasi, dan membuat/melanjutkan sesi lokal.
+
+    Sync (jalan di threadpool): verifikasi token & upsert user tidak memblokir event loop.
+    """
     try:
-        # 1. Verifikasi token ke server Firebase
-        decoded_token = auth.verify_id_token(data.id_token)
+        # 1. Verifikasi token (lokal, sertifikat Google di-cache — lihat app.core.firebase_tokens)
+        decoded_token = verify_id_token(data.id_token, FIREBASE_PROJECT_ID)
 
         email = decoded_token.get('email')
         if not email:
@@ -113,10 +120,10 @@ async def firebase_login(request: Request, data: FirebaseLoginRequest, db: Sessi
             }
         }
 
-    except auth.InvalidIdTokenError:
-        raise HTTPException(status_code=401, detail="Token Firebase tidak valid.")
-    except auth.ExpiredIdTokenError:
+    except ExpiredFirebaseToken:
         raise HTTPException(status_code=401, detail="Token Firebase sudah kedaluwarsa.")
+    except InvalidFirebaseToken:
+        raise HTTPException(status_code=401, detail="Token Firebase tidak valid.")
     except HTTPException:
         raise  # Propagate intentional HTTP errors (403 deactivated, etc.)
     except Exception as e:
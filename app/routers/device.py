@@ -1,28 +1,41 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func, cast, Integer, String
-from typing import List
+from sqlalchemy import case, func, select
+from typing import List, Literal, Optional
 from uuid import UUID
 from app.core.limiter import limiter
-from app.database import get_db
+from app.database import ReadSession, get_db, get_read_db, SessionLocal
 from app.models.user import User, UserRole
 from app.models.device import Device, SensorLog, DeviceAssignment
+from app.models.rollup import ROLLUP_METRICS, SensorRollupDaily, SensorRollupHourly
 from app.schemas import DeviceClaim, DeviceResponse, LogResponse, DeviceRegister, DeviceUpdate
 from app.schemas.device import (
     DeviceControl, DailyTemperatureStats, DailyTemperatureStatsResponse,
-    DeviceAssignmentCreate, DeviceAssignmentResponse,
+    DeviceAssignmentCreate, DeviceAssignmentResponse, LogRangeResponse, AggregateResponse,
+    DeviceOverviewItem, DeviceOverviewResponse,
 )
 from app.dependencies import (
     get_current_user, get_current_admin, get_current_super_admin,
-    get_device_with_access, check_can_control_device, get_owned_device,
+    get_device_with_access, get_device_with_access_async, check_can_control_device, get_owned_device,
 )
 from app.mqtt.publisher import publish_control
 from app.core.config import settings
-from app.core.pagination import paginate
-from datetime import date as date_type, datetime, timezone, timedelta
+from app.core.pagination import apaginate, apaginate_keyset, paginate, paginate_keyset
+from app.core.downsample import lttb_series
+from app.core.serializers import DEVICE_ROWS, LOG_ROWS
+from app.core.export import ENCODERS, MEDIA_TYPES, parquet_available
+from app.core.aggregate import BUCKET_SECONDS, aggregate_buckets, bucket_start, choose_source, parse_aggs, raw_partials
+from datetime import datetime, timezone, timedelta
 import asyncio
+import numpy as np
 from app.core.ws_manager import ws_manager
+from app.core.auth_cache import invalidate_acl, invalidate_user
+from app.core.day_cache import daily_stats_cache
+from app.core.http_cache import make_etag, is_not_modified, not_modified_response, set_validators
+from app.core.negotiation import FORMAT_DESCRIPTION, ResponseFormat, negotiate_format, render
 
 logger = logging.getLogger(__name__)
 
@@ -31,12 +44,34 @@ router = APIRouter(
     tags=["Devices"]
 )
 
+# Range log untuk grafik: batas panjang rentang & jumlah titik per metrik
+LOG_RANGE_MAX_DAYS = 90
+LOG_RANGE_DEFAULT_POINTS = 500
+LOG_RANGE_MAX_POINTS = 2000
+# Jumlah baris per fetch saat streaming hasil query range (server-side cursor di PostgreSQL)
+LOG_RANGE_FETCH_SIZE = 5000
+_RANGE_METRICS = ("temperature", "humidity", "ammonia")
+# Export riwayat: jumlah baris per fetch server-side cursor = ukuran satu chunk output
+EXPORT_FETCH_SIZE = 5000
+
+# Endpoint agregat: rentang maksimal (rollup) & jumlah bucket maksimal per request.
+# Sumber raw (bucket < 1 jam / persentil) dibatasi LOG_RANGE_MAX_DAYS.
+AGGREGATE_MAX_DAYS = 366
+AGGREGATE_MAX_BUCKETS = 5000
+
+# Kolom urutan keyset pagination sensor log: (timestamp DESC, id DESC).
+# id sebagai tiebreaker untuk reading dengan timestamp sama.
+LOG_CURSOR_COLUMNS = (SensorLog.timestamp, SensorLog.id)
+# Kolom statistics pada format columnar/msgpack (termasuk computed field status)
+DAILY_STATS_KEYS = (*DailyTemperatureStats.model_fields, *DailyTemperatureStats.model_computed_fields)
+
 
 def _close_device_websockets(device_id: str, reason: str = "Device dihapus"):
     """
     Schedule WebSocket cleanup dari sync context.
     Sync endpoints berjalan di threadpool, jadi kita gunakan
     run_coroutine_threadsafe untuk menjadwalkan async close di event loop.
+    Peta akses user terdampak di-invalidate oleh caller (invalidate_acl/invalidate_user).
     """
     try:
         loop = asyncio.get_event_loop()
@@ -153,6 +188,7 @@ def claim_device(
     device.name = device_in.name
     db.commit()
     db.refresh(device)
+    invalidate_acl(current_user.id)
 
     logger.info(f"Klaim SUKSES - Device {device.mac_address} diklaim oleh {current_user.email}")
     return device
@@ -163,11 +199,12 @@ def claim_device(
 # ==========================================
 @router.get("/")
 @limiter.limit("30/minute")
-def read_my_devices(
+async def read_my_devices(
     request: Request,
+    response: Response,
     page: int = Query(default=1, ge=1, description="Nomor halaman"),
     limit: int = Query(default=20, ge=1, le=100, description="Item per halaman"),
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -176,20 +213,141 @@ def read_my_devices(
     - admin: device miliknya
     - operator/viewer: device yang di-assign
     - user: empty list
+
+    Mendukung If-None-Match: jika versi device tidak berubah, jawab 304 tanpa membangun halaman.
+    """
+    stmt = _visible_devices_statement(current_user, DEVICE_ROWS.columns)
+    if stmt is None:
+        return {"data": [], "total": 0, "page": page, "limit": limit, "total_pages": 0}
+
+    *version, last_heartbeat = (await db.execute(_devices_version_statement(current_user))).one()
+    etag = make_etag(
+        "devices", current_user.id, current_user.role, page, limit, *version, _heartbeat_window(last_heartbeat),
+    )
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_validators(response, etag)
+
+    return await apaginate(db, stmt, page, limit, schema=DEVICE_ROWS)
+
+
+def _devices_version_statement(current_user: User):
+    """
+    Token versi list device dalam satu query agregat kecil: jumlah device, total
+    row_version (rename/claim), device terbaru (hapus + daftar baru), jumlah device
+    online (berubah karena waktu, tanpa UPDATE), dan heartbeat terbaru (dibulatkan
+    lewat _heartbeat_window oleh caller).
+    """
+    online_cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
+    return _visible_devices_statement(current_user, (
+        func.count(Device.id),
+        func.coalesce(func.sum(Device.row_version), 0),
+        func.max(Device.created_at),
+        func.count(case((Device.last_heartbeat >= online_cutoff, 1))),
+        func.max(Device.last_heartbeat),
+    ))
+
+
+def _heartbeat_window(last_heartbeat: Optional[datetime]) -> Optional[int]:
+    """
+    Heartbeat dibulatkan ke jendela DEVICE_ONLINE_TIMEOUT_SECONDS untuk ETag. Tiap
+    reading menggeser last_heartbeat; dengan token ini ETag paling sering berubah
+    sekali per jendela, dan last_seen di cache client tertinggal paling lama satu jendela.
     """
+    if last_heartbeat is None:
+        return None
+    if last_heartbeat.tzinfo is None:
+        last_heartbeat = last_heartbeat.replace(tzinfo=timezone.utc)
+    return int(last_heartbeat.timestamp() // max(settings.DEVICE_ONLINE_TIMEOUT_SECONDS, 1))
+
+
+def _visible_devices_statement(current_user: User, columns=(Device,)):
+    """select(*columns) atas device yang boleh dilihat user sesuai role, atau None untuk role user."""
+    stmt = select(*columns)
     if current_user.role == UserRole.SUPER_ADMIN.value:
-        query = db.query(Device)
-    elif current_user.role == UserRole.ADMIN.value:
-        query = db.query(Device).filter(Device.user_id == current_user.id)
-    elif current_user.role in [UserRole.OPERATOR.value, UserRole.VIEWER.value]:
-        assigned_device_ids = db.query(DeviceAssignment.device_id).filter(
+        return stmt
+    if current_user.role == UserRole.ADMIN.value:
+        return stmt.where(Device.user_id == current_user.id)
+    if current_user.role in [UserRole.OPERATOR.value, UserRole.VIEWER.value]:
+        assigned_device_ids = select(DeviceAssignment.device_id).where(
             DeviceAssignment.user_id == current_user.id
         ).scalar_subquery()
-        query = db.query(Device).filter(Device.id.in_(assigned_device_ids))
-    else:
-        return {"data": [], "total": 0, "page": page, "limit": limit, "total_pages": 0}
+        return stmt.where(Device.id.in_(assigned_device_ids))
+    return None
+
 
-    return paginate(query, page, limit, schema=DeviceResponse)
+def _online_state(last_heartbeat: Optional[datetime], now: datetime) -> tuple[bool, Optional[int]]:
+    """(is_online, detik sejak heartbeat terakhir) — None jika device belum pernah terhubung."""
+    if not last_heartbeat:
+        return False, None
+    if last_heartbeat.tzinfo is None:
+        last_heartbeat = last_heartbeat.replace(tzinfo=timezone.utc)
+    seconds_since = (now - last_heartbeat).total_seconds()
+    return seconds_since <= settings.DEVICE_ONLINE_TIMEOUT_SECONDS, round(seconds_since)
+
+
+# ==========================================
+# 2.1 OVERVIEW SEMUA DEVICE (HOME SCREEN)
+# ==========================================
+@router.get("/overview", response_model=DeviceOverviewResponse)
+@limiter.limit("30/minute")
+async def read_devices_overview(
+    request: Request,
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Semua device yang bisa dilihat user beserta status online, reading terakhir,
+    dan jumlah alert hari ini — pengganti list + status + logs?limit=1 per device.
+
+    Jumlah query konstan berapa pun jumlah device:
+    1. Device LEFT JOIN reading terakhir (correlated subquery per device di index
+       (device_id, timestamp DESC), setara LATERAL ... LIMIT 1)
+    2. Alert hari ini dari rollup harian (satu baris per device)
+    """
+    now = datetime.now(timezone.utc)
+    stmt = _visible_devices_statement(current_user)
+    if stmt is None:
+        return DeviceOverviewResponse(generated_at=now, total=0, data=[])
+
+    latest_log_id = (
+        select(SensorLog.id)
+        .where(SensorLog.device_id == Device.id)
+        .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+        .limit(1)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+    rows = (await db.execute(
+        stmt.add_columns(SensorLog)
+        .outerjoin(SensorLog, SensorLog.id == latest_log_id)
+        .order_by(Device.name, Device.id)
+    )).all()
+
+    alerts_today = {}
+    if rows:
+        alerts_today = dict((await db.execute(
+            select(SensorRollupDaily.device_id, SensorRollupDaily.alert_count).where(
+                SensorRollupDaily.day == now.date(),
+                SensorRollupDaily.device_id.in_([device.id for device, _ in rows]),
+            )
+        )).all())
+
+    data = []
+    for device, latest_log in rows:
+        is_online, seconds_since = _online_state(device.last_heartbeat, now)
+        data.append(DeviceOverviewItem(
+            id=device.id,
+            mac_address=device.mac_address,
+            name=device.name,
+            user_id=device.user_id,
+            last_heartbeat=device.last_heartbeat,
+            is_online=is_online,
+            seconds_since_last_seen=seconds_since,
+            latest=LogResponse.model_validate(latest_log) if latest_log else None,
+            alerts_today=alerts_today.get(device.id) or 0,
+        ))
+    return DeviceOverviewResponse(generated_at=now, total=len(data), data=data)
 
 
 # ==========================================
@@ -205,8 +363,8 @@ def get_unclaimed_devices(
     admin_user: User = Depends(get_current_admin)
 ):
     """Daftar device yang belum diklaim. Khusus Admin+."""
-    query = db.query(Device).filter(Device.user_id == None)
-    return paginate(query, page, limit, schema=DeviceResponse)
+    query = db.query(*DEVICE_ROWS.columns).filter(Device.user_id == None)
+    return paginate(query, page, limit, schema=DEVICE_ROWS)
 
 
 # ==========================================
@@ -227,12 +385,12 @@ def get_all_devices(
     - Admin: lihat device miliknya + unclaimed
     """
     if admin_user.role == UserRole.SUPER_ADMIN.value:
-        query = db.query(Device).order_by(Device.created_at.desc())
+        query = db.query(*DEVICE_ROWS.columns).order_by(Device.created_at.desc())
     else:
-        query = db.query(Device).filter(
+        query = db.query(*DEVICE_ROWS.columns).filter(
             (Device.user_id == admin_user.id) | (Device.user_id == None)
         ).order_by(Device.created_at.desc())
-    return paginate(query, page, limit, schema=DeviceResponse)
+    return paginate(query, page, limit, schema=DEVICE_ROWS)
 
 
 # ==========================================
@@ -300,8 +458,13 @@ def delete_device(
     for uid in affected_user_ids:
         _check_and_downgrade_role(db, uid)
 
+    owner_id = device.user_id
     db.delete(device)
     db.commit()
+    if owner_id:
+        invalidate_acl(owner_id)
+    for uid in affected_user_ids:
+        invalidate_user(uid)
 
     # Tutup semua WebSocket connections yang sedang streaming device ini
     _close_device_websockets(str(device_id))
@@ -321,22 +484,301 @@ def delete_device(
 # ==========================================
 @router.get("/{device_id}/logs")
 @limiter.limit("60/minute")
-def read_device_logs(
+async def read_device_logs(
     request: Request,
+    response: Response,
     device_id: UUID,
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, max_length=200),
+    format: Optional[ResponseFormat] = Query(default=None, description=FORMAT_DESCRIPTION),
+    db: ReadSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Lihat history data sensor dengan pagination. Semua role yang punya akses ke device.
+    Kirim cursor=<next_cursor> untuk keyset pagination (tanpa COUNT/OFFSET);
+    tanpa cursor, mode page lama tetap berlaku. format=columnar/msgpack (atau header
+    Accept) mengirim `data` sebagai kolom, bukan array of object.
+    """
+    device = await get_device_with_access_async(device_id, current_user, db)
+    fmt = negotiate_format(request, format)
+
+    stmt = select(*LOG_ROWS.columns)\
+        .where(SensorLog.device_id == device_id)\
+        .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+
+    if cursor is not None:
+        result = await apaginate_keyset(db, stmt, LOG_CURSOR_COLUMNS, cursor, limit, schema=LOG_ROWS)
+    else:
+        # Total dari counter per device (di-maintain saat insert/cleanup), bukan COUNT(*)
+        result = await apaginate(
+            db, stmt, page, limit, schema=LOG_ROWS, cursor_columns=LOG_CURSOR_COLUMNS,
+            count="estimated", total=device.log_count,
+        )
+    return render(result, fmt, response, keys=LOG_ROWS.keys)
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Datetime naive dianggap UTC (SQLite mengembalikan naive)."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _load_log_range(db: Session, device_id: UUID, start: datetime, end: datetime) -> tuple:
+    """
+    Ambil reading dalam [start, end] sebagai array NumPy (epoch ms + satu array per metrik).
+    Satu range query di index (device_id, timestamp); hasil di-stream per partisi
+    (yield_per) sehingga tidak ada list ORM object besar di memory.
+    """
+    stmt = select(
+        SensorLog.timestamp, SensorLog.temperature, SensorLog.humidity, SensorLog.ammonia,
+    ).where(
+        SensorLog.device_id == device_id,
+        SensorLog.timestamp >= start,
+        SensorLog.timestamp <= end,
+    ).order_by(SensorLog.timestamp.asc(), SensorLog.id.asc()).execution_options(yield_per=LOG_RANGE_FETCH_SIZE)
+
+    epoch_ms: list = []
+    columns = {metric: [] for metric in _RANGE_METRICS}
+    for partition in db.execute(stmt).partitions():
+        for timestamp, temperature, humidity, ammonia in partition:
+            if timestamp is None:
+                continue
+            epoch_ms.append(_as_utc(timestamp).timestamp() * 1000)
+            columns["temperature"].append(temperature)
+            columns["humidity"].append(humidity)
+            columns["ammonia"].append(ammonia)
+
+    arrays = {metric: np.array(values, dtype=np.float64) for metric, values in columns.items()}
+    return np.array(epoch_ms, dtype=np.float64), arrays
+
+
+@router.get("/{device_id}/logs/range", response_model=LogRangeResponse)
+@limiter.limit("30/minute")
+def read_device_log_range(
+    request: Request,
+    response: Response,
+    device_id: UUID,
+    start: Optional[datetime] = Query(default=None, alias="from", description="Awal rentang (default: 24 jam sebelum `to`)"),
+    end: Optional[datetime] = Query(default=None, alias="to", description="Akhir rentang (default: sekarang)"),
+    max_points: int = Query(default=LOG_RANGE_DEFAULT_POINTS, ge=3, le=LOG_RANGE_MAX_POINTS),
+    format: Optional[ResponseFormat] = Query(default=None, description=FORMAT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Lihat history data sensor dengan pagination. Semua role yang punya akses ke device."""
+    """
+    Data sensor satu rentang waktu untuk grafik, di-downsample di server (LTTB)
+    ke maksimal max_points titik per metrik. Satu request menggantikan ratusan
+    request /logs per halaman. Semua role yang punya akses ke device.
+    """
     device = get_device_with_access(device_id, current_user, db)
 
-    query = db.query(SensorLog)\
-        .filter(SensorLog.device_id == device_id)\
-        .order_by(SensorLog.timestamp.desc())
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Parameter 'from' harus lebih awal dari 'to'.")
+    if end - start > timedelta(days=LOG_RANGE_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Rentang maksimal {LOG_RANGE_MAX_DAYS} hari.")
+
+    epoch_ms, arrays = _load_log_range(db, device_id, start, end)
+
+    result = {
+        "device_id": device.id,
+        "device_name": device.name,
+        "start": start,
+        "end": end,
+        "max_points": max_points,
+        "raw_points": len(epoch_ms),
+        "method": "lttb",
+        "series": {metric: lttb_series(epoch_ms, values, max_points) for metric, values in arrays.items()},
+    }
+    # Sudah columnar; format lain hanya mengganti encoding (msgpack)
+    fmt = negotiate_format(request, format)
+    if fmt != "json":
+        result = LogRangeResponse.model_validate(result).model_dump(mode="json", by_alias=True)
+    return render(result, fmt, response, list_key=None)
 
-    return paginate(query, page, limit, schema=LogResponse)
+
+def _export_partitions(device_id: UUID, start: Optional[datetime], end: datetime):
+    """
+    Stream baris log untuk export per partisi (yield_per → server-side cursor di PostgreSQL).
+    Session dibuka sendiri karena generator berjalan setelah dependency get_db selesai.
+    """
+    stmt = select(
+        SensorLog.id, SensorLog.timestamp, SensorLog.temperature, SensorLog.humidity,
+        SensorLog.ammonia, SensorLog.light_level, SensorLog.is_alert, SensorLog.alert_message,
+    ).where(SensorLog.device_id == device_id, SensorLog.timestamp <= end)
+    if start is not None:
+        stmt = stmt.where(SensorLog.timestamp >= start)
+    stmt = stmt.order_by(SensorLog.timestamp.asc(), SensorLog.id.asc()).execution_options(yield_per=EXPORT_FETCH_SIZE)
+
+    db = SessionLocal()
+    try:
+        for partition in db.execute(stmt).partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+async def _stream_until_disconnect(request: Request, chunks):
+    """Kirim chunk dari generator sync (di threadpool); berhenti begitu client putus."""
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            if await request.is_disconnected():
+                logger.info(f"Export dihentikan: client terputus ({request.url.path})")
+                break
+            yield chunk
+    finally:
+        # Tutup generator → cursor & session database ikut ditutup. Jika masih
+        # berjalan di threadpool (task di-cancel), generator ditutup saat di-GC.
+        try:
+            chunks.close()
+        except ValueError:
+            pass
+
+
+@router.get("/{device_id}/logs/export")
+@limiter.limit("5/minute")
+def export_device_logs(
+    request: Request,
+    device_id: UUID,
+    start: Optional[datetime] = Query(default=None, alias="from", description="Awal rentang (default: seluruh riwayat)"),
+    end: Optional[datetime] = Query(default=None, alias="to", description="Akhir rentang (default: sekarang)"),
+    format: Literal["csv", "ndjson", "msgpack", "parquet"] = Query(default="csv", description="Format file export"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export riwayat sensor satu device sebagai file (CSV, NDJSON, MessagePack columnar, atau Parquet).
+    Data di-stream per chunk dari server-side cursor sehingga memory konstan
+    berapa pun jumlah barisnya. Semua role yang punya akses ke device.
+    """
+    device = get_device_with_access(device_id, current_user, db)
+
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else None
+    if start is not None and start >= end:
+        raise HTTPException(status_code=400, detail="Parameter 'from' harus lebih awal dari 'to'.")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=400, detail="Export parquet tidak tersedia di server ini (pyarrow belum terpasang).")
+
+    logger.info(f"User {current_user.email} export logs device '{device.name}' ({format})")
+
+    filename = f"sensor_logs_{device_id}_{end:%Y%m%d}.{format}"
+    chunks = ENCODERS[format](_export_partitions(device_id, start, end))
+    return StreamingResponse(
+        _stream_until_disconnect(request, chunks),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _load_rollup_partials(db: Session, source: str, device_id: UUID, start: datetime, end: datetime, metrics: List[str]) -> tuple:
+    """
+    Ambil baris rollup (hourly/daily) dalam rentang sebagai array NumPy:
+    epoch detik awal jam/hari + partial count/sum/min/max per metrik.
+    """
+    model, key = (SensorRollupDaily, SensorRollupDaily.day) if source == "daily" else (SensorRollupHourly, SensorRollupHourly.bucket)
+    columns = [getattr(model, f"{metric}_{part}") for metric in metrics for part in ("count", "sum", "min", "max")]
+    if source == "daily":
+        # Hari yang beririsan dengan [start, end)
+        window = (key >= start.date(), key <= (end - timedelta(microseconds=1)).date())
+    else:
+        window = (key >= start, key < end)
+    stmt = select(key, *columns).where(model.device_id == device_id, *window).order_by(key.asc())
+
+    rows = db.execute(stmt).all()
+    if source == "daily":
+        epoch_s = np.array([row[0] for row in rows], dtype="datetime64[D]").astype("datetime64[s]").astype(np.int64)
+    else:
+        epoch_s = np.array([_as_utc(row[0]).timestamp() for row in rows], dtype=np.int64)
+
+    partials = {}
+    for i, metric in enumerate(metrics):
+        offset = 1 + i * 4
+        partials[metric] = {
+            part: np.array([row[offset + j] for row in rows], dtype=np.float64)
+            for j, part in enumerate(("count", "sum", "min", "max"))
+        }
+    return epoch_s, partials
+
+
+@router.get("/{device_id}/aggregate", response_model=AggregateResponse)
+@limiter.limit("30/minute")
+def read_device_aggregate(
+    request: Request,
+    response: Response,
+    device_id: UUID,
+    start: Optional[datetime] = Query(default=None, alias="from", description="Awal rentang (default: 24 jam sebelum `to`)"),
+    end: Optional[datetime] = Query(default=None, alias="to", description="Akhir rentang, eksklusif (default: sekarang)"),
+    bucket: str = Query(default="1h", description="Ukuran bucket: " + ", ".join(BUCKET_SECONDS)),
+    metrics: str = Query(default=",".join(ROLLUP_METRICS), description="Metrik, dipisah koma"),
+    aggs: str = Query(default="avg,min,max", description="Agregat: avg, min, max, count, p1..p99"),
+    format: Optional[ResponseFormat] = Query(default=None, description=FORMAT_DESCRIPTION),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Agregat sensor per bucket waktu (5 menit s/d 1 bulan). Server memilih sumber
+    paling kasar yang cukup (rollup harian, rollup per jam, atau log mentah) sehingga
+    latency tidak tumbuh seiring panjang rentang. Semua role yang punya akses ke device.
+    """
+    if bucket not in BUCKET_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Bucket tidak valid. Pilihan: {', '.join(BUCKET_SECONDS)}.")
+    metric_list = list(dict.fromkeys(m.strip() for m in metrics.split(",") if m.strip()))
+    if not metric_list or any(m not in ROLLUP_METRICS for m in metric_list):
+        raise HTTPException(status_code=400, detail=f"Metrik tidak valid. Pilihan: {', '.join(ROLLUP_METRICS)}.")
+    try:
+        agg_list = parse_aggs([a.strip() for a in aggs.split(",") if a.strip()])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Agregat tidak valid: {e}. Pilihan: avg, min, max, count, p1..p99.")
+    if not agg_list:
+        raise HTTPException(status_code=400, detail="Minimal satu agregat.")
+
+    device = get_device_with_access(device_id, current_user, db)
+
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="Parameter 'from' harus lebih awal dari 'to'.")
+    if end - start > timedelta(days=AGGREGATE_MAX_DAYS):
+        raise HTTPException(status_code=400, detail=f"Rentang maksimal {AGGREGATE_MAX_DAYS} hari.")
+
+    source = choose_source(bucket, agg_list)
+    if source == "raw" and end - start > timedelta(days=LOG_RANGE_MAX_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bucket < 1 jam atau agregat persentil maksimal {LOG_RANGE_MAX_DAYS} hari.",
+        )
+    # Bucket pertama dimulai dari awal bucket yang memuat `from`
+    start = datetime.fromtimestamp(int(bucket_start([int(start.timestamp())], bucket)[0]), tz=timezone.utc)
+    bucket_seconds = BUCKET_SECONDS[bucket]
+    if bucket_seconds and (end - start).total_seconds() / bucket_seconds > AGGREGATE_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Terlalu banyak bucket (maksimal {AGGREGATE_MAX_BUCKETS}). Perbesar bucket atau perkecil rentang.")
+
+    if source == "raw":
+        epoch_ms, arrays = _load_log_range(db, device_id, start, end - timedelta(microseconds=1))
+        epoch_s = (epoch_ms // 1000).astype(np.int64)
+        partials = {metric: raw_partials(arrays[metric]) for metric in metric_list}
+    else:
+        epoch_s, partials = _load_rollup_partials(db, source, device_id, start, end, metric_list)
+
+    result = {
+        "device_id": device.id,
+        "device_name": device.name,
+        "start": start,
+        "end": end,
+        "bucket": bucket,
+        "source": source,
+        "metrics": metric_list,
+        "aggs": agg_list,
+        **aggregate_buckets(epoch_s, bucket, partials, agg_list),
+    }
+    # Sudah columnar; format lain hanya mengganti encoding (msgpack)
+    fmt = negotiate_format(request, format)
+    if fmt != "json":
+        result = AggregateResponse.model_validate(result).model_dump(mode="json", by_alias=True)
+    return render(result, fmt, response, list_key=None)
 
 
 # ==========================================
@@ -368,82 +810,126 @@ def control_device(
 # ==========================================
 # 4. LIHAT ALERTS (DENGAN ACCESS CHECK)
 # ==========================================
+def _alerts_query(db: Session, device_id: UUID):
+    """
+    Query alert satu device. Filter & urutan sama persis dengan partial index
+    ix_sensor_logs_device_alerts (device_id, timestamp DESC, id DESC) WHERE is_alert,
+    sehingga halaman keyset = index range scan, tidak tergantung total volume log.
+    """
+    return db.query(*LOG_ROWS.columns)\
+        .filter(SensorLog.device_id == device_id, SensorLog.is_alert == True)\
+        .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+
+
 @router.get("/{device_id}/alerts")
 @limiter.limit("60/minute")
 def get_device_alerts(
     request: Request,
+    response: Response,
     device_id: UUID,
     page: int = Query(default=1, ge=1),
     limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, max_length=200),
+    format: Optional[ResponseFormat] = Query(default=None, description=FORMAT_DESCRIPTION),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Lihat riwayat alert dengan pagination. Semua role yang punya akses ke device."""
+    """Lihat riwayat alert dengan pagination (page atau cursor, sama seperti /logs, termasuk format). Semua role yang punya akses ke device."""
     device = get_device_with_access(device_id, current_user, db)
+    fmt = negotiate_format(request, format)
 
-    query = db.query(SensorLog)\
-        .filter(SensorLog.device_id == device_id, SensorLog.is_alert == True)\
-        .order_by(SensorLog.timestamp.desc())
-
-    return paginate(query, page, limit, schema=LogResponse)
+    query = _alerts_query(db, device_id)
+    if cursor is not None:
+        result = paginate_keyset(query, LOG_CURSOR_COLUMNS, cursor, limit, schema=LOG_ROWS)
+    else:
+        result = paginate(
+            query, page, limit, schema=LOG_ROWS, cursor_columns=LOG_CURSOR_COLUMNS,
+            count="estimated", total=device.alert_count,
+        )
+    return render(result, fmt, response, keys=LOG_ROWS.keys)
 
 
 # ==========================================
 # 5. STATISTIK HARIAN (DENGAN ACCESS CHECK)
 # ==========================================
+def _daily_stats_from_rollup(row: SensorRollupDaily) -> dict:
+    """Field DailyTemperatureStats dari satu baris rollup harian (avg = sum / count)."""
+    return {
+        "date": row.day.isoformat(),
+        "avg_temperature": row.temperature_sum / row.temperature_count if row.temperature_count else 0.0,
+        "min_temperature": row.temperature_min or 0.0,
+        "max_temperature": row.temperature_max or 0.0,
+        "avg_humidity": row.humidity_sum / row.humidity_count if row.humidity_count else 0.0,
+        "avg_ammonia": row.ammonia_sum / row.ammonia_count if row.ammonia_count else 0.0,
+        "data_points": row.sample_count or 0,
+        "alert_count": row.alert_count or 0,
+    }
+
+
 @router.get("/{device_id}/stats/daily", response_model=DailyTemperatureStatsResponse)
 @limiter.limit("30/minute")
-def get_daily_temperature_stats(
+async def get_daily_temperature_stats(
     request: Request,
+    response: Response,
     device_id: UUID,
     days: int = Query(default=7, ge=1, le=90, description="Jumlah hari ke belakang (1-90)"),
-    db: Session = Depends(get_db),
+    format: Optional[ResponseFormat] = Query(default=None, description=FORMAT_DESCRIPTION),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Statistik rata-rata suhu harian. Semua role yang punya akses ke device."""
+    """
+    Statistik rata-rata suhu harian. Semua role yang punya akses ke device.
+    format=columnar/msgpack (atau header Accept) mengirim `statistics` sebagai kolom.
+    """
     logger.info(f"User {current_user.email} mengambil statistik harian device_id: {device_id}, days: {days}")
 
-    device = get_device_with_access(device_id, current_user, db)
+    device = await get_device_with_access_async(device_id, current_user, db)
 
-    today = datetime.now(timezone.utc).date()
+    now = datetime.now(timezone.utc)
+    today = now.date()
     start_date = today - timedelta(days=days - 1)
-    start_datetime = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
-
-    log_date = func.date(SensorLog.timestamp, type_=String).label("log_date")
-
-    daily_stats = db.query(
-        log_date,
-        func.avg(SensorLog.temperature).label("avg_temperature"),
-        func.min(SensorLog.temperature).label("min_temperature"),
-        func.max(SensorLog.temperature).label("max_temperature"),
-        func.avg(SensorLog.humidity).label("avg_humidity"),
-        func.avg(SensorLog.ammonia).label("avg_ammonia"),
-        func.count(SensorLog.id).label("data_points"),
-        func.sum(cast(SensorLog.is_alert, Integer)).label("alert_count"),
-    ).filter(
-        SensorLog.device_id == device_id,
-        SensorLog.timestamp >= start_datetime
-    ).group_by(log_date).order_by(log_date.asc()).all()
-
-    statistics = []
-    for row in daily_stats:
-        log_date_value = row.log_date
-        if isinstance(log_date_value, str):
-            log_date_value = date_type.fromisoformat(log_date_value)
-
-        stat = DailyTemperatureStats(
-            date=log_date_value,
-            avg_temperature=row.avg_temperature or 0.0,
-            min_temperature=row.min_temperature or 0.0,
-            max_temperature=row.max_temperature or 0.0,
-            avg_humidity=row.avg_humidity or 0.0,
-            avg_ammonia=row.avg_ammonia or 0.0,
-            data_points=row.data_points or 0,
-            alert_count=row.alert_count or 0,
-        )
-        statistics.append(stat)
 
-    response = DailyTemperatureStatsResponse(
+    # Validator dihitung sebelum statistik dibangun: isi response hanya berubah jika ada
+    # reading baru (log_count), rename/rebuild rollup/retention (row_version) atau hari
+    # berganti. Sengaja tanpa Last-Modified: heartbeat tidak berubah saat hari berganti
+    # atau rollup di-rebuild.
+    fmt = negotiate_format(request, format)
+    etag = make_etag("stats/daily", device.id, device.row_version, device.log_count, start_date, days, fmt)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    # Hari sebelum final_before sudah selesai (plus toleransi data terlambat) dan tidak
+    # berubah lagi → diambil dari cache per (device, versi, hari). Sisanya dihitung live.
+    # Versi = row_version: rebuild rollup menaikkannya, jadi cache semua worker ikut basi.
+    final_before = (now - timedelta(minutes=settings.DAILY_STATS_FINAL_AFTER_MINUTES)).date()
+    final_days = [start_date + timedelta(days=i) for i in range((final_before - start_date).days)]
+    version = device.row_version
+    if daily_stats_cache.persistent:
+        by_day = await asyncio.to_thread(daily_stats_cache.get_many, device_id, final_days, version)
+    else:
+        by_day = daily_stats_cache.get_many(device_id, final_days, version)
+    missing = [day for day in final_days if day not in by_day]
+
+    # Satu query rollup harian (O(hari), bukan O(reading)) — biasanya hanya hari ini
+    query_from = missing[0] if missing else max(final_before, start_date)
+    rows = {
+        row.day: _daily_stats_from_rollup(row)
+        for row in await db.scalars(select(SensorRollupDaily).where(
+            SensorRollupDaily.device_id == device_id,
+            SensorRollupDaily.day >= query_from,
+        ))
+    }
+    if missing:
+        entries = {day: rows.get(day) for day in missing}
+        if daily_stats_cache.persistent:
+            await asyncio.to_thread(daily_stats_cache.set_many, device_id, entries, version)
+        else:
+            daily_stats_cache.set_many(device_id, entries, version)
+    by_day.update(rows)
+
+    statistics = [DailyTemperatureStats(**by_day[day]) for day in sorted(by_day) if by_day[day] is not None]
+
+    result = DailyTemperatureStatsResponse(
         device_id=device.id,
         device_name=device.name,
         period_start=start_date,
@@ -453,7 +939,12 @@ def get_daily_temperature_stats(
     )
 
     logger.info(f"Stats SUKSES - Device '{device.name}': {len(statistics)} hari data")
-    return response
+    if fmt == "json":
+        set_validators(response, etag)
+        return render(result, fmt, response)
+    rendered = render(result.model_dump(mode="json"), fmt, list_key="statistics", keys=DAILY_STATS_KEYS)
+    set_validators(rendered, etag)
+    return rendered
 
 
 # ==========================================
@@ -486,9 +977,13 @@ def unclaim_device(
     for uid in affected_user_ids:
         _check_and_downgrade_role(db, uid)
 
+    owner_id = device.user_id
     device.user_id = None
     device.name = None
     db.commit()
+    invalidate_acl(owner_id)
+    for uid in affected_user_ids:
+        invalidate_user(uid)
 
     # Tutup semua WebSocket connections — akses sudah berubah
     _close_device_websockets(str(device_id), reason="Device di-unclaim")
@@ -502,31 +997,38 @@ def unclaim_device(
 # ==========================================
 @router.get("/{device_id}/status")
 @limiter.limit("60/minute")
-def get_device_status(
+async def get_device_status(
     request: Request,
+    response: Response,
     device_id: UUID,
-    db: Session = Depends(get_db),
+    db: ReadSession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Cek status online/offline device."""
-    device = get_device_with_access(device_id, current_user, db)
+    """
+    Cek status online/offline device. Mendukung If-None-Match (304 selama status online
+    tidak berubah dan heartbeat masih di jendela timeout yang sama).
+    """
+    device = await get_device_with_access_async(device_id, current_user, db)
+    is_online, seconds_since = _online_state(device.last_heartbeat, datetime.now(timezone.utc))
+
+    # seconds_since_last_seen tidak ikut ETag: nilainya turunan dari last_seen
+    etag = make_etag("status", device.id, is_online, _heartbeat_window(device.last_heartbeat))
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    set_validators(response, etag)
 
     if not device.last_heartbeat:
         return {"device_id": device_id, "is_online": False, "last_seen": None, "message": "Belum ada koneksi"}
 
-    now = datetime.now(timezone.utc)
     last_hb = device.last_heartbeat
     if last_hb.tzinfo is None:
         last_hb = last_hb.replace(tzinfo=timezone.utc)
 
-    seconds_since = (now - last_hb).total_seconds()
-    is_online = seconds_since <= settings.DEVICE_ONLINE_TIMEOUT_SECONDS
-
     return {
         "device_id": device_id,
         "is_online": is_online,
         "last_seen": last_hb,
-        "seconds_since_last_seen": round(seconds_since)
+        "seconds_since_last_seen": seconds_since
     }
 
 
@@ -586,6 +1088,7 @@ def assign_user_to_device(
 
     db.commit()
     db.refresh(new_assignment)
+    invalidate_user(assignment.user_id)
 
     logger.info(f"Assignment SUKSES - {target_user.email} ({assignment.role}) -> device {device.name} oleh {current_user.email}")
 
@@ -629,6 +1132,7 @@ def unassign_user_from_device(
     _check_and_downgrade_role(db, user_id)
 
     db.commit()
+    invalidate_user(user_id)
 
     logger.info(f"Unassign SUKSES - {target_user.email if target_user else user_id} dari device {device.name}")
     return {"status": "success", "message": "User berhasil di-unassign dari device."}
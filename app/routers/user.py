@@ -10,6 +10,7 @@ from app.models.user import User, UserRole, FcmToken
 from app.models.device import Device, DeviceAssignment
 from app.schemas.user import UserResponse, UpdateUserRole, UpdateUserName
 from app.dependencies import get_current_user, get_current_admin
+from app.core.auth_cache import invalidate_user
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +24,7 @@ router = APIRouter(
 @limiter.limit("60/minute")
 def read_user_me(request: Request, current_user: User = Depends(get_current_user)):
     """Mengambil data profil user yang sedang login"""
-    return current_user
+    return current_user.orm
 
 
 @router.patch("/me", response_model=UserResponse)
@@ -36,10 +37,11 @@ def update_user_me(
 ):
     """Update nama user yang sedang login. Nama harus 1-100 karakter."""
     logger.info(f"User {current_user.id} mengupdate nama menjadi: {data.full_name}")
-    current_user.full_name = data.full_name
+    user = current_user.orm
+    user.full_name = data.full_name
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    return user
 
 
 @router.delete("/me")
@@ -63,8 +65,10 @@ def delete_user_me(
     if unclaimed_count > 0:
         logger.info(f"{unclaimed_count} device di-unclaim karena user {current_user.email} hapus akun")
 
-    db.delete(current_user)
+    user_id = current_user.id
+    db.delete(current_user.orm)
     db.commit()
+    invalidate_user(user_id)
     return {"message": "Akun berhasil dihapus dari database lokal"}
 
 
@@ -130,6 +134,7 @@ def update_user_role(
     target_user.role = role_update.role
     db.commit()
     db.refresh(target_user)
+    invalidate_user(user_id)
 
     logger.info(
         f"Role DIUBAH - User {target_user.email}: {old_role} -> {role_update.role} "
@@ -3,25 +3,46 @@ WebSocket endpoint untuk real-time sensor data streaming.
 
 Client connect ke: ws://host/api/ws/devices/{device_id}?token=JWT_TOKEN
 Server poll database setiap POLL_INTERVAL detik dan kirim data terbaru.
+Saat reconnect, client bisa mengirim since_id / since_ts agar reading yang
+terlewat di-replay dulu sebelum masuk mode live. Saat pertama buka grafik,
+prefill=<detik> mengirim snapshot reading terakhir (downsampled) sekaligus.
+Viewer dengan koneksi lemah bisa membatasi update via min_interval/deadband,
+dan memilih encoding=msgpack (binary frame + delta per field).
+
+Multiplexed (banyak device dalam satu socket):
+    ws://host/api/ws/devices?token=JWT_TOKEN
+Client mengirim {"action": "subscribe", "device_ids": [...]} atau
+{"action": "unsubscribe", "device_ids": [...]}; setiap event ditandai device_id.
+
+Handshake (verifikasi JWT + cek akses) berjalan di threadpool dan memakai
+cache principal/akses ber-TTL pendek, sehingga reconnect storm setelah
+deploy tidak memblokir event loop (dan stream lain di worker yang sama).
 
 CATATAN KEAMANAN: JWT token dikirim via query parameter karena WebSocket
 tidak support custom HTTP headers. Token akan terlihat di server logs
 dan browser history. Pertimbangkan short-lived token untuk WebSocket.
 """
 
+import json
 import logging
 import asyncio
 from uuid import UUID
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select, or_, and_
+from sqlalchemy.orm import Session, aliased
 
-from app.database import SessionLocal
-from app.models.user import User, UserRole
-from app.models.device import Device, SensorLog, DeviceAssignment
+from app.database import SessionLocal, read_session
+from app.models.user import UserRole
+from app.models.device import Device, SensorLog
 from app.core.security import verify_token
+from app.core.auth_cache import Principal, load_principal, device_access_level, load_device_acl
 from app.core.config import settings
-from app.core.ws_manager import ws_manager
+from app.core.ws_manager import ws_manager, WS_CLOSE_TOO_MANY_CONNECTIONS
+from app.core.downsample import bucket_average
+from app.core.ws_throttle import StreamThrottle
+from app.core.ws_codec import FrameEncoder, Encoding
 
 logger = logging.getLogger(__name__)
 
@@ -29,12 +50,34 @@ router = APIRouter(tags=["WebSocket"])
 
 POLL_INTERVAL = 3
 
+# Batas jumlah reading yang di-replay saat resume (since_id / since_ts).
+# Jika gap lebih besar, yang dikirim adalah reading TERBARU dan truncated=true.
+WS_REPLAY_MAX_READINGS = 500
+
+# Prefill snapshot saat connect: maksimal 24 jam ke belakang,
+# di-downsample ke maksimal WS_PREFILL_MAX_POINTS titik.
+WS_PREFILL_MAX_SECONDS = 86400
+WS_PREFILL_DEFAULT_POINTS = 300
+WS_PREFILL_MAX_POINTS = 1000
+
+# Field reading dalam snapshot (format kolom: satu array per field)
+_SNAPSHOT_FIELDS = (
+    "id", "timestamp", "temperature", "humidity", "ammonia",
+    "light_level", "is_alert", "alert_message", "samples",
+)
+
+# Batas throttling per subscriber
+WS_MAX_MIN_INTERVAL = 3600.0
+
+# Batas subscription per socket multiplexed (dashboard admin ~40 kandang)
+MAX_SUBSCRIPTIONS_PER_SOCKET = 100
+
 # Sentinel value: device was deleted from DB
 _DEVICE_DELETED = {"_deleted": True}
 
 
-def _authenticate_ws(token: str, db: Session) -> User | None:
-    """Authenticate WebSocket via JWT token dari query parameter."""
+def _authenticate_ws(token: str, db: Session) -> Principal | None:
+    """Authenticate WebSocket via JWT token dari query parameter (principal di-cache)."""
     if not token:
         return None
     payload = verify_token(token)
@@ -47,82 +90,259 @@ def _authenticate_ws(token: str, db: Session) -> User | None:
         user_uuid = UUID(user_id)
     except ValueError:
         return None
-    user = db.query(User).filter(User.id == user_uuid).first()
-    if user and not user.is_active:
+    principal = load_principal(user_uuid, db)
+    if principal and not principal.is_active:
         return None
-    return user
+    return principal
 
 
-def _check_access(device_id: UUID, user: User, db: Session) -> Device | None:
-    """Cek akses user ke device."""
-    if user.role == UserRole.SUPER_ADMIN.value:
-        return db.query(Device).filter(Device.id == device_id).first()
-    if user.role == UserRole.ADMIN.value:
-        return db.query(Device).filter(Device.id == device_id, Device.user_id == user.id).first()
-    if user.role in [UserRole.OPERATOR.value, UserRole.VIEWER.value]:
-        assignment = db.query(DeviceAssignment).filter(
-            DeviceAssignment.device_id == device_id,
-            DeviceAssignment.user_id == user.id
-        ).first()
-        if assignment:
-            return db.query(Device).filter(Device.id == device_id).first()
-    return None
+def _accessible_device_ids(device_ids: list[UUID], principal: Principal, db: Session) -> set[UUID]:
+    """
+    Device yang boleh diakses principal, dari peta akses per user (auth_cache) —
+    sumber yang sama dengan dependency REST, sehingga invalidasi (invalidate_acl /
+    invalidate_user) berlaku untuk HTTP dan WebSocket sekaligus.
+
+    Peta admin/operator/viewer hanya berisi device yang ada, jadi tidak perlu query
+    tambahan; super_admin (akses semua) dicek keberadaan device-nya dalam satu query.
+    """
+    if not device_ids or principal.role not in UserRole.device_roles():
+        return set()
+    acl = load_device_acl(principal, db)
+    if acl is not None:
+        return {device_id for device_id in device_ids if device_access_level(acl, device_id)}
+    return set(db.scalars(select(Device.id).where(Device.id.in_(device_ids))))
+
+
+def _ws_handshake(token: str, device_id: UUID | None = None) -> tuple[Principal | None, bool]:
+    """
+    Autentikasi + cek akses device untuk handshake WebSocket.
+    Sync (query SQLAlchemy) — WAJIB dipanggil via asyncio.to_thread.
 
+    Session tidak mengambil koneksi dari pool sampai query pertama,
+    jadi saat principal dan peta akses sudah ada di cache, pool tidak tersentuh.
 
-def _poll_device_data(device_id: UUID) -> dict | None:
+    Returns (principal | None, allowed).
+    """
+    db = SessionLocal()
+    try:
+        principal = _authenticate_ws(token, db)
+        if principal is None or device_id is None:
+            return principal, False
+        return principal, device_id in _accessible_device_ids([device_id], principal, db)
+    finally:
+        db.close()
+
+
+def _serialize_reading(log: SensorLog) -> dict:
+    """Serialize satu SensorLog ke format reading yang dipakai di payload WS."""
+    return {
+        "id": log.id,
+        "temperature": log.temperature,
+        "humidity": log.humidity,
+        "ammonia": log.ammonia,
+        "light_level": log.light_level,
+        "is_alert": log.is_alert,
+        "alert_message": log.alert_message,
+        "timestamp": log.timestamp.isoformat() if log.timestamp else None,
+    }
+
+
+def _build_sensor_payload(device: Device, latest_log: SensorLog, now: datetime) -> dict:
+    """Bentuk payload sensor_data dari device + log terbaru."""
+    # Hitung is_online
+    is_online = False
+    if device.last_heartbeat:
+        last_hb = device.last_heartbeat
+        if last_hb.tzinfo is None:
+            last_hb = last_hb.replace(tzinfo=timezone.utc)
+        diff = now - last_hb
+        is_online = diff.total_seconds() <= settings.DEVICE_ONLINE_TIMEOUT_SECONDS
+
+    return {
+        "log_id": latest_log.id,
+        "type": "sensor_data",
+        "device_id": str(device.id),
+        "device_name": device.name,
+        "is_online": is_online,
+        "latest": _serialize_reading(latest_log),
+    }
+
+
+async def _poll_device_data(device_id: UUID) -> dict | None:
     """
     Poll database untuk data sensor terbaru.
     Buat session baru per poll cycle agar tidak hold connection pool.
+    Memakai read_session (async) — tidak memakan slot threadpool per koneksi.
 
     Returns:
         dict with sensor data — new data available
         None — no new data (device exists but no logs yet)
         _DEVICE_DELETED — device no longer exists in DB
     """
-    db = SessionLocal()
     try:
-        # Query Device dulu untuk deteksi deletion
-        device = db.query(Device).filter(Device.id == device_id).first()
-
-        if not device:
-            return _DEVICE_DELETED
-
-        latest_log = db.query(SensorLog).filter(
-            SensorLog.device_id == device_id
-        ).order_by(SensorLog.timestamp.desc()).first()
-
-        if not latest_log:
-            return None
-
-        # Hitung is_online
-        is_online = False
-        if device.last_heartbeat:
-            last_hb = device.last_heartbeat
-            if last_hb.tzinfo is None:
-                last_hb = last_hb.replace(tzinfo=timezone.utc)
-            diff = datetime.now(timezone.utc) - last_hb
-            is_online = diff.total_seconds() <= settings.DEVICE_ONLINE_TIMEOUT_SECONDS
-
-        return {
-            "log_id": latest_log.id,
-            "type": "sensor_data",
-            "device_id": str(device_id),
-            "device_name": device.name,
-            "is_online": is_online,
-            "latest": {
-                "id": latest_log.id,
-                "temperature": latest_log.temperature,
-                "humidity": latest_log.humidity,
-                "ammonia": latest_log.ammonia,
-                "light_level": latest_log.light_level,
-                "is_alert": latest_log.is_alert,
-                "alert_message": latest_log.alert_message,
-                "timestamp": latest_log.timestamp.isoformat() if latest_log.timestamp else None,
-            },
-        }
+        async with read_session() as db:
+            # Query Device dulu untuk deteksi deletion
+            device = await db.scalar(select(Device).where(Device.id == device_id))
+
+            if not device:
+                return _DEVICE_DELETED
+
+            latest_log = await db.scalar(
+                select(SensorLog).where(SensorLog.device_id == device_id)
+                .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc()).limit(1)
+            )
+
+            if not latest_log:
+                return None
+
+            return _build_sensor_payload(device, latest_log, datetime.now(timezone.utc))
     except Exception as e:
         logger.error(f"WS poll error: {e}")
         return None
+
+
+def _fetch_replay(
+    device_id: UUID,
+    since_id: Optional[int],
+    since_ts: Optional[datetime],
+) -> tuple[list[dict], bool]:
+    """
+    Ambil reading yang terlewat sejak since_id / since_ts (since_id diutamakan).
+
+    Satu range query bounded di index (device_id, timestamp DESC):
+    scan mundur dari reading terbaru, berhenti setelah WS_REPLAY_MAX_READINGS + 1 row.
+    Urutan (timestamp, id) dipakai sebagai keyset agar reading dengan
+    timestamp sama tidak terlewat/terduplikasi.
+
+    Returns (readings ascending, truncated).
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(SensorLog).filter(SensorLog.device_id == device_id)
+
+        if since_id is not None:
+            anchor = aliased(SensorLog)
+            anchor_filter = (anchor.id == since_id, anchor.device_id == device_id)
+            anchor_exists = db.query(anchor.id).filter(*anchor_filter).scalar() is not None
+            if anchor_exists:
+                # Bandingkan di SQL (subquery), bukan round-trip nilai timestamp ke Python
+                anchor_ts = select(anchor.timestamp).where(*anchor_filter).scalar_subquery()
+                query = query.filter(or_(
+                    SensorLog.timestamp > anchor_ts,
+                    and_(SensorLog.timestamp == anchor_ts, SensorLog.id > since_id),
+                ))
+            else:
+                # Anchor sudah tidak ada (retention) — replay reading terbaru saja
+                query = query.filter(SensorLog.id > since_id)
+        elif since_ts is not None:
+            if since_ts.tzinfo is None:
+                since_ts = since_ts.replace(tzinfo=timezone.utc)
+            query = query.filter(SensorLog.timestamp > since_ts.astimezone(timezone.utc))
+        else:
+            return [], False
+
+        logs = query.order_by(
+            SensorLog.timestamp.desc(), SensorLog.id.desc()
+        ).limit(WS_REPLAY_MAX_READINGS + 1).all()
+
+        truncated = len(logs) > WS_REPLAY_MAX_READINGS
+        logs = logs[:WS_REPLAY_MAX_READINGS]
+        return [_serialize_reading(log) for log in reversed(logs)], truncated
+    finally:
+        db.close()
+
+
+def _fetch_snapshot(device_id: UUID, window_seconds: int, max_points: int) -> dict:
+    """
+    Ambil reading dalam window terakhir (satu range query di index
+    (device_id, timestamp)), lalu downsample ke max_points titik.
+    Hanya kolom yang dibutuhkan yang di-select (tanpa hydrate ORM object).
+
+    Returns payload "snapshot" dengan readings dalam format kolom.
+    """
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(seconds=window_seconds)
+
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            SensorLog.id,
+            SensorLog.timestamp,
+            SensorLog.temperature,
+            SensorLog.humidity,
+            SensorLog.ammonia,
+            SensorLog.light_level,
+            SensorLog.is_alert,
+            SensorLog.alert_message,
+        ).filter(
+            SensorLog.device_id == device_id,
+            SensorLog.timestamp >= start,
+        ).order_by(SensorLog.timestamp.asc(), SensorLog.id.asc()).all()
+    finally:
+        db.close()
+
+    readings = [row._asdict() for row in rows if row.timestamp is not None]
+    points = bucket_average(readings, max_points)
+
+    columns = {field: [] for field in _SNAPSHOT_FIELDS}
+    for point in points:
+        for field in _SNAPSHOT_FIELDS:
+            value = point.get(field)
+            columns[field].append(value.isoformat() if field == "timestamp" else value)
+
+    return {
+        "type": "snapshot",
+        "device_id": str(device_id),
+        "from": start.isoformat(),
+        "to": now.isoformat(),
+        "raw_points": len(readings),
+        "readings": columns,
+    }
+
+
+async def _poll_devices_data(device_ids: list[UUID]) -> dict[str, dict | None]:
+    """
+    Poll data terbaru untuk banyak device dalam SATU query
+    (Device LEFT JOIN log terbaru via correlated subquery per device,
+    memakai index (device_id, timestamp DESC)).
+
+    Returns dict device_id (str) -> payload | None (belum ada log) | _DEVICE_DELETED.
+    Jika query gagal, return {} (dicoba lagi pada cycle berikutnya).
+    """
+    latest_log_id = (
+        select(SensorLog.id)
+        .where(SensorLog.device_id == Device.id)
+        .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+        .limit(1)
+        .correlate(Device)
+        .scalar_subquery()
+    )
+    try:
+        async with read_session() as db:
+            rows = (await db.execute(
+                select(Device, SensorLog).outerjoin(
+                    SensorLog, SensorLog.id == latest_log_id
+                ).where(Device.id.in_(device_ids))
+            )).all()
+
+        now = datetime.now(timezone.utc)
+        results: dict[str, dict | None] = {str(device_id): _DEVICE_DELETED for device_id in device_ids}
+        for device, latest_log in rows:
+            results[str(device.id)] = _build_sensor_payload(device, latest_log, now) if latest_log else None
+        return results
+    except Exception as e:
+        logger.error(f"WS batch poll error: {e}")
+        return {}
+
+
+def _authorize_subscriptions(device_ids: list[UUID], principal: Principal) -> set[UUID]:
+    """
+    Batched access check untuk subscribe (dipanggil via to_thread).
+    Saat peta akses user sudah di-cache, tidak ada query sama sekali.
+    """
+    db = SessionLocal()
+    try:
+        return _accessible_device_ids(device_ids, principal, db)
     finally:
         db.close()
 
@@ -132,73 +352,318 @@ async def websocket_device_stream(
     websocket: WebSocket,
     device_id: UUID,
     token: str = Query(default=""),
+    since_id: Optional[int] = Query(default=None, ge=0),
+    since_ts: Optional[datetime] = Query(default=None),
+    prefill: Optional[int] = Query(default=None, ge=1, le=WS_PREFILL_MAX_SECONDS),
+    prefill_points: int = Query(default=WS_PREFILL_DEFAULT_POINTS, ge=1, le=WS_PREFILL_MAX_POINTS),
+    min_interval: float = Query(default=0.0, ge=0.0, le=WS_MAX_MIN_INTERVAL),
+    deadband: float = Query(default=0.0, ge=0.0),
+    encoding: Encoding = Query(default="json"),
 ):
     """
     WebSocket endpoint untuk streaming data sensor real-time.
     Connect: ws://host/api/ws/devices/{device_id}?token=JWT_TOKEN
+
+    Resume setelah reconnect: tambahkan since_id=<id reading terakhir> atau
+    since_ts=<ISO timestamp>. Server kirim satu pesan "replay" berisi reading
+    yang terlewat, lalu lanjut streaming live.
+
+    Buka grafik: tambahkan prefill=<detik> (maks 86400) dan opsional
+    prefill_points=<n>. Server kirim satu pesan "snapshot" (downsampled,
+    format kolom), lalu lanjut streaming live. Jika since_id/since_ts juga
+    diberikan, replay yang dipakai (prefill diabaikan).
+
+    Throttling (koneksi lemah): min_interval=<detik> membatasi update rate,
+    deadband=<nilai> hanya kirim jika temperature/humidity/ammonia berubah
+    minimal sebesar itu. Reading di antaranya di-merge ke state terbaru.
+    Alert dan perubahan status online selalu dikirim langsung.
+
+    encoding=msgpack: semua pesan dikirim sebagai MessagePack binary frame,
+    sensor_data sebagai delta terhadap frame sebelumnya (lihat app/core/ws_codec.py).
     """
     # HARUS accept dulu sebelum bisa close dengan error code
     await websocket.accept()
 
-    # Authenticate dengan session terpisah (short-lived)
-    db = SessionLocal()
-    try:
-        user = _authenticate_ws(token, db)
-        if not user:
-            await websocket.close(code=4001, reason="Token tidak valid")
-            return
+    # Authenticate + cek akses di threadpool (query sync tidak boleh blokir event loop)
+    principal, allowed = await asyncio.to_thread(_ws_handshake, token, device_id)
+    if not principal:
+        await websocket.close(code=4001, reason="Token tidak valid")
+        return
+    if not allowed:
+        await websocket.close(code=4003, reason="Akses ditolak")
+        return
 
-        device = _check_access(device_id, user, db)
-        if not device:
-            await websocket.close(code=4003, reason="Akses ditolak")
-            return
+    user_email = principal.email
 
-        user_email = user.email
-        device_name = device.name
-    finally:
-        db.close()  # Close auth session segera
+    last_log_id = 0
+    throttle = StreamThrottle(min_interval=min_interval, deadband=deadband)
+    encoder = FrameEncoder(encoding)
+
+    if ws_manager.track(websocket, principal.id, lambda message: encoder.send(websocket, message)) is None:
+        await websocket.close(code=WS_CLOSE_TOO_MANY_CONNECTIONS, reason="Terlalu banyak koneksi")
+        return
 
     # Register connection
     device_id_str = str(device_id)
     ws_manager.register(device_id_str, websocket)
-    logger.info(f"WS stream started: {user_email} -> device {device_name}")
+    logger.info(f"WS stream started: {user_email} -> device {device_id_str}")
 
-    last_log_id = 0
+    async def receive_client():
+        # Client per-device tidak mengirim command; yang dibaca hanya pong
+        # (dan disconnect, agar socket mati langsung terdeteksi tanpa menunggu send gagal).
+        while True:
+            raw = await websocket.receive_text()
+            ws_manager.touch(websocket, pong=_is_pong(raw))
 
-    try:
+    async def stream_loop():
+        nonlocal last_log_id
         while True:
-            try:
-                data = await asyncio.to_thread(_poll_device_data, device_id)
-
-                # Device dihapus dari DB — tutup WebSocket dengan kode khusus
-                if data is _DEVICE_DELETED:
-                    logger.info(f"Device {device_id} deleted, closing WS for {user_email}")
-                    try:
-                        await websocket.close(code=4004, reason="Device telah dihapus")
-                    except Exception:
-                        pass
-                    break
-
-                if data and data["log_id"] != last_log_id:
-                    last_log_id = data["log_id"]
-                    data["subscribers"] = ws_manager.get_subscriber_count(device_id_str)
-                    del data["log_id"]
-                    await websocket.send_json(data)
-
-                await asyncio.sleep(POLL_INTERVAL)
-
-            except WebSocketDisconnect:
-                break
-            except Exception as e:
+            data = await _poll_device_data(device_id)
+
+            # Device dihapus dari DB — tutup WebSocket dengan kode khusus
+            if data is _DEVICE_DELETED:
+                logger.info(f"Device {device_id} deleted, closing WS for {user_email}")
+                try:
+                    await websocket.close(code=4004, reason="Device telah dihapus")
+                except Exception:
+                    pass
+                return
+
+            if data and data["log_id"] != last_log_id:
+                last_log_id = data["log_id"]
+                del data["log_id"]
+                throttle.offer(data)
+
+            outgoing = throttle.take()
+            if outgoing:
+                outgoing["subscribers"] = ws_manager.get_subscriber_count(device_id_str)
+                await encoder.send(websocket, outgoing)
+
+            await asyncio.sleep(POLL_INTERVAL)
+
+    tasks = []
+    try:
+        if since_id is not None or since_ts is not None:
+            readings, truncated = await asyncio.to_thread(_fetch_replay, device_id, since_id, since_ts)
+            await encoder.send(websocket, {
+                "type": "replay",
+                "device_id": device_id_str,
+                "readings": readings,
+                "truncated": truncated,
+            })
+            if readings:
+                # Reading terbaru sudah terkirim lewat replay — jangan dikirim ulang
+                last_log_id = readings[-1]["id"]
+        elif prefill is not None:
+            # Titik snapshot adalah rata-rata per bucket, jadi sensor_data pertama
+            # tetap dikirim sebagai nilai exact terbaru + status online.
+            snapshot = await asyncio.to_thread(_fetch_snapshot, device_id, prefill, prefill_points)
+            await encoder.send(websocket, snapshot)
+
+        tasks = [asyncio.create_task(receive_client()), asyncio.create_task(stream_loop())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if exc and not isinstance(exc, WebSocketDisconnect):
                 # Semua exception lain (RuntimeError, ConnectionResetError, dll)
-                # berarti koneksi sudah mati — BREAK, jangan lanjut polling.
-                logger.warning(f"WS connection lost for {user_email}: {e}")
-                break
+                # berarti koneksi sudah mati — stop polling.
+                logger.warning(f"WS connection lost for {user_email}: {exc}")
 
     except WebSocketDisconnect:
         pass
     except Exception as e:
         logger.error(f"WS error: {e}")
     finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ws_manager.untrack(websocket)
         ws_manager.disconnect(device_id_str, websocket)
-        logger.info(f"WS stream ended: device {device_id}")
+        logger.info(f"WS stream ended: device {device_id} (throttled: {throttle.suppressed})")
+
+
+def _is_pong(raw: str) -> bool:
+    """True jika pesan client adalah balasan ping: {"action": "pong"}."""
+    try:
+        message = json.loads(raw)
+    except json.JSONDecodeError:
+        return False
+    return isinstance(message, dict) and message.get("action") == "pong"
+
+
+def _parse_device_ids(raw) -> tuple[list[UUID], list]:
+    """Pisahkan device_ids valid (UUID) dan yang formatnya salah."""
+    if not isinstance(raw, list):
+        return [], []
+    valid, invalid = [], []
+    for item in raw:
+        try:
+            valid.append(UUID(str(item)))
+        except ValueError:
+            invalid.append(item)
+    return valid, invalid
+
+
+@router.websocket("/ws/devices")
+async def websocket_multiplex_stream(
+    websocket: WebSocket,
+    token: str = Query(default=""),
+    min_interval: float = Query(default=0.0, ge=0.0, le=WS_MAX_MIN_INTERVAL),
+    deadband: float = Query(default=0.0, ge=0.0),
+    encoding: Encoding = Query(default="json"),
+):
+    """
+    WebSocket multiplexed: satu socket untuk banyak device.
+    Connect: ws://host/api/ws/devices?token=JWT_TOKEN
+
+    Pesan client:
+        {"action": "subscribe", "device_ids": ["<uuid>", ...]}
+        {"action": "unsubscribe", "device_ids": ["<uuid>", ...]}
+        {"action": "pong"}  (balasan {"type": "ping"}, lihat app/core/ws_manager.py)
+
+    Pesan server:
+        {"type": "subscribed", "device_ids": [...], "denied": [...]}
+        {"type": "unsubscribed", "device_ids": [...], "code": ..., "reason": ...}
+        {"type": "sensor_data", "device_id": ..., ...}  (format sama dengan endpoint per-device)
+        {"type": "error", "message": ...}
+        {"type": "ping", "ts": ...}
+
+    min_interval / deadband / encoding berlaku per device untuk socket ini
+    (lihat websocket_device_stream). Pesan client tetap JSON text.
+    """
+    await websocket.accept()
+
+    principal, _ = await asyncio.to_thread(_ws_handshake, token)
+    if not principal:
+        await websocket.close(code=4001, reason="Token tidak valid")
+        return
+    user_email = principal.email
+
+    # device_id (str) -> log_id terakhir yang sudah diterima dari poll
+    subscriptions: dict[str, int] = {}
+    throttles: dict[str, StreamThrottle] = {}
+    encoder = FrameEncoder(encoding)
+    wake = asyncio.Event()
+
+    async def revoke(device_id: str, code: int, reason: str):
+        """Dipanggil ws_manager saat device dihapus/di-unclaim."""
+        if subscriptions.pop(device_id, None) is None:
+            return
+        throttles.pop(device_id, None)
+        encoder.forget(device_id)
+        ws_manager.disconnect(device_id, websocket)
+        await encoder.send(websocket, {
+            "type": "unsubscribed", "device_ids": [device_id], "code": code, "reason": reason,
+        })
+
+    async def handle_subscribe(raw_ids):
+        device_ids, invalid = _parse_device_ids(raw_ids)
+        new_ids = [d for d in dict.fromkeys(device_ids) if str(d) not in subscriptions]
+        capacity = MAX_SUBSCRIPTIONS_PER_SOCKET - len(subscriptions)
+        over_limit = new_ids[max(capacity, 0):]
+        new_ids = new_ids[:max(capacity, 0)]
+
+        allowed = await asyncio.to_thread(_authorize_subscriptions, new_ids, principal) if new_ids else set()
+        granted = []
+        for device_id in new_ids:
+            if device_id in allowed:
+                device_id_str = str(device_id)
+                subscriptions[device_id_str] = 0
+                throttles[device_id_str] = StreamThrottle(min_interval=min_interval, deadband=deadband)
+                ws_manager.register(device_id_str, websocket)
+                granted.append(device_id_str)
+
+        denied = [str(d) for d in new_ids if d not in allowed] + [str(d) for d in over_limit] + invalid
+        await encoder.send(websocket, {"type": "subscribed", "device_ids": granted, "denied": denied})
+        if granted:
+            wake.set()  # Kirim data awal tanpa menunggu POLL_INTERVAL
+
+    async def handle_unsubscribe(raw_ids):
+        device_ids, _ = _parse_device_ids(raw_ids)
+        removed = []
+        for device_id in device_ids:
+            device_id_str = str(device_id)
+            if subscriptions.pop(device_id_str, None) is not None:
+                throttles.pop(device_id_str, None)
+                encoder.forget(device_id_str)
+                ws_manager.disconnect(device_id_str, websocket)
+                removed.append(device_id_str)
+        await encoder.send(websocket, {"type": "unsubscribed", "device_ids": removed, "code": 1000, "reason": "Unsubscribed"})
+
+    async def receive_commands():
+        while True:
+            raw = await websocket.receive_text()
+            ws_manager.touch(websocket)
+            try:
+                message = json.loads(raw)
+            except json.JSONDecodeError:
+                await encoder.send(websocket, {"type": "error", "message": "Pesan harus JSON"})
+                continue
+            if not isinstance(message, dict):
+                await encoder.send(websocket, {"type": "error", "message": "Pesan harus JSON object"})
+                continue
+
+            action = message.get("action")
+            if action == "subscribe":
+                await handle_subscribe(message.get("device_ids"))
+            elif action == "unsubscribe":
+                await handle_unsubscribe(message.get("device_ids"))
+            elif action == "pong":
+                ws_manager.touch(websocket, pong=True)
+            else:
+                await encoder.send(websocket, {"type": "error", "message": f"Action tidak dikenal: {action}"})
+
+    async def poll_loop():
+        while True:
+            wake.clear()
+            if subscriptions:
+                device_ids = [UUID(d) for d in subscriptions]
+                results = await _poll_devices_data(device_ids)
+
+                for device_id_str, data in results.items():
+                    if device_id_str not in subscriptions:
+                        continue  # Di-unsubscribe saat poll berjalan
+
+                    if data is _DEVICE_DELETED:
+                        await revoke(device_id_str, 4004, "Device telah dihapus")
+                        continue
+
+                    throttle = throttles[device_id_str]
+                    if data and data["log_id"] != subscriptions[device_id_str]:
+                        subscriptions[device_id_str] = data["log_id"]
+                        del data["log_id"]
+                        throttle.offer(data)
+
+                    outgoing = throttle.take()
+                    if outgoing:
+                        outgoing["subscribers"] = ws_manager.get_subscriber_count(device_id_str)
+                        await encoder.send(websocket, outgoing)
+
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    if ws_manager.track(websocket, principal.id, lambda message: encoder.send(websocket, message)) is None:
+        await websocket.close(code=WS_CLOSE_TOO_MANY_CONNECTIONS, reason="Terlalu banyak koneksi")
+        return
+    ws_manager.set_revoke_handler(websocket, revoke)
+    logger.info(f"WS multiplex stream started: {user_email}")
+
+    tasks = [asyncio.create_task(receive_commands()), asyncio.create_task(poll_loop())]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            exc = task.exception()
+            if exc and not isinstance(exc, WebSocketDisconnect):
+                # Koneksi mati (RuntimeError, ConnectionResetError, dll)
+                logger.warning(f"WS multiplex connection lost for {user_email}: {exc}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ws_manager.clear_revoke_handler(websocket)
+        ws_manager.untrack(websocket)
+        for device_id_str in list(subscriptions):
+            ws_manager.disconnect(device_id_str, websocket)
+        logger.info(f"WS multiplex stream ended: {user_email} ({len(subscriptions)} subscriptions)")
@@ -1,9 +1,11 @@
 from datetime import datetime, date, timedelta, timezone
-from pydantic import BaseModel, computed_field, field_validator
+from pydantic import BaseModel, Field, computed_field, field_validator
 from typing import Optional, Literal, List
 from uuid import UUID
 import re
 
+from app.schemas.sensor import LogResponse
+
 
 # ==========================================
 # DEVICE ASSIGNMENT SCHEMAS
@@ -130,7 +132,7 @@ class DeviceResponse(BaseModel):
             last_hb = last_hb.replace(tzinfo=timezone.utc)
         
         diff = now - last_hb
-        return diff < timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
+        return diff <= timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
 
     class Config:
         from_attributes = True
@@ -249,4 +251,70 @@ class DailyTemperatureStatsResponse(BaseModel):
                     }
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+
+# ==========================================
+# RANGE LOG (GRAFIK, DOWNSAMPLED)
+# ==========================================
+
+class LogRangeSeries(BaseModel):
+    """Satu metrik hasil downsampling: timestamp (epoch ms) dan nilai, panjang sama."""
+    t: List[int]
+    v: List[float]
+
+
+class LogRangeResponse(BaseModel):
+    """
+    Data sensor satu rentang waktu untuk grafik.
+    Setiap metrik berisi maksimal max_points titik (LTTB), berapa pun panjang rentangnya.
+    """
+    device_id: UUID
+    device_name: Optional[str] = None
+    start: datetime = Field(serialization_alias="from")
+    end: datetime = Field(serialization_alias="to")
+    max_points: int
+    raw_points: int           # Jumlah reading asli dalam rentang
+    method: Literal["lttb"] = "lttb"
+    series: dict[str, LogRangeSeries]  # temperature / humidity / ammonia
+
+
+class AggregateResponse(BaseModel):
+    """
+    Agregat sensor per bucket waktu (format kolom: satu array per metrik & agregat).
+    t berisi awal setiap bucket (epoch ms, UTC); nilai None = bucket tanpa reading untuk metrik itu.
+    """
+    device_id: UUID
+    device_name: Optional[str] = None
+    start: datetime = Field(serialization_alias="from")  # Awal bucket pertama (sudah di-align)
+    end: datetime = Field(serialization_alias="to")
+    bucket: str
+    source: Literal["raw", "hourly", "daily"]  # Sumber data yang dipakai server
+    metrics: List[str]
+    aggs: List[str]
+    t: List[int]
+    series: dict[str, dict[str, List[Optional[int | float]]]]  # metrik -> agg -> nilai per bucket
+
+
+# ==========================================
+# FLEET OVERVIEW (HOME SCREEN)
+# ==========================================
+
+class DeviceOverviewItem(BaseModel):
+    """Satu device di overview: data device, status online, reading terakhir, alert hari ini."""
+    id: UUID
+    mac_address: str
+    name: Optional[str] = None
+    user_id: Optional[UUID] = None
+    last_heartbeat: Optional[datetime] = None
+    is_online: bool
+    seconds_since_last_seen: Optional[int] = None  # None = belum pernah terhubung
+    latest: Optional[LogResponse] = None           # None = belum ada reading
+    alerts_today: int                              # Alert sejak 00:00 UTC hari ini
+
+
+class DeviceOverviewResponse(BaseModel):
+    """Overview semua device yang bisa dilihat user, dalam satu request."""
+    generated_at: datetime
+    total: int
+    data: List[DeviceOverviewItem]
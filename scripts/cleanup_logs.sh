@@ -14,6 +14,7 @@ set -euo pipefail
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_DIR="$(dirname "$SCRIPT_DIR")"
 CONTAINER_NAME="pcb_pkl_postgres"
+BACKEND_CONTAINER="pcb_pkl_backend"
 
 # Load .env (tr -d '\r' untuk handle Windows line endings)
 if [ -f "$PROJECT_DIR/.env" ]; then
@@ -42,6 +43,20 @@ fi
 
 echo "$(date): Memulai cleanup sensor logs lebih lama dari $DAYS hari..."
 
+# sensor_logs dipartisi per bulan (migration 009)? Retention = DETACH/DROP partisi
+# bulan yang sudah kadaluarsa, via CLI backend (counter device ikut dikurangi).
+PARTITIONED=$(docker exec -u postgres "$CONTAINER_NAME" psql \
+    -U "${POSTGRES_USER:-iot_user}" \
+    -d "${POSTGRES_DB:-iot_db}" \
+    -t -c "SELECT COUNT(*) FROM pg_partitioned_table WHERE partrelid = to_regclass('sensor_logs');" \
+    | tr -d ' ')
+
+if [ "$PARTITIONED" = "1" ]; then
+    docker exec "$BACKEND_CONTAINER" python -m app.core.partitions retention --days "$DAYS"
+    echo "$(date): Cleanup selesai (drop partisi)."
+    exit 0
+fi
+
 # Hitung jumlah yang akan dihapus
 COUNT=$(docker exec -u postgres "$CONTAINER_NAME" psql \
     -U "${POSTGRES_USER:-iot_user}" \
@@ -56,10 +71,24 @@ fi
 
 echo "$(date): Akan menghapus $COUNT sensor logs..."
 
-# Hapus data lama
+# Hapus data lama + kurangi counter log/alert per device (devices.log_count /
+# alert_count) dalam satu statement, agar total pagination tetap akurat.
+# row_version ikut naik agar ETag endpoint baca tidak mengembalikan 304 basi.
 docker exec -u postgres "$CONTAINER_NAME" psql \
     -U "${POSTGRES_USER:-iot_user}" \
     -d "${POSTGRES_DB:-iot_db}" \
-    -c "DELETE FROM sensor_logs WHERE timestamp < NOW() - INTERVAL '${DAYS} days';"
+    -c "WITH deleted AS (
+            DELETE FROM sensor_logs WHERE timestamp < NOW() - INTERVAL '${DAYS} days'
+            RETURNING device_id, is_alert
+        )
+        UPDATE devices AS d
+        SET log_count = d.log_count - c.log_count,
+            alert_count = d.alert_count - c.alert_count,
+            row_version = d.row_version + 1
+        FROM (
+            SELECT device_id, count(*) AS log_count, count(*) FILTER (WHERE is_alert) AS alert_count
+            FROM deleted GROUP BY device_id
+        ) AS c
+        WHERE d.id = c.device_id;"
 
 echo "$(date): Cleanup selesai. $COUNT sensor logs dihapus."
@@ -35,7 +35,12 @@ from app.database import Base, get_db
 from app.main import app
 from app.models.user import User, UserRole, FcmToken
 from app.models.device import Device, SensorLog, DeviceAssignment
+from app.models.rollup import SensorRollupHourly, SensorRollupDaily
 from app.core.security import create_access_token
+from app.core.auth_cache import clear_auth_caches
+from app.core.firebase_tokens import clear_firebase_caches
+from app.core.day_cache import daily_stats_cache
+import app.core.pagination as pagination_module
 import app.database as database_module
 import app.main as main_module
 
@@ -51,11 +56,29 @@ engine = create_engine(
 database_module.engine = engine
 main_module.engine = engine
 
+# Session yang dibuat langsung via SessionLocal (WebSocket poll, dll)
+# juga harus memakai database test.
+database_module.SessionLocal.configure(bind=engine)
+
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base.metadata.create_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def _clear_process_caches():
+    """Cache principal/akses, token Firebase, total pagination & statistik harian bersifat per-process — reset agar test terisolasi."""
+    clear_auth_caches()
+    clear_firebase_caches()
+    pagination_module._count_cache.clear()
+    daily_stats_cache.clear()
+    yield
+    clear_auth_caches()
+    clear_firebase_caches()
+    pagination_module._count_cache.clear()
+    daily_stats_cache.clear()
+
+
 @pytest.fixture(scope="function")
 def db_session() -> Generator:
     db = TestingSessionLocal()
@@ -64,6 +87,8 @@ def db_session() -> Generator:
     finally:
         db.query(FcmToken).delete()
         db.query(DeviceAssignment).delete()
+        db.query(SensorRollupHourly).delete()
+        db.query(SensorRollupDaily).delete()
         db.query(SensorLog).delete()
         db.query(Device).delete()
         db.query(User).delete()
@@ -0,0 +1,184 @@
+"""
+Unit tests untuk login Firebase (/api/auth/firebase/login).
+Sertifikat Google diganti stub lokal (RSA key + self-signed certificate),
+jadi tidak ada request jaringan.
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from app.core import firebase_tokens
+from app.core.limiter import limiter
+from app.models.user import User
+from app.routers import auth as auth_router
+
+PROJECT_ID = "test-project"
+KID = "test-kid"
+
+
+def _self_signed_certificate(key) -> str:
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "securetoken.test")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(days=1))
+        .not_valid_after(now + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return certificate.public_bytes(serialization.Encoding.PEM).decode()
+
+
+@pytest.fixture(autouse=True)
+def _reset_login_rate_limit():
+    """Endpoint login dibatasi 10/menit — reset agar test di modul ini tidak saling memengaruhi."""
+    limiter.reset()
+    yield
+    limiter.reset()
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture
+def google_certs(monkeypatch, signing_key):
+    """Stub fetch sertifikat Google; calls mencatat berapa kali fetch terjadi."""
+    calls = []
+    pem = _self_signed_certificate(signing_key)
+
+    def fetch():
+        calls.append(time.time())
+        return {KID: pem}, 3600
+
+    monkeypatch.setattr(firebase_tokens, "certificate_cache", firebase_tokens.CertificateCache(fetch=fetch))
+    monkeypatch.setattr(auth_router, "FIREBASE_PROJECT_ID", PROJECT_ID)
+    return calls
+
+
+def _id_token(signing_key, kid=KID, **overrides) -> str:
+    now = int(time.time())
+    claims = {
+        "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+        "aud": PROJECT_ID,
+        "auth_time": now - 10,
+        "iat": now - 10,
+        "exp": now + 3600,
+        "sub": "firebase-uid-1",
+        "email": "firebase@example.com",
+        "name": "Firebase User",
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, signing_key, algorithm="RS256", headers={"kid": kid})
+
+
+class TestFirebaseLogin:
+    """Test suite untuk POST /api/auth/firebase/login"""
+
+    def test_login_creates_user(self, client, db_session, google_certs, signing_key):
+        response = client.post("/api/auth/firebase/login", json={"id_token": _id_token(signing_key)})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["token_type"] == "bearer"
+        assert data["user_info"]["email"] == "firebase@example.com"
+        assert data["user_info"]["role"] == "user"
+        assert db_session.query(User).filter(User.email == "firebase@example.com").count() == 1
+
+    def test_login_existing_user_keeps_role(self, client, test_admin_user, google_certs, signing_key):
+        token = _id_token(signing_key, email=test_admin_user.email)
+        response = client.post("/api/auth/firebase/login", json={"id_token": token})
+        assert response.status_code == 200
+        assert response.json()["user_info"]["role"] == "admin"
+
+    def test_deactivated_user_rejected(self, client, db_session, test_user, google_certs, signing_key):
+        test_user.is_active = False
+        db_session.commit()
+        token = _id_token(signing_key, email=test_user.email)
+        response = client.post("/api/auth/firebase/login", json={"id_token": token})
+        assert response.status_code == 403
+
+    def test_expired_token(self, client, google_certs, signing_key):
+        now = int(time.time())
+        token = _id_token(signing_key, iat=now - 7200, auth_time=now - 7200, exp=now - 3600)
+        response = client.post("/api/auth/firebase/login", json={"id_token": token})
+        assert response.status_code == 401
+        assert "kedaluwarsa" in response.json()["detail"]
+
+    def test_wrong_audience(self, client, google_certs, signing_key):
+        token = _id_token(signing_key, aud="other-project")
+        response = client.post("/api/auth/firebase/login", json={"id_token": token})
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token Firebase tidak valid."
+
+    def test_foreign_signature(self, client, google_certs):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        response = client.post("/api/auth/firebase/login", json={"id_token": _id_token(other_key)})
+        assert response.status_code == 401
+
+    def test_malformed_token(self, client, google_certs):
+        response = client.post("/api/auth/firebase/login", json={"id_token": "bukan.token"})
+        assert response.status_code == 401
+
+
+class TestFirebaseTokenCaches:
+    """Cache sertifikat (sesuai max-age) dan cache token terverifikasi"""
+
+    def test_certificates_fetched_once_for_login_burst(self, client, google_certs, signing_key):
+        for i in range(5):
+            token = _id_token(signing_key, sub=f"uid-{i}", email=f"burst{i}@example.com")
+            assert client.post("/api/auth/firebase/login", json={"id_token": token}).status_code == 200
+        assert len(google_certs) == 1
+
+    def test_unknown_kid_refresh_is_throttled(self, monkeypatch, google_certs, signing_key):
+        now = [1000.0]
+        monkeypatch.setattr(firebase_tokens.certificate_cache, "_clock", lambda: now[0])
+        firebase_tokens.verify_id_token(_id_token(signing_key), PROJECT_ID)
+        for _ in range(3):
+            with pytest.raises(firebase_tokens.InvalidFirebaseToken):
+                firebase_tokens.verify_id_token(_id_token(signing_key, kid="rotated-kid"), PROJECT_ID)
+        assert len(google_certs) == 1
+
+        now[0] += firebase_tokens.MIN_REFRESH_INTERVAL_SECONDS
+        with pytest.raises(firebase_tokens.InvalidFirebaseToken):
+            firebase_tokens.verify_id_token(_id_token(signing_key, kid="rotated-kid"), PROJECT_ID)
+        assert len(google_certs) == 2
+
+    def test_certificates_refreshed_after_max_age(self, signing_key):
+        now = [0.0]
+        fetches = []
+        pem = _self_signed_certificate(signing_key)
+
+        def fetch():
+            fetches.append(now[0])
+            return {KID: pem}, 600
+
+        cache = firebase_tokens.CertificateCache(fetch=fetch, clock=lambda: now[0])
+        assert cache.get(KID) is not None
+        now[0] = 599
+        cache.get(KID)
+        assert fetches == [0.0]
+        now[0] = 601
+        cache.get(KID)
+        assert fetches == [0.0, 601]
+
+    def test_verified_token_cached(self, google_certs, signing_key, monkeypatch):
+        token = _id_token(signing_key)
+        claims = firebase_tokens.verify_id_token(token, PROJECT_ID)
+        assert claims["uid"] == "firebase-uid-1"
+
+        def fail(*args, **kwargs):
+            raise AssertionError("token cache tidak dipakai")
+
+        monkeypatch.setattr(firebase_tokens.jwt, "decode", fail)
+        assert firebase_tokens.verify_id_token(token, PROJECT_ID)["email"] == "firebase@example.com"
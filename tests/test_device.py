@@ -9,6 +9,11 @@ Tests menggunakan role-based access control:
 """
 
 import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.device import SensorLog
 
 
 class TestClaimDevice:
@@ -101,6 +106,63 @@ class TestReadMyDevices:
         assert response.status_code == 401
 
 
+class TestDevicesOverview:
+    """Test suite untuk GET /api/devices/overview"""
+
+    def test_admin_overview_has_latest_reading_and_alerts(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        response = client.get("/api/devices/overview", headers=admin_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["total"] == 1
+        item = data["data"][0]
+        assert item["id"] == str(test_device_claimed.id)
+        assert item["is_online"] is True
+        assert item["latest"]["id"] == max(log.id for log in test_sensor_logs)
+        assert item["alerts_today"] == 1
+
+    def test_device_without_readings(self, client, admin_headers, test_device_claimed_no_logs):
+        item = client.get("/api/devices/overview", headers=admin_headers).json()["data"][0]
+        assert item["latest"] is None
+        assert item["alerts_today"] == 0
+
+    def test_operator_sees_assigned_only(self, client, operator_headers, test_device_claimed, test_device_other_user, test_operator_assignment):
+        data = client.get("/api/devices/overview", headers=operator_headers).json()
+        assert [item["id"] for item in data["data"]] == [str(test_device_claimed.id)]
+
+    def test_user_gets_empty_overview(self, client, auth_headers, test_device_claimed):
+        data = client.get("/api/devices/overview", headers=auth_headers).json()
+        assert data["total"] == 0 and data["data"] == []
+
+    def test_query_count_independent_of_device_count(self, client, db_session, admin_headers, test_admin_user, test_device_claimed, test_sensor_logs):
+        from sqlalchemy import event
+
+        from app.models.device import Device
+
+        def count_queries():
+            statements = []
+
+            def listener(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            engine = db_session.get_bind()
+            event.listen(engine, "before_cursor_execute", listener)
+            try:
+                assert client.get("/api/devices/overview", headers=admin_headers).status_code == 200
+            finally:
+                event.remove(engine, "before_cursor_execute", listener)
+            return len(statements)
+
+        count_queries()  # principal & peta akses masuk cache
+        single = count_queries()
+        for i in range(5):
+            device = Device(id=uuid.uuid4(), mac_address=f"10:00:00:00:00:{i:02X}", name=f"Kandang {i}", user_id=test_admin_user.id)
+            db_session.add(device)
+            db_session.flush()
+            db_session.add(SensorLog(device_id=device.id, temperature=30.0, humidity=60.0, ammonia=3.0, is_alert=True))
+        db_session.commit()
+        assert count_queries() == single
+
+
 class TestReadDeviceLogs:
     """Test suite untuk GET /api/devices/{id}/logs — access check"""
 
@@ -137,6 +199,180 @@ class TestReadDeviceLogs:
         assert len(response.json()["data"]) <= 3
 
 
+class TestLogsCursorPagination:
+    """Test suite untuk keyset pagination GET /api/devices/{id}/logs?cursor=..."""
+
+    @pytest.fixture
+    def logs_with_ties(self, db_session, test_device_claimed) -> list:
+        """7 log, sebagian dengan timestamp sama (tiebreaker id harus dipakai)."""
+        base = datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)
+        offsets = [0, 0, 1, 1, 1, 2, 3]
+        logs = [
+            SensorLog(device_id=test_device_claimed.id, temperature=25.0 + i, humidity=70.0,
+                      ammonia=5.0, is_alert=i % 2 == 0, timestamp=base + timedelta(minutes=minute))
+            for i, minute in enumerate(offsets)
+        ]
+        db_session.add_all(logs)
+        db_session.commit()
+        return logs
+
+    def _walk(self, client, headers, url, limit):
+        ids, cursor = [], ""
+        while True:
+            response = client.get(f"{url}?limit={limit}&cursor={cursor}", headers=headers)
+            assert response.status_code == 200
+            body = response.json()
+            assert "total" not in body  # mode cursor tidak menjalankan COUNT
+            ids += [log["id"] for log in body["data"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_walk_all_pages_without_gaps_or_duplicates(self, client, admin_headers, test_device_claimed, logs_with_ties):
+        ids = self._walk(client, admin_headers, f"/api/devices/{test_device_claimed.id}/logs", limit=2)
+        expected = [log.id for log in sorted(logs_with_ties, key=lambda l: (l.timestamp, l.id), reverse=True)]
+        assert ids == expected
+
+    def test_alerts_cursor(self, client, admin_headers, test_device_claimed, logs_with_ties):
+        ids = self._walk(client, admin_headers, f"/api/devices/{test_device_claimed.id}/alerts", limit=1)
+        alerts = [log for log in logs_with_ties if log.is_alert]
+        assert ids == [log.id for log in sorted(alerts, key=lambda l: (l.timestamp, l.id), reverse=True)]
+
+    def test_page_mode_returns_next_cursor(self, client, admin_headers, test_device_claimed, logs_with_ties):
+        url = f"/api/devices/{test_device_claimed.id}/logs"
+        first = client.get(f"{url}?limit=3", headers=admin_headers).json()
+        assert first["total"] == 7
+        second = client.get(f"{url}?limit=3&cursor={first['next_cursor']}", headers=admin_headers).json()
+        page_two = client.get(f"{url}?limit=3&page=2", headers=admin_headers).json()
+        assert [l["id"] for l in second["data"]] == [l["id"] for l in page_two["data"]]
+
+        last = client.get(f"{url}?limit=3&page=3", headers=admin_headers).json()
+        assert last["next_cursor"] is None
+
+    def test_page_total_from_device_counters(self, client, admin_headers, test_device_claimed, logs_with_ties):
+        logs = client.get(f"/api/devices/{test_device_claimed.id}/logs?limit=3", headers=admin_headers).json()
+        assert logs["total"] == 7
+        assert logs["count_mode"] == "estimated"
+        alerts = client.get(f"/api/devices/{test_device_claimed.id}/alerts", headers=admin_headers).json()
+        assert alerts["total"] == 4
+
+    def test_invalid_cursor(self, client, admin_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs?cursor=bukan-cursor", headers=admin_headers)
+        assert response.status_code == 400
+
+
+class TestLogExport:
+    """Test suite untuk streaming export GET /api/devices/{id}/logs/export"""
+
+    @pytest.fixture
+    def export_logs(self, db_session, test_device_claimed) -> list:
+        base = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        logs = [
+            SensorLog(device_id=test_device_claimed.id, temperature=20.0 + i, humidity=60.0, ammonia=None if i == 3 else 4.0,
+                      light_level=i % 2, is_alert=i == 5, alert_message="Panas, \"cek\" kipas" if i == 5 else None,
+                      timestamp=base + timedelta(hours=i))
+            for i in range(12)
+        ]
+        db_session.add_all(logs)
+        db_session.commit()
+        return logs
+
+    def test_csv_streams_full_history(self, client, admin_headers, test_device_claimed, export_logs, monkeypatch):
+        import csv
+        import io
+        import app.routers.device as device_router
+
+        monkeypatch.setattr(device_router, "EXPORT_FETCH_SIZE", 5)  # beberapa chunk
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/export", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert [int(row["id"]) for row in rows] == [log.id for log in export_logs]
+        assert rows[3]["ammonia"] == ""
+        assert rows[5]["alert_message"] == 'Panas, "cek" kipas'
+
+    def test_ndjson_with_range(self, client, admin_headers, test_device_claimed, export_logs):
+        import json
+
+        response = client.get(
+            f"/api/devices/{test_device_claimed.id}/logs/export?format=ndjson"
+            "&from=2026-02-01T02:00:00Z&to=2026-02-01T04:00:00Z",
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["temperature"] for line in lines] == [22.0, 23.0, 24.0]
+        assert lines[1]["ammonia"] is None
+
+    def test_parquet(self, client, admin_headers, test_device_claimed, export_logs):
+        from app.core.export import parquet_available
+
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/export?format=parquet", headers=admin_headers)
+        if not parquet_available():
+            assert response.status_code == 400
+            return
+        import io
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(io.BytesIO(response.content))
+        assert table.column("id").to_pylist() == [log.id for log in export_logs]
+
+    def test_msgpack_columnar_chunks(self, client, admin_headers, test_device_claimed, export_logs, monkeypatch):
+        import msgpack
+        import app.routers.device as device_router
+
+        monkeypatch.setattr(device_router, "EXPORT_FETCH_SIZE", 5)  # beberapa chunk
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/export?format=msgpack", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+
+        unpacker = msgpack.Unpacker(raw=False)
+        unpacker.feed(response.content)
+        chunks = list(unpacker)
+        assert len(chunks) >= 2
+        ids = [value for chunk in chunks for value in chunk["id"]]
+        assert ids == [log.id for log in export_logs]
+        ammonia = [value for chunk in chunks for value in chunk["ammonia"]]
+        assert ammonia[3] is None
+
+    def test_stops_when_client_disconnects(self):
+        import asyncio
+        import app.routers.device as device_router
+
+        closed = []
+
+        def chunks():
+            try:
+                for i in range(100):
+                    yield f"{i}\n".encode()
+            finally:
+                closed.append(True)
+
+        class FakeRequest:
+            url = type("Url", (), {"path": "/export"})()
+            calls = 0
+
+            async def is_disconnected(self):
+                self.calls += 1
+                return self.calls > 2
+
+        async def consume():
+            return [chunk async for chunk in device_router._stream_until_disconnect(FakeRequest(), chunks())]
+
+        assert asyncio.run(consume()) == [b"0\n", b"1\n"]
+        assert closed == [True]
+
+    def test_export_requires_access(self, client, auth_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/export", headers=auth_headers)
+        assert response.status_code == 403
+
+    def test_export_invalid_format(self, client, admin_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/export?format=xlsx", headers=admin_headers)
+        assert response.status_code == 422
+
+
 class TestControlDevice:
     """Test suite untuk POST /api/devices/{id}/control — hanya admin/operator"""
 
@@ -198,6 +434,182 @@ class TestGetDeviceAlerts:
         response = client.get(f"/api/devices/{test_device_claimed.id}/alerts", headers=auth_headers)
         assert response.status_code == 403
 
+    def test_alert_pages_use_partial_index(self, db_session, test_device_claimed, test_sensor_logs):
+        """Query alert (halaman pertama & halaman cursor) dilayani partial index alert"""
+        from sqlalchemy import tuple_
+        from app.routers.device import _alerts_query
+
+        query = _alerts_query(db_session, test_device_claimed.id)
+        next_page = query.filter(
+            tuple_(SensorLog.timestamp, SensorLog.id) < tuple_(datetime.now(timezone.utc), 10**9)
+        )
+        for q in (query, next_page):
+            compiled = q.limit(21).statement.compile(db_session.get_bind())
+            # Nilai parameter tidak mempengaruhi plan — cukup dikirim sebagai string/angka
+            params = tuple(
+                value if isinstance(value, int) else str(value)
+                for value in (compiled.params[name] for name in compiled.positiontup)
+            )
+            plan = db_session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+            details = " ".join(str(row[-1]) for row in plan)
+            assert "ix_sensor_logs_device_alerts" in details
+            assert "TEMP B-TREE" not in details  # urutan langsung dari index, tanpa sort
+
+
+class TestCompactListFormats:
+    """Test suite untuk content negotiation /logs & /alerts (columnar JSON / MessagePack)"""
+
+    def test_columnar_matches_json(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        url = f"/api/devices/{test_device_claimed.id}/logs?limit=5"
+        rows = client.get(url, headers=admin_headers).json()
+        response = client.get(url + "&format=columnar", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/vnd.columnar+json"
+        assert "Accept" in response.headers["vary"]
+
+        body = response.json()
+        assert body["total"] == rows["total"]
+        assert body["next_cursor"] == rows["next_cursor"]
+        assert set(body["data"]) == set(rows["data"][0])
+        for key, values in body["data"].items():
+            assert values == [row[key] for row in rows["data"]]
+
+    def test_msgpack_via_accept_header(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        import msgpack
+
+        url = f"/api/devices/{test_device_claimed.id}/logs?limit=5"
+        rows = client.get(url, headers=admin_headers).json()
+        response = client.get(url, headers={**admin_headers, "Accept": "application/msgpack"})
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+
+        body = msgpack.unpackb(response.content)
+        assert body["data"]["id"] == [row["id"] for row in rows["data"]]
+        assert body["data"]["timestamp"] == [row["timestamp"] for row in rows["data"]]
+        assert len(response.content) < len(client.get(url, headers=admin_headers).content)
+
+    def test_format_param_overrides_accept(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        response = client.get(
+            f"/api/devices/{test_device_claimed.id}/logs?format=json",
+            headers={**admin_headers, "Accept": "application/msgpack"},
+        )
+        assert response.headers["content-type"] == "application/json"
+        assert isinstance(response.json()["data"], list)
+
+    def test_empty_alerts_keep_columns(self, client, admin_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/alerts?format=columnar", headers=admin_headers)
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert set(data) == {"id", "temperature", "humidity", "ammonia", "light_level", "is_alert", "alert_message", "timestamp"}
+        assert all(values == [] for values in data.values())
+
+    def test_invalid_format(self, client, admin_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs?format=xml", headers=admin_headers)
+        assert response.status_code == 422
+
+
+class TestConditionalReads:
+    """Test suite untuk ETag dari versi device (row_version + jendela heartbeat) pada /devices/ dan /status"""
+
+    def _queries(self, db_session, client, url, headers):
+        from sqlalchemy import event
+
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get(url, headers=headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return response, statements
+
+    def test_row_version_bumped_only_by_visible_changes(self, db_session, test_device_claimed):
+        version = test_device_claimed.row_version
+        # Reading (counter + heartbeat) tidak menaikkan versi
+        db_session.add(SensorLog(device_id=test_device_claimed.id, temperature=30.0, humidity=60.0, ammonia=3.0))
+        db_session.commit()
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.row_version == version
+        assert test_device_claimed.log_count == 1
+
+        test_device_claimed.name = "Kandang Baru"
+        db_session.commit()
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.row_version == version + 1
+
+        test_device_claimed.user_id = None
+        db_session.commit()
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.row_version == version + 2
+
+    def test_device_list_not_modified(self, client, db_session, admin_headers, test_device_claimed):
+        first = client.get("/api/devices/", headers=admin_headers)
+        etag = first.headers["etag"]
+
+        response, statements = self._queries(db_session, client, "/api/devices/", {**admin_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert len(statements) == 1  # hanya token versi; principal & halaman tidak diambil
+
+        # Halaman lain = representasi lain
+        assert client.get("/api/devices/?limit=5", headers=admin_headers).headers["etag"] != etag
+
+    def test_device_list_changes_on_update(self, client, db_session, admin_headers, test_device_claimed):
+        etag = client.get("/api/devices/", headers=admin_headers).headers["etag"]
+        test_device_claimed.name = "Kandang Baru"
+        db_session.commit()
+
+        response = client.get("/api/devices/", headers={**admin_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+    def test_ingest_within_window_keeps_etags(self, client, db_session, admin_headers, test_device_claimed, monkeypatch):
+        from app.core.config import settings
+
+        # Jendela lebar: reading di bawah tidak mungkin jatuh di jendela berikutnya
+        monkeypatch.setattr(settings, "DEVICE_ONLINE_TIMEOUT_SECONDS", 10 ** 9)
+        test_device_claimed.last_heartbeat = datetime.now(timezone.utc)
+        db_session.commit()
+        urls = ("/api/devices/", f"/api/devices/{test_device_claimed.id}/status")
+        etags = {url: client.get(url, headers=admin_headers).headers["etag"] for url in urls}
+
+        # Reading baru di jendela online yang sama: list & status tetap 304
+        db_session.add(SensorLog(device_id=test_device_claimed.id, temperature=30.0, humidity=60.0, ammonia=3.0))
+        db_session.commit()
+        for url, etag in etags.items():
+            assert client.get(url, headers={**admin_headers, "If-None-Match": etag}).status_code == 304
+
+    def test_device_list_changes_when_device_goes_offline(self, client, admin_headers, test_device_claimed, monkeypatch):
+        from app.core.config import settings
+
+        etag = client.get("/api/devices/", headers=admin_headers).headers["etag"]
+        # Tanpa UPDATE apa pun: hanya waktu yang berjalan melewati timeout online
+        monkeypatch.setattr(settings, "DEVICE_ONLINE_TIMEOUT_SECONDS", -60)
+        response = client.get("/api/devices/", headers={**admin_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json()["data"][0]["is_online"] is False
+
+    def test_status_not_modified_until_heartbeat(self, client, db_session, admin_headers, test_device_claimed):
+        from app.core.config import settings
+
+        url = f"/api/devices/{test_device_claimed.id}/status"
+        first = client.get(url, headers=admin_headers)
+        etag = first.headers["etag"]
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        assert client.get(url, headers={**admin_headers, "If-None-Match": etag}).status_code == 304
+
+        # Heartbeat di jendela timeout berikutnya → ETag berubah
+        test_device_claimed.last_heartbeat = datetime.now(timezone.utc) + timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
+        db_session.commit()
+        changed = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
 
 class TestUnclaimDevice:
     """Test suite untuk POST /api/devices/{id}/unclaim — hanya admin+"""
@@ -295,6 +707,60 @@ class TestDeviceAssignment:
         assert response.status_code == 200
 
 
+class TestDeviceAccessMap:
+    """Cek akses device memakai peta akses per user (satu query, lalu lookup dict)"""
+
+    def test_access_checks_reuse_loaded_map(self, client, db_session, operator_headers, test_device_claimed, test_operator_assignment):
+        from sqlalchemy import event
+
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        url = f"/api/devices/{test_device_claimed.id}/status"
+        assert client.get(url, headers=operator_headers).status_code == 200
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert client.get(url, headers=operator_headers).status_code == 200
+            assert client.get(f"/api/devices/{uuid.uuid4()}/status", headers=operator_headers).status_code == 404
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert not any("device_assignments" in statement for statement in statements)
+
+    def test_assign_and_unassign_update_access(self, client, admin_headers, test_device_claimed, test_user, auth_headers):
+        url = f"/api/devices/{test_device_claimed.id}/status"
+        assert client.get(url, headers=auth_headers).status_code == 403
+
+        client.post(
+            f"/api/devices/{test_device_claimed.id}/assign",
+            json={"user_id": str(test_user.id), "role": "viewer"},
+            headers=admin_headers,
+        )
+        assert client.get(url, headers=auth_headers).status_code == 200
+
+        client.delete(f"/api/devices/{test_device_claimed.id}/assign/{test_user.id}", headers=admin_headers)
+        assert client.get(url, headers=auth_headers).status_code == 403
+
+    def test_unclaim_revokes_owner_access(self, client, admin_headers, test_device_claimed):
+        url = f"/api/devices/{test_device_claimed.id}/status"
+        assert client.get(url, headers=admin_headers).status_code == 200
+        assert client.post(f"/api/devices/{test_device_claimed.id}/unclaim", headers=admin_headers).status_code == 200
+        assert client.get(url, headers=admin_headers).status_code == 404
+
+    def test_claim_grants_owner_access(self, client, admin_headers, test_device_unclaimed):
+        url = f"/api/devices/{test_device_unclaimed.id}/status"
+        assert client.get(url, headers=admin_headers).status_code == 404
+        response = client.post(
+            "/api/devices/claim",
+            json={"mac_address": test_device_unclaimed.mac_address, "name": "Kandang Baru"},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        assert client.get(url, headers=admin_headers).status_code == 200
+
+
 class TestGetAllDevices:
     """Test suite untuk GET /api/devices/all"""
 
@@ -428,3 +894,141 @@ class TestDeleteDevice:
         get_response = client.get("/api/devices/all", headers=super_admin_headers)
         device_ids = [d["id"] for d in get_response.json()["data"]]
         assert str(test_device_claimed.id) not in device_ids
+
+
+class TestLeanRowSerializers:
+    """RowSerializer (select kolom, tanpa ORM) harus identik dengan model_dump() schema padanannya"""
+
+    def test_device_rows_match_device_response(self, db_session, test_device_claimed, test_device_unclaimed, test_device_other_user):
+        from app.core.serializers import DEVICE_ROWS
+        from app.models.device import Device
+        from app.schemas import DeviceResponse
+
+        test_device_other_user.last_heartbeat = datetime.now(timezone.utc) - timedelta(hours=1)
+        db_session.commit()
+
+        lean = DEVICE_ROWS(db_session.query(*DEVICE_ROWS.columns).order_by(Device.mac_address).all())
+        full = [
+            DeviceResponse.model_validate(device).model_dump()
+            for device in db_session.query(Device).order_by(Device.mac_address).all()
+        ]
+        assert lean == full
+        assert {item["is_online"] for item in lean} == {True, False}
+
+    def test_online_boundary_matches_device_response(self, db_session, test_device_claimed, monkeypatch):
+        import app.core.serializers as serializers
+        import app.schemas.device as device_schemas
+        from app.core.config import settings
+        from app.core.serializers import DEVICE_ROWS
+        from app.models.device import Device
+        from app.schemas import DeviceResponse
+
+        now = datetime.now(timezone.utc)
+
+        class FrozenDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+
+        monkeypatch.setattr(serializers, "datetime", FrozenDatetime)
+        monkeypatch.setattr(device_schemas, "datetime", FrozenDatetime)
+
+        # Tepat di batas timeout: online di semua jalur (elapsed <= timeout)
+        test_device_claimed.last_heartbeat = now - timedelta(seconds=settings.DEVICE_ONLINE_TIMEOUT_SECONDS)
+        db_session.commit()
+        rows = DEVICE_ROWS(db_session.query(*DEVICE_ROWS.columns).filter(Device.id == test_device_claimed.id).all())
+        assert rows[0]["is_online"] is True
+        assert DeviceResponse.model_validate(test_device_claimed).is_online is True
+
+    def test_log_and_user_rows_match_schemas(self, db_session, test_sensor_logs, test_admin_user, test_user):
+        from app.core.serializers import LOG_ROWS, USER_ROWS
+        from app.models.user import User
+        from app.schemas import LogResponse, UserResponse
+
+        logs = db_session.query(SensorLog).order_by(SensorLog.id).all()
+        assert LOG_ROWS(db_session.query(*LOG_ROWS.columns).order_by(SensorLog.id).all()) == [
+            LogResponse.model_validate(log).model_dump() for log in logs
+        ]
+        users = db_session.query(User).order_by(User.email).all()
+        assert USER_ROWS(db_session.query(*USER_ROWS.columns).order_by(User.email).all()) == [
+            UserResponse.model_validate(user).model_dump() for user in users
+        ]
+
+    def test_device_list_uses_column_select(self, client, db_session, admin_headers, test_device_claimed):
+        from sqlalchemy import event
+
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get("/api/devices/", headers=admin_headers)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.status_code == 200
+        assert response.json()["data"][0]["is_online"] is True
+        page_query = next(s for s in statements if "LIMIT" in s and "devices.mac_address" in s)
+        assert "devices.created_at" not in page_query and "log_count" not in page_query
+
+
+class TestPaginateCountModes:
+    """Test suite untuk count mode paginate() (exact / cached / estimated / none)"""
+
+    def test_none_mode_skips_total(self, db_session, test_sensor_logs):
+        from app.core.pagination import paginate
+
+        query = db_session.query(SensorLog).order_by(SensorLog.id)
+        first = paginate(query, page=1, limit=5, count="none")
+        assert first["total"] is None and first["total_pages"] is None
+        assert first["has_more"] is True
+        assert len(first["data"]) == 5
+        last = paginate(query, page=2, limit=5, count="none")
+        assert last["has_more"] is False
+
+    def test_cached_mode_reuses_count(self, db_session, test_device_claimed, test_sensor_logs):
+        from app.core.pagination import paginate
+
+        query = db_session.query(SensorLog).filter(SensorLog.device_id == test_device_claimed.id)
+        assert paginate(query, limit=2, count="cached")["total"] == 6
+        db_session.add(SensorLog(device_id=test_device_claimed.id, temperature=30.0, humidity=70.0, ammonia=5.0))
+        db_session.commit()
+        assert paginate(query, limit=2, count="cached")["total"] == 6
+        assert paginate(query, limit=2, count="exact")["total"] == 7
+
+    def test_estimated_falls_back_to_exact_without_planner(self, db_session, test_sensor_logs):
+        from app.core.pagination import paginate
+
+        query = db_session.query(SensorLog)
+        assert paginate(query, count="estimated")["total"] == 6
+
+    def test_async_paginate_matches_sync_on_fallback_session(self, db_session, test_device_claimed, test_sensor_logs):
+        import asyncio
+
+        from sqlalchemy import select
+
+        from app.core.pagination import apaginate, apaginate_keyset, paginate, paginate_keyset
+        from app.database import ReadSession
+        from app.routers.device import LOG_CURSOR_COLUMNS
+
+        db = ReadSession(db_session, is_async=False)
+        stmt = select(SensorLog).where(SensorLog.device_id == test_device_claimed.id)\
+            .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+        query = db_session.query(SensorLog).filter(SensorLog.device_id == test_device_claimed.id)\
+            .order_by(SensorLog.timestamp.desc(), SensorLog.id.desc())
+
+        page = asyncio.run(apaginate(db, stmt, page=2, limit=4))
+        assert page == paginate(query, page=2, limit=4)
+        assert page["total"] == 6 and len(page["data"]) == 2
+
+        first = asyncio.run(apaginate_keyset(db, stmt, LOG_CURSOR_COLUMNS, limit=4))
+        assert first == paginate_keyset(query, LOG_CURSOR_COLUMNS, limit=4)
+        rest = asyncio.run(apaginate_keyset(db, stmt, LOG_CURSOR_COLUMNS, first["next_cursor"], limit=4))
+        assert len(rest["data"]) == 2 and rest["next_cursor"] is None
+
+    def test_counters_follow_inserts(self, db_session, test_device_claimed, test_sensor_logs):
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.log_count == 6
+        assert test_device_claimed.alert_count == 1
@@ -1,8 +1,9 @@
 """
-Unit tests untuk endpoint GET /devices/{device_id}/stats/daily.
+Unit tests untuk endpoint grafik: GET /devices/{device_id}/stats/daily
+dan GET /devices/{device_id}/logs/range.
 
-Menguji fitur statistik rata-rata suhu harian yang digunakan
-untuk grafik dashboard di mobile app.
+Menguji fitur statistik rata-rata suhu harian dan data range downsampled
+yang digunakan untuk grafik dashboard di mobile app.
 """
 
 import uuid
@@ -352,3 +353,448 @@ class TestGetDailyTemperatureStats:
         # jadi query days=1 (hari ini saja) harus mengembalikan list kosong.
         assert data["statistics"] == []
         assert data["total_days"] == 0
+
+
+class TestLogRange:
+    """Test suite untuk GET /devices/{device_id}/logs/range (grafik, downsampled LTTB)"""
+
+    def _add_series(self, db_session, device, count, start, step_seconds=60, spike_at=None):
+        from app.models.device import SensorLog
+
+        logs = []
+        for i in range(count):
+            logs.append(SensorLog(
+                device_id=device.id,
+                temperature=99.0 if i == spike_at else 25.0 + (i % 10) * 0.1,
+                humidity=70.0,
+                ammonia=None if i % 2 else 5.0,
+                is_alert=False,
+                timestamp=start + timedelta(seconds=i * step_seconds),
+            ))
+        db_session.add_all(logs)
+        db_session.commit()
+        return logs
+
+    def test_range_downsampled_to_max_points(self, client, db_session, admin_headers, test_device_claimed):
+        start = datetime.now(timezone.utc) - timedelta(hours=10)
+        self._add_series(db_session, test_device_claimed, 500, start, spike_at=250)
+
+        response = client.get(
+            f"/api/devices/{test_device_claimed.id}/logs/range",
+            params={"from": start.isoformat(), "max_points": 50},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["raw_points"] == 500
+        assert data["method"] == "lttb"
+        assert "from" in data and "to" in data
+
+        temperature = data["series"]["temperature"]
+        assert len(temperature["t"]) == len(temperature["v"]) == 50
+        assert temperature["t"] == sorted(temperature["t"])
+        assert 99.0 in temperature["v"]  # LTTB mempertahankan puncak
+        # Metrik dengan nilai kosong hanya memakai reading yang punya nilai
+        assert len(data["series"]["ammonia"]["v"]) == 50
+        assert set(data["series"]["ammonia"]["v"]) == {5.0}
+
+    def test_range_small_series_returned_as_is(self, client, db_session, admin_headers, test_device_claimed):
+        start = datetime.now(timezone.utc) - timedelta(hours=1)
+        logs = self._add_series(db_session, test_device_claimed, 5, start)
+
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/range", headers=admin_headers)
+        series = response.json()["series"]["temperature"]
+        assert series["v"] == [log.temperature for log in logs]
+        assert series["t"][0] == int(start.timestamp() * 1000)
+
+    def test_range_excludes_outside_window(self, client, admin_headers, test_device_claimed, test_sensor_logs_old):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/range", headers=admin_headers)
+        assert response.json()["raw_points"] == 0
+        assert response.json()["series"]["temperature"] == {"t": [], "v": []}
+
+    def test_range_invalid_window(self, client, admin_headers, test_device_claimed):
+        url = f"/api/devices/{test_device_claimed.id}/logs/range"
+        now = datetime.now(timezone.utc)
+        reversed_window = {"from": now.isoformat(), "to": (now - timedelta(hours=1)).isoformat()}
+        assert client.get(url, params=reversed_window, headers=admin_headers).status_code == 400
+        too_long = {"from": (now - timedelta(days=365)).isoformat()}
+        assert client.get(url, params=too_long, headers=admin_headers).status_code == 400
+        assert client.get(url, params={"max_points": 2}, headers=admin_headers).status_code == 422
+
+    def test_range_access_denied(self, client, auth_headers, test_device_claimed):
+        response = client.get(f"/api/devices/{test_device_claimed.id}/logs/range", headers=auth_headers)
+        assert response.status_code == 403
+
+
+class TestSensorRollups:
+    """Test suite untuk rollup per jam/hari (update incremental saat insert + backfill)"""
+
+    def _rollup_rows(self, db_session, model, device_id):
+        from app.models.rollup import ROLLUP_METRICS
+
+        rows = db_session.query(model).filter(model.device_id == device_id).all()
+        fields = ["sample_count", "alert_count"] + [
+            f"{metric}_{part}" for metric in ROLLUP_METRICS for part in ("count", "sum", "min", "max")
+        ]
+        return sorted(
+            (str(getattr(row, "bucket", None) or row.day),) + tuple(round(getattr(row, f) or 0, 6) for f in fields)
+            for row in rows
+        )
+
+    def test_insert_updates_hourly_and_daily(self, db_session, test_device_claimed, test_sensor_logs):
+        from app.models.rollup import SensorRollupDaily, SensorRollupHourly
+
+        daily = db_session.query(SensorRollupDaily).filter_by(device_id=test_device_claimed.id).one()
+        assert daily.sample_count == 6
+        assert daily.alert_count == 1
+        assert daily.temperature_count == 6
+        assert daily.temperature_min == 25.0
+        assert daily.temperature_max == 40.0
+        assert round(daily.temperature_sum, 6) == round(sum(log.temperature for log in test_sensor_logs), 6)
+
+        hourly_samples = sum(
+            row.sample_count
+            for row in db_session.query(SensorRollupHourly).filter_by(device_id=test_device_claimed.id)
+        )
+        assert hourly_samples == 6
+
+    def test_flush_writes_one_statement_per_table(self, db_session, test_device_claimed, test_device_other_user):
+        from sqlalchemy import event
+
+        from app.models.device import SensorLog
+        from app.models.rollup import SensorRollupHourly
+
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        base = datetime(2026, 5, 1, 10, 5, tzinfo=timezone.utc)
+        for device in (test_device_claimed, test_device_claimed, test_device_other_user):
+            for i in range(3):
+                db_session.add(SensorLog(
+                    device_id=device.id, temperature=20.0 + i, humidity=None if i == 0 else 60.0, ammonia=3.0,
+                    is_alert=i == 2, timestamp=base + timedelta(minutes=i * 10),
+                ))
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            db_session.flush()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        db_session.commit()
+
+        # Satu UPDATE counter (executemany untuk 2 device) + satu upsert per tabel rollup
+        for prefix in ("UPDATE devices", "INSERT INTO sensor_rollup_hourly", "INSERT INTO sensor_rollup_daily"):
+            assert sum(statement.startswith(prefix) for statement in statements) == 1
+
+        db_session.refresh(test_device_claimed)
+        assert (test_device_claimed.log_count, test_device_claimed.alert_count) == (6, 2)
+        hourly = db_session.query(SensorRollupHourly).filter_by(device_id=test_device_claimed.id).one()
+        assert (hourly.sample_count, hourly.alert_count, hourly.humidity_count) == (6, 2, 4)
+        assert (hourly.temperature_min, hourly.temperature_max) == (20.0, 22.0)
+
+    def test_rebuild_matches_incremental(self, db_session, test_device_claimed, test_sensor_logs, test_sensor_logs_old):
+        from app.core.rollups import rebuild_rollups
+        from app.models.rollup import SensorRollupDaily, SensorRollupHourly
+
+        before = {
+            model: self._rollup_rows(db_session, model, test_device_claimed.id)
+            for model in (SensorRollupHourly, SensorRollupDaily)
+        }
+        written = rebuild_rollups(db_session, test_device_claimed.id)
+        days = {log.timestamp.date() for log in test_sensor_logs + test_sensor_logs_old}
+        assert written["sensor_rollup_daily"] == len(days)
+
+        db_session.expire_all()
+        for model, rows in before.items():
+            assert self._rollup_rows(db_session, model, test_device_claimed.id) == rows
+
+    def test_stats_daily_uses_rollups(self, client, db_session, admin_headers, test_device_claimed, test_sensor_logs):
+        from app.models.rollup import SensorRollupDaily
+
+        # Hapus rollup: endpoint tidak lagi membaca sensor_logs mentah
+        db_session.query(SensorRollupDaily).delete()
+        db_session.commit()
+        response = client.get(f"/api/devices/{test_device_claimed.id}/stats/daily", headers=admin_headers)
+        assert response.json()["statistics"] == []
+
+
+class TestDailyStatsCache:
+    """Test suite untuk cache hari yang sudah selesai + ETag pada stats/daily"""
+
+    def _add_day(self, db_session, device, when, count=3, temperature=27.0):
+        from app.models.device import SensorLog
+
+        for i in range(count):
+            db_session.add(SensorLog(
+                device_id=device.id,
+                temperature=temperature,
+                humidity=70.0,
+                ammonia=5.0,
+                is_alert=False,
+                timestamp=when + timedelta(minutes=i),
+            ))
+        db_session.commit()
+
+    def test_finished_days_served_from_cache(self, client, db_session, admin_headers, test_device_claimed):
+        from app.models.rollup import SensorRollupDaily
+
+        two_days_ago = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        self._add_day(db_session, test_device_claimed, two_days_ago)
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+
+        first = client.get(url, headers=admin_headers).json()
+        assert [s["data_points"] for s in first["statistics"]] == [3]
+
+        # Rollup hari yang sudah selesai dihapus: hasil tetap dari cache
+        db_session.query(SensorRollupDaily).delete()
+        db_session.commit()
+        second = client.get(url, headers=admin_headers).json()
+        assert second["statistics"] == first["statistics"]
+
+    def test_today_computed_live(self, client, db_session, admin_headers, test_device_claimed, test_sensor_logs):
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+        today = datetime.now(timezone.utc).date().isoformat()
+
+        first = client.get(url, headers=admin_headers).json()
+        assert {s["date"]: s["data_points"] for s in first["statistics"]}[today] == 6
+
+        self._add_day(db_session, test_device_claimed, datetime.now(timezone.utc), count=1)
+        second = client.get(url, headers=admin_headers).json()
+        assert {s["date"]: s["data_points"] for s in second["statistics"]}[today] == 7
+
+    def test_etag_revalidation(self, client, db_session, admin_headers, test_device_claimed, test_sensor_logs):
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+        response = client.get(url, headers=admin_headers)
+        etag = response.headers["etag"]
+        assert response.headers["cache-control"] == "private, no-cache"
+
+        not_modified = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+        assert not_modified.headers["etag"] == etag
+
+        # Data baru → ETag berubah, request kondisional kembali 200
+        self._add_day(db_session, test_device_claimed, datetime.now(timezone.utc), count=1)
+        changed = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["etag"] != etag
+
+    def test_no_last_modified_validator(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        # Heartbeat bukan penanda perubahan statistik (hari berganti, rebuild rollup):
+        # hanya ETag yang dipakai, If-Modified-Since diabaikan
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+        response = client.get(url, headers=admin_headers)
+        assert "last-modified" not in response.headers
+
+        future = "Fri, 01 Jan 2100 00:00:00 GMT"
+        assert client.get(url, headers={**admin_headers, "If-Modified-Since": future}).status_code == 200
+
+    def test_columnar_and_msgpack_formats(self, client, admin_headers, test_device_claimed, test_sensor_logs):
+        import msgpack
+
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+        rows = client.get(url, headers=admin_headers)
+        columnar = client.get(url + "?format=columnar", headers=admin_headers)
+        packed = client.get(url, headers={**admin_headers, "Accept": "application/msgpack"})
+        assert columnar.status_code == packed.status_code == 200
+
+        statistics = rows.json()["statistics"]
+        assert columnar.json()["statistics"]["avg_temperature"] == [s["avg_temperature"] for s in statistics]
+        assert set(columnar.json()["statistics"]) == set(statistics[0])
+        assert msgpack.unpackb(packed.content)["statistics"]["date"] == [s["date"] for s in statistics]
+
+        # Setiap bentuk punya ETag sendiri; revalidasi tetap berlaku untuk format non-JSON
+        assert len({rows.headers["etag"], columnar.headers["etag"], packed.headers["etag"]}) == 3
+        not_modified = client.get(
+            url, headers={**admin_headers, "Accept": "application/msgpack", "If-None-Match": packed.headers["etag"]},
+        )
+        assert not_modified.status_code == 304
+
+    def test_etag_changes_after_rollup_rebuild(self, client, db_session, admin_headers, test_device_claimed, test_sensor_logs):
+        from app.core.rollups import rebuild_rollups
+
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+        etag = client.get(url, headers=admin_headers).headers["etag"]
+        rebuild_rollups(db_session, test_device_claimed.id)
+        assert client.get(url, headers={**admin_headers, "If-None-Match": etag}).status_code == 200
+
+    def test_rebuild_replaces_cached_empty_days(self, client, db_session, admin_headers, test_device_claimed, monkeypatch):
+        from app.core import rollups
+        from app.models.rollup import SensorRollupDaily
+
+        two_days_ago = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0) - timedelta(days=2)
+        self._add_day(db_session, test_device_claimed, two_days_ago)
+        url = f"/api/devices/{test_device_claimed.id}/stats/daily"
+
+        # Rollup belum di-backfill (mis. tepat setelah migration 008): hari itu ter-cache kosong
+        db_session.query(SensorRollupDaily).delete()
+        db_session.commit()
+        assert client.get(url, headers=admin_headers).json()["statistics"] == []
+
+        # Rebuild dijalankan di proses lain: invalidasi lokal tidak sampai ke worker API
+        monkeypatch.setattr(rollups.daily_stats_cache, "invalidate_device", lambda device_id=None: None)
+        rollups.rebuild_rollups(db_session, test_device_claimed.id)
+        statistics = client.get(url, headers=admin_headers).json()["statistics"]
+        assert [s["data_points"] for s in statistics] == [3]
+
+    def test_cache_entries_keyed_by_version(self, tmp_path):
+        from datetime import date
+        from app.core.day_cache import DayStatsCache
+
+        device_id = uuid.uuid4()
+        day = date(2026, 1, 1)
+        path = str(tmp_path / "daily_stats.db")
+
+        cache = DayStatsCache(maxsize=10, path=path)
+        cache.set_many(device_id, {day: None}, version=1)
+        assert cache.get_many(device_id, [day], version=1) == {day: None}
+        assert cache.get_many(device_id, [day], version=2) == {}
+
+        # Versi baru menggantikan baris versi lama di file persistence
+        cache.set_many(device_id, {day: {"data_points": 3}}, version=2)
+        assert DayStatsCache(maxsize=10, path=path).get_many(device_id, [day], version=1) == {}
+
+    def test_persistent_cache_and_lru(self, tmp_path):
+        from datetime import date
+        from app.core.day_cache import DayStatsCache
+
+        device_id = uuid.uuid4()
+        day1, day2 = date(2026, 1, 1), date(2026, 1, 2)
+        path = str(tmp_path / "daily_stats.db")
+
+        cache = DayStatsCache(maxsize=1, path=path)
+        cache.set_many(device_id, {day1: {"data_points": 5}, day2: None})
+        assert len(cache) == 1  # LRU: hanya entry terakhir yang tersisa di memory
+
+        # Instance baru (mis. setelah restart) membaca dari file persistence
+        reloaded = DayStatsCache(maxsize=10, path=path)
+        assert reloaded.get_many(device_id, [day1, day2, date(2026, 1, 3)]) == {day1: {"data_points": 5}, day2: None}
+
+        reloaded.invalidate_device(device_id)
+        assert DayStatsCache(maxsize=10, path=path).get_many(device_id, [day1, day2]) == {}
+
+
+class TestAggregate:
+    """Test suite untuk endpoint GET /devices/{device_id}/aggregate"""
+
+    def _add_series(self, db_session, device, start, count, step_minutes=10):
+        from app.models.device import SensorLog
+
+        logs = []
+        for i in range(count):
+            log = SensorLog(
+                device_id=device.id,
+                temperature=20.0 + (i * 7) % 13,
+                humidity=60.0 + i % 5,
+                ammonia=None if i % 4 == 0 else 3.0 + i % 3,
+                is_alert=False,
+                timestamp=start + timedelta(minutes=i * step_minutes),
+            )
+            db_session.add(log)
+            logs.append(log)
+        db_session.commit()
+        return logs
+
+    def _url(self, device, **params):
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        return f"/api/devices/{device.id}/aggregate?{query}"
+
+    def test_hourly_source(self, client, db_session, admin_headers, test_device_claimed):
+        import numpy as np
+
+        start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+        logs = self._add_series(db_session, test_device_claimed, start, 18)  # 3 jam
+
+        response = client.get(
+            self._url(test_device_claimed, **{"from": "2026-03-02T08:00:00Z", "to": "2026-03-02T11:00:00Z"},
+                      bucket="1h", aggs="avg,min,max,count"),
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["source"] == "hourly"
+        assert len(data["t"]) == 3
+        assert data["t"][0] == int(start.timestamp() * 1000)
+
+        first_hour = [log.temperature for log in logs[:6]]
+        assert data["series"]["temperature"]["avg"][0] == round(float(np.mean(first_hour)), 4)
+        assert data["series"]["temperature"]["min"][0] == min(first_hour)
+        assert data["series"]["ammonia"]["count"] == [4, 5, 4]
+
+    def test_daily_and_raw_sources_agree(self, client, db_session, admin_headers, test_device_claimed):
+        start = datetime(2026, 3, 2, 20, 0, tzinfo=timezone.utc)
+        self._add_series(db_session, test_device_claimed, start, 60)  # melewati tengah malam
+        window = {"from": "2026-03-02T00:00:00Z", "to": "2026-03-04T00:00:00Z", "bucket": "1d"}
+
+        daily = client.get(self._url(test_device_claimed, aggs="avg,min,max,count", **window), headers=admin_headers).json()
+        raw = client.get(self._url(test_device_claimed, aggs="avg,min,max,count,p50", **window), headers=admin_headers).json()
+        assert daily["source"] == "daily"
+        assert raw["source"] == "raw"
+        assert daily["t"] == raw["t"]
+        for metric in ("temperature", "humidity", "ammonia"):
+            for agg in ("avg", "min", "max", "count"):
+                assert daily["series"][metric][agg] == raw["series"][metric][agg]
+
+    def test_sub_hour_bucket_uses_raw(self, client, db_session, admin_headers, test_device_claimed):
+        start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+        self._add_series(db_session, test_device_claimed, start, 6)
+        response = client.get(
+            self._url(test_device_claimed, **{"from": "2026-03-02T08:00:00Z", "to": "2026-03-02T09:00:00Z"},
+                      bucket="15m", metrics="temperature", aggs="count"),
+            headers=admin_headers,
+        )
+        data = response.json()
+        assert data["source"] == "raw"
+        assert data["series"]["temperature"]["count"] == [2, 1, 2, 1]
+        assert list(data["series"]) == ["temperature"]
+
+    def test_invalid_parameters(self, client, admin_headers, test_device_claimed):
+        for params in ({"bucket": "7m"}, {"metrics": "pressure"}, {"aggs": "median"}, {"aggs": "p100"}):
+            response = client.get(self._url(test_device_claimed, **params), headers=admin_headers)
+            assert response.status_code == 400, params
+
+        too_many = client.get(
+            self._url(test_device_claimed, **{"from": "2026-01-01T00:00:00Z", "to": "2026-03-01T00:00:00Z"}, bucket="5m"),
+            headers=admin_headers,
+        )
+        assert too_many.status_code == 400
+
+    def test_no_access(self, client, auth_headers, test_device_claimed):
+        response = client.get(self._url(test_device_claimed, bucket="1h"), headers=auth_headers)
+        assert response.status_code == 403
+
+    def test_aggregate_buckets_vectorized(self):
+        import numpy as np
+        from app.core.aggregate import aggregate_buckets, bucket_start, raw_partials
+
+        rng = np.random.default_rng(7)
+        epoch_s = np.sort(rng.integers(0, 10 * 3600, size=500))
+        values = rng.normal(25, 3, size=500)
+        values[::11] = np.nan
+
+        result = aggregate_buckets(epoch_s, "1h", {"temperature": raw_partials(values)}, ["p90", "avg"])
+        for i, t in enumerate(result["t"]):
+            in_bucket = values[(epoch_s // 3600 * 3600 * 1000) == t]
+            in_bucket = in_bucket[~np.isnan(in_bucket)]
+            assert result["series"]["temperature"]["p90"][i] == round(float(np.percentile(in_bucket, 90)), 4)
+            assert result["series"]["temperature"]["avg"][i] == round(float(in_bucket.mean()), 4)
+
+        # Minggu mulai Senin, bulan mulai tanggal 1 (UTC)
+        wednesday = int(datetime(2026, 3, 4, 15, tzinfo=timezone.utc).timestamp())
+        assert bucket_start([wednesday], "1w")[0] == int(datetime(2026, 3, 2, tzinfo=timezone.utc).timestamp())
+        assert bucket_start([wednesday], "1mo")[0] == int(datetime(2026, 3, 1, tzinfo=timezone.utc).timestamp())
+
+    def test_msgpack_format(self, client, db_session, admin_headers, test_device_claimed):
+        import msgpack
+
+        start = datetime(2026, 3, 2, 8, 0, tzinfo=timezone.utc)
+        self._add_series(db_session, test_device_claimed, start, 18)
+        url = self._url(test_device_claimed, **{"from": "2026-03-02T08:00:00Z", "to": "2026-03-02T11:00:00Z"}, bucket="1h")
+
+        expected = client.get(url, headers=admin_headers).json()
+        response = client.get(url + "&format=msgpack", headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/msgpack"
+        assert msgpack.unpackb(response.content) == expected
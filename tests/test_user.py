@@ -77,6 +77,50 @@ class TestUserRoleInResponse:
         assert response.json()["role"] == "viewer"
 
 
+class TestPrincipalCache:
+    """get_current_user memakai principal cache; User lengkap hanya di-load jika dibutuhkan"""
+
+    @staticmethod
+    def _count_user_queries(db_session, call):
+        from sqlalchemy import event
+
+        statements = []
+
+        def listener(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db_session.get_bind()
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            call()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        return sum(1 for statement in statements if "FROM users" in statement)
+
+    def test_repeated_requests_skip_user_query(self, client, admin_headers, db_session):
+        assert client.get("/api/devices/", headers=admin_headers).status_code == 200
+        queries = self._count_user_queries(
+            db_session, lambda: client.get("/api/devices/", headers=admin_headers)
+        )
+        assert queries == 0
+
+    def test_profile_loads_full_user_lazily(self, client, auth_headers, test_user):
+        response = client.get("/api/users/me", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["full_name"] == test_user.full_name
+
+    def test_role_change_invalidates_principal(self, client, admin_headers, auth_headers, test_user):
+        assert client.get("/api/users/me", headers=auth_headers).json()["role"] == "user"
+        response = client.patch(f"/api/users/{test_user.id}/role", json={"role": "viewer"}, headers=admin_headers)
+        assert response.status_code == 200
+        assert client.get("/api/users/me", headers=auth_headers).json()["role"] == "viewer"
+
+    def test_deleted_user_is_rejected(self, client, auth_headers):
+        assert client.get("/api/users/me", headers=auth_headers).status_code == 200
+        assert client.delete("/api/users/me", headers=auth_headers).status_code == 200
+        assert client.get("/api/users/me", headers=auth_headers).status_code == 401
+
+
 class TestUpdateUserRole:
     """Test suite untuk PATCH /api/users/{id}/role — role hierarchy"""
 
@@ -283,6 +327,19 @@ class TestCleanupLogs:
         assert response.status_code == 200
         assert "deleted_count" in response.json()
 
+    def test_cleanup_decrements_device_log_counters(
+        self, client, db_session, super_admin_headers, test_device_claimed, test_sensor_logs, test_sensor_logs_old
+    ):
+        """Counter log/alert device ikut berkurang sebanyak log yang dihapus"""
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.log_count == 9
+        response = client.post("/api/admin/cleanup-logs?days=90", headers=super_admin_headers)
+        assert response.json()["deleted_count"] == 3
+
+        db_session.refresh(test_device_claimed)
+        assert test_device_claimed.log_count == 6
+        assert test_device_claimed.alert_count == 1
+
     def test_admin_cannot_cleanup(self, client, admin_headers):
         """Admin biasa tidak bisa cleanup"""
         response = client.post(
@@ -313,6 +370,133 @@ class TestCleanupLogs:
         assert response.status_code == 401
 
 
+class TestSensorLogPartitions:
+    """Test suite untuk retention via partisi bulanan sensor_logs (app/core/partitions.py)"""
+
+    def test_partition_ddl_month_bounds(self):
+        from datetime import date
+        from app.core.partitions import create_partition_sql, partition_name
+
+        assert partition_name(date(2026, 12, 1)) == "sensor_logs_2026_12"
+        ddl = create_partition_sql(date(2026, 12, 1))
+        assert "PARTITION OF sensor_logs" in ddl
+        assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in ddl
+
+    def test_noop_without_partitioning(self, db_session):
+        from app.core.partitions import ensure_partitions, is_partitioned
+
+        assert is_partitioned(db_session) is False
+        assert ensure_partitions(db_session) == []
+
+    class FakeSession:
+        """Session palsu yang mencatat SQL; has_default / default_rows mengatur jawaban query."""
+
+        def __init__(self, has_default=False, default_rows=False):
+            self.statements = []
+            self.has_default = has_default
+            self.default_rows = default_rows
+            self.rowcount = 5
+
+        def execute(self, statement, params=None):
+            self.statements.append(str(statement))
+            return self
+
+        def all(self):
+            return [(uuid.uuid4(), 10, 2)] if "GROUP BY" in self.statements[-1] else []
+
+        def scalar(self):
+            if "to_regclass" in self.statements[-1]:
+                return self.has_default
+            return self.default_rows
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+    def test_drop_only_fully_expired_months(self, monkeypatch):
+        from datetime import date, datetime, timezone
+        import app.core.partitions as partitions
+
+        monkeypatch.setattr(
+            partitions, "list_partitions",
+            lambda db: [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)],
+        )
+        db = self.FakeSession()
+        result = partitions.drop_expired_partitions(db, datetime(2026, 3, 10, tzinfo=timezone.utc), detach_only=False)
+        assert result == {"partitions": ["sensor_logs_2026_01", "sensor_logs_2026_02"], "deleted_count": 20}
+        assert "ALTER TABLE sensor_logs DETACH PARTITION sensor_logs_2026_02" in db.statements
+        assert "DROP TABLE sensor_logs_2026_02" in db.statements
+
+        db = self.FakeSession()
+        partitions.drop_expired_partitions(db, datetime(2026, 3, 10, tzinfo=timezone.utc), detach_only=True)
+        assert not any(statement.startswith("DROP TABLE") for statement in db.statements)
+
+    def test_counts_read_after_detach(self, monkeypatch):
+        from datetime import date, datetime, timezone
+        import app.core.partitions as partitions
+
+        monkeypatch.setattr(partitions, "list_partitions", lambda db: [date(2026, 1, 1)])
+        db = self.FakeSession()
+        partitions.drop_expired_partitions(db, datetime(2026, 3, 10, tzinfo=timezone.utc))
+        detach = db.statements.index("ALTER TABLE sensor_logs DETACH PARTITION sensor_logs_2026_01")
+        count = next(i for i, statement in enumerate(db.statements) if "FROM sensor_logs_2026_01 GROUP BY" in statement)
+        assert detach < count
+
+    def test_retention_prunes_default_partition(self, monkeypatch):
+        from datetime import datetime, timezone
+        import app.core.partitions as partitions
+
+        monkeypatch.setattr(partitions, "list_partitions", lambda db: [])
+        db = self.FakeSession(has_default=True)
+        result = partitions.drop_expired_partitions(db, datetime(2026, 3, 10, tzinfo=timezone.utc))
+        assert result == {"partitions": [], "deleted_count": 10}
+        assert any(statement.startswith("WITH deleted AS (DELETE FROM sensor_logs_default") for statement in db.statements)
+        assert any(statement.startswith("UPDATE devices SET log_count") for statement in db.statements)
+
+    def test_ensure_moves_rows_out_of_default_partition(self, monkeypatch):
+        from datetime import datetime, timezone
+        import app.core.partitions as partitions
+
+        current = partitions.month_start(datetime.now(timezone.utc))
+        monkeypatch.setattr(partitions, "is_partitioned", lambda db: True)
+        monkeypatch.setattr(partitions, "list_partitions", lambda db: [])
+
+        db = self.FakeSession(has_default=True, default_rows=True)
+        assert partitions.ensure_partitions(db, months_ahead=0) == [partitions.partition_name(current)]
+        name = partitions.partition_name(current)
+        assert db.statements[-4:] == [
+            "LOCK TABLE sensor_logs_default IN EXCLUSIVE MODE",
+            f"CREATE TABLE {name} (LIKE sensor_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)",
+            db.statements[-2],
+            f"ALTER TABLE sensor_logs ATTACH PARTITION {name} FOR VALUES {partitions._bounds(current)}",
+        ]
+        assert db.statements[-2].startswith("WITH moved AS (DELETE FROM sensor_logs_default")
+
+        # Default partition kosong untuk bulan itu → CREATE ... PARTITION OF biasa
+        db = self.FakeSession(has_default=True, default_rows=False)
+        partitions.ensure_partitions(db, months_ahead=0)
+        assert db.statements[-1] == partitions.create_partition_sql(current)
+        assert not any(statement.startswith("LOCK TABLE") for statement in db.statements)
+
+    def test_cleanup_uses_partition_drop(self, client, super_admin_headers, monkeypatch):
+        import app.routers.admin as admin_router
+
+        calls = []
+        monkeypatch.setattr(admin_router, "is_partitioned", lambda db: True)
+        monkeypatch.setattr(
+            admin_router, "drop_expired_partitions",
+            lambda db, cutoff: calls.append(cutoff) or {"partitions": ["sensor_logs_2025_01"], "deleted_count": 42},
+        )
+        response = client.post("/api/admin/cleanup-logs?days=30", headers=super_admin_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["deleted_count"] == 42
+        assert data["partitions"] == ["sensor_logs_2025_01"]
+        assert len(calls) == 1
+
+
 class TestHealthCheck:
     """Test suite untuk GET /api/health"""
 
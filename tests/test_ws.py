@@ -0,0 +1,485 @@
+"""
+Unit tests untuk WebSocket streaming (/api/ws/...).
+"""
+
+import uuid
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from tests.conftest import _create_token
+
+
+class TestMultiplexStream:
+    """Test suite untuk WS /api/ws/devices — banyak device dalam satu socket"""
+
+    def test_invalid_token_closed(self, client):
+        with client.websocket_connect("/api/ws/devices?token=ngaco") as ws:
+            with pytest.raises(WebSocketDisconnect) as exc:
+                ws.receive_json()
+        assert exc.value.code == 4001
+
+    def test_subscribe_tags_events_with_device_id(
+        self, client, test_admin_user, test_device_claimed, test_sensor_logs, test_device_other_user
+    ):
+        """Device milik sendiri di-grant, device orang lain ditolak, event ditandai device_id"""
+        token = _create_token(test_admin_user)
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_json({
+                "action": "subscribe",
+                "device_ids": [str(test_device_claimed.id), str(test_device_other_user.id), "bukan-uuid"],
+            })
+            ack = ws.receive_json()
+            assert ack["type"] == "subscribed"
+            assert ack["device_ids"] == [str(test_device_claimed.id)]
+            assert str(test_device_other_user.id) in ack["denied"]
+            assert "bukan-uuid" in ack["denied"]
+
+            data = ws.receive_json()
+            assert data["type"] == "sensor_data"
+            assert data["device_id"] == str(test_device_claimed.id)
+            assert data["latest"]["id"] == test_sensor_logs[-1].id
+
+    def test_operator_subscribe_assigned_only(
+        self, client, test_operator, test_device_claimed, test_operator_assignment, test_device_unclaimed
+    ):
+        token = _create_token(test_operator)
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_json({
+                "action": "subscribe",
+                "device_ids": [str(test_device_claimed.id), str(test_device_unclaimed.id)],
+            })
+            ack = ws.receive_json()
+            assert ack["device_ids"] == [str(test_device_claimed.id)]
+            assert ack["denied"] == [str(test_device_unclaimed.id)]
+
+    def test_unsubscribe(self, client, test_admin_user, test_device_claimed_no_logs):
+        token = _create_token(test_admin_user)
+        device_id = str(test_device_claimed_no_logs.id)
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_json({"action": "subscribe", "device_ids": [device_id]})
+            assert ws.receive_json()["device_ids"] == [device_id]
+
+            ws.send_json({"action": "unsubscribe", "device_ids": [device_id, str(uuid.uuid4())]})
+            ack = ws.receive_json()
+            assert ack["type"] == "unsubscribed"
+            assert ack["device_ids"] == [device_id]
+
+    def test_unknown_action(self, client, test_admin_user):
+        token = _create_token(test_admin_user)
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_text("bukan json")
+            assert ws.receive_json()["type"] == "error"
+            ws.send_json({"action": "dance"})
+            assert ws.receive_json()["type"] == "error"
+
+
+class TestDeviceStreamResume:
+    """Test suite untuk resume WS /api/ws/devices/{id}?since_id=... / since_ts=..."""
+
+    def test_replay_since_id(self, client, test_admin_user, test_device_claimed, test_sensor_logs):
+        """Reading setelah since_id di-replay berurutan, lalu reading terbaru tidak dikirim ulang"""
+        token = _create_token(test_admin_user)
+        since = test_sensor_logs[2].id
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&since_id={since}"
+        with client.websocket_connect(url) as ws:
+            replay = ws.receive_json()
+        assert replay["type"] == "replay"
+        assert replay["device_id"] == str(test_device_claimed.id)
+        assert replay["truncated"] is False
+        assert [r["id"] for r in replay["readings"]] == [log.id for log in test_sensor_logs[3:]]
+
+    def test_replay_since_ts(self, client, test_admin_user, test_device_claimed, test_sensor_logs_old, test_sensor_logs):
+        """since_ts hanya me-replay reading yang lebih baru dari timestamp tersebut"""
+        from datetime import datetime, timezone, timedelta
+
+        token = _create_token(test_admin_user)
+        since = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&since_ts={since}"
+        with client.websocket_connect(url) as ws:
+            replay = ws.receive_json()
+        ids = [r["id"] for r in replay["readings"]]
+        assert ids == [log.id for log in test_sensor_logs]
+
+    def test_replay_truncated_keeps_newest(self, client, test_admin_user, test_device_claimed, test_sensor_logs, monkeypatch):
+        import app.routers.ws as ws_module
+
+        monkeypatch.setattr(ws_module, "WS_REPLAY_MAX_READINGS", 2)
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&since_id=0"
+        with client.websocket_connect(url) as ws:
+            replay = ws.receive_json()
+        assert replay["truncated"] is True
+        assert [r["id"] for r in replay["readings"]] == [log.id for log in test_sensor_logs[-2:]]
+
+    def test_no_resume_sends_latest(self, client, test_admin_user, test_device_claimed, test_sensor_logs):
+        token = _create_token(test_admin_user)
+        with client.websocket_connect(f"/api/ws/devices/{test_device_claimed.id}?token={token}") as ws:
+            data = ws.receive_json()
+        assert data["type"] == "sensor_data"
+        assert data["latest"]["id"] == test_sensor_logs[-1].id
+
+
+class TestDeviceStreamPrefill:
+    """Test suite untuk snapshot awal WS /api/ws/devices/{id}?prefill=..."""
+
+    def _add_logs(self, db_session, device, count, minutes_apart=1):
+        from datetime import datetime, timezone, timedelta
+        from app.models.device import SensorLog
+
+        now = datetime.now(timezone.utc)
+        logs = []
+        for i in range(count):
+            log = SensorLog(
+                device_id=device.id,
+                temperature=20.0 + i,
+                humidity=60.0,
+                ammonia=5.0,
+                is_alert=(i == 1),
+                alert_message="Suhu Terlalu Dingin!" if i == 1 else None,
+                timestamp=now - timedelta(minutes=(count - i) * minutes_apart),
+            )
+            db_session.add(log)
+            logs.append(log)
+        db_session.commit()
+        return logs
+
+    def test_snapshot_downsampled(self, client, db_session, test_admin_user, test_device_claimed):
+        logs = self._add_logs(db_session, test_device_claimed, 10)
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&prefill=3600&prefill_points=5"
+        with client.websocket_connect(url) as ws:
+            snapshot = ws.receive_json()
+            live = ws.receive_json()
+
+        assert snapshot["type"] == "snapshot"
+        assert snapshot["raw_points"] == 10
+        readings = snapshot["readings"]
+        assert len(readings["timestamp"]) <= 5
+        assert sum(readings["samples"]) == 10
+        assert readings["id"][-1] == logs[-1].id
+        assert any(readings["is_alert"])
+        # Live frame tetap dikirim dengan reading exact terbaru
+        assert live["type"] == "sensor_data"
+        assert live["latest"]["id"] == logs[-1].id
+
+    def test_snapshot_window_excludes_old(self, client, db_session, test_admin_user, test_device_claimed, test_sensor_logs_old):
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&prefill=3600"
+        with client.websocket_connect(url) as ws:
+            snapshot = ws.receive_json()
+        assert snapshot["raw_points"] == 0
+        assert snapshot["readings"]["id"] == []
+
+
+class TestStreamThrottle:
+    """Unit tests untuk StreamThrottle (min_interval / deadband per subscriber)"""
+
+    @staticmethod
+    def _payload(temp, is_alert=False, is_online=True, log_id=1):
+        return {
+            "type": "sensor_data",
+            "is_online": is_online,
+            "latest": {
+                "id": log_id, "temperature": temp, "humidity": 70.0, "ammonia": 5.0,
+                "light_level": 1, "is_alert": is_alert,
+            },
+        }
+
+    def _throttle(self, **kwargs):
+        from app.core.ws_throttle import StreamThrottle
+
+        self.now = 0.0
+        return StreamThrottle(clock=lambda: self.now, **kwargs)
+
+    def test_disabled_passes_everything(self):
+        throttle = self._throttle()
+        for i in range(3):
+            throttle.offer(self._payload(25.0 + i))
+            assert throttle.take() is not None
+
+    def test_min_interval_merges_to_latest(self):
+        throttle = self._throttle(min_interval=10)
+        throttle.offer(self._payload(25.0, log_id=1))
+        assert throttle.take()["latest"]["id"] == 1
+
+        self.now = 3
+        throttle.offer(self._payload(26.0, log_id=2))
+        assert throttle.take() is None
+        self.now = 6
+        throttle.offer(self._payload(27.0, log_id=3))
+        assert throttle.take() is None
+
+        self.now = 10
+        sent = throttle.take()
+        assert sent["latest"]["id"] == 3  # Hanya state terbaru yang dikirim
+        assert throttle.suppressed == 1
+
+    def test_deadband_compares_to_last_sent(self):
+        throttle = self._throttle(deadband=1.0)
+        throttle.offer(self._payload(25.0))
+        assert throttle.take() is not None
+
+        throttle.offer(self._payload(25.5))
+        assert throttle.take() is None
+        # Drift terakumulasi terhadap nilai terakhir yang DIKIRIM
+        throttle.offer(self._payload(26.0))
+        assert throttle.take()["latest"]["temperature"] == 26.0
+
+    def test_alert_and_status_bypass_throttle(self):
+        throttle = self._throttle(min_interval=60, deadband=5.0)
+        throttle.offer(self._payload(25.0))
+        assert throttle.take() is not None
+
+        throttle.offer(self._payload(25.1, is_alert=True))
+        assert throttle.take() is not None
+        throttle.offer(self._payload(25.1, is_alert=False, is_online=False))
+        assert throttle.take() is not None
+
+
+class TestMsgpackFrames:
+    """Test suite untuk encoding=msgpack (binary frame + delta per field)"""
+
+    def test_stream_sends_full_msgpack_frame(self, client, test_admin_user, test_device_claimed, test_sensor_logs):
+        import msgpack
+
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}&encoding=msgpack"
+        with client.websocket_connect(url) as ws:
+            frame = msgpack.unpackb(ws.receive_bytes())
+        assert frame["type"] == "sensor_data"
+        assert frame["full"] is True
+        assert frame["device_name"] == test_device_claimed.name
+        assert frame["latest"]["id"] == test_sensor_logs[-1].id
+
+    def test_encoder_sends_only_changed_fields(self):
+        from app.core.ws_codec import FrameEncoder
+
+        encoder = FrameEncoder("msgpack")
+        base = {
+            "type": "sensor_data", "device_id": "d1", "device_name": "Kandang", "is_online": True,
+            "subscribers": 1,
+            "latest": {"id": 1, "temperature": 25.0, "humidity": 70.0, "timestamp": "t1"},
+        }
+        assert encoder.encode(base)["full"] is True
+
+        second = {**base, "latest": {"id": 2, "temperature": 25.0, "humidity": 71.0, "timestamp": "t2"}}
+        delta = encoder.encode(second)
+        assert delta == {
+            "type": "sensor_data", "device_id": "d1", "full": False,
+            "latest": {"id": 2, "humidity": 71.0, "timestamp": "t2"},
+        }
+
+        # Setelah forget (unsubscribe), frame berikutnya kembali full
+        encoder.forget("d1")
+        assert encoder.encode(second)["full"] is True
+
+    def test_encoder_sends_full_frame_when_fields_disappear(self):
+        from app.core.ws_codec import FrameEncoder
+
+        encoder = FrameEncoder("msgpack")
+        base = {
+            "type": "sensor_data", "device_id": "d1", "device_name": "Kandang", "is_online": True,
+            "latest": {"id": 1, "temperature": 25.0, "alert_message": "Panas"},
+        }
+        encoder.encode(base)
+
+        # Key di latest hilang → delta tidak bisa menghapusnya, kirim full
+        no_alert = {**base, "latest": {"id": 2, "temperature": 25.0}}
+        assert encoder.encode(no_alert) == {**no_alert, "full": True}
+
+        # latest menjadi None → full
+        no_latest = {**base, "latest": None}
+        assert encoder.encode(no_latest) == {**no_latest, "full": True}
+
+        # Top-level key hilang → full
+        without_name = {key: value for key, value in no_latest.items() if key != "device_name"}
+        assert encoder.encode(without_name) == {**without_name, "full": True}
+
+        # latest kembali ada dari None → full (client tidak punya dict untuk di-merge)
+        assert encoder.encode({**without_name, "latest": {"id": 3}})["full"] is True
+
+    def test_invalid_encoding_rejected(self, client, test_admin_user, test_device_claimed):
+        token = _create_token(test_admin_user)
+        with pytest.raises(WebSocketDisconnect):
+            with client.websocket_connect(f"/api/ws/devices/{test_device_claimed.id}?token={token}&encoding=xml") as ws:
+                ws.receive_json()
+
+
+class TestHandshakeCache:
+    """Test suite untuk cache principal/akses pada handshake WebSocket"""
+
+    def test_reconnect_reuses_cached_principal_and_access(
+        self, client, test_admin_user, test_device_claimed, test_sensor_logs
+    ):
+        from app.core.auth_cache import principal_cache, device_acl_cache
+
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}"
+        for _ in range(2):
+            with client.websocket_connect(url) as ws:
+                assert ws.receive_json()["type"] == "sensor_data"
+        assert principal_cache.hits >= 1
+        assert device_acl_cache.hits >= 1
+
+    def test_rename_refreshes_cached_device_name(
+        self, client, admin_headers, test_admin_user, test_device_claimed, test_sensor_logs
+    ):
+        token = _create_token(test_admin_user)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}"
+        with client.websocket_connect(url) as ws:
+            assert ws.receive_json()["device_name"] == "Kandang Ayam Utama"
+
+        response = client.patch(f"/api/devices/{test_device_claimed.id}", json={"name": "Kandang Timur"}, headers=admin_headers)
+        assert response.status_code == 200
+
+        with client.websocket_connect(url) as ws:
+            assert ws.receive_json()["device_name"] == "Kandang Timur"
+
+    def test_unassign_invalidates_cached_access(
+        self, client, admin_headers, test_operator, test_device_claimed, test_operator_assignment, test_sensor_logs
+    ):
+        token = _create_token(test_operator)
+        url = f"/api/ws/devices/{test_device_claimed.id}?token={token}"
+        with client.websocket_connect(url) as ws:
+            assert ws.receive_json()["type"] == "sensor_data"
+
+        response = client.delete(
+            f"/api/devices/{test_device_claimed.id}/assign/{test_operator.id}", headers=admin_headers
+        )
+        assert response.status_code == 200
+
+        with client.websocket_connect(url) as ws:
+            with pytest.raises(WebSocketDisconnect) as exc:
+                ws.receive_json()
+        assert exc.value.code == 4003
+
+    def test_claim_grants_subscription_despite_cached_denial(
+        self, client, admin_headers, test_admin_user, test_device_unclaimed
+    ):
+        """REST dan WebSocket memakai peta akses yang sama: claim langsung berlaku untuk subscribe"""
+        token = _create_token(test_admin_user)
+        device_id = str(test_device_unclaimed.id)
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_json({"action": "subscribe", "device_ids": [device_id]})
+            assert ws.receive_json()["denied"] == [device_id]
+
+        response = client.post(
+            "/api/devices/claim",
+            json={"mac_address": test_device_unclaimed.mac_address, "name": "Kandang Baru"},
+            headers=admin_headers,
+        )
+        assert response.status_code == 200
+
+        with client.websocket_connect(f"/api/ws/devices?token={token}") as ws:
+            ws.send_json({"action": "subscribe", "device_ids": [device_id]})
+            assert ws.receive_json()["device_ids"] == [device_id]
+
+
+class TestLiveness:
+    """Test suite untuk ping/pong dan reaping di ConnectionManager"""
+
+    class _FakeSocket:
+        def __init__(self, fail_send=False):
+            self.sent = []
+            self.closed_with = None
+            self.fail_send = fail_send
+
+        async def send(self, message):
+            if self.fail_send:
+                raise RuntimeError("socket mati")
+            self.sent.append(message)
+
+        async def close(self, code, reason=""):
+            self.closed_with = code
+
+    def _manager(self):
+        from app.core.ws_manager import ConnectionManager
+
+        now = [1000.0]
+        return ConnectionManager(clock=lambda: now[0]), now
+
+    def test_ping_sent_and_silent_pong_client_reaped(self):
+        import asyncio
+        from app.core.ws_manager import WS_CLOSE_PING_TIMEOUT
+
+        manager, now = self._manager()
+        ws = self._FakeSocket()
+        manager.register("dev-1", ws)
+        manager.track(ws, uuid.uuid4(), ws.send)
+
+        assert asyncio.run(manager.ping_and_reap(interval=30, grace=10)) == 0
+        assert ws.sent[-1]["type"] == "ping"
+
+        manager.touch(ws, pong=True)
+        now[0] += 41
+        assert asyncio.run(manager.ping_and_reap(interval=30, grace=10)) == 1
+        assert ws.closed_with == WS_CLOSE_PING_TIMEOUT
+        assert manager.get_subscriber_count("dev-1") == 0
+        assert manager.stats()["reaped_total"] == 1
+        assert manager.stats()["connections"] == 0
+
+    def test_legacy_client_kept_until_send_fails(self):
+        import asyncio
+
+        manager, now = self._manager()
+        legacy, dead = self._FakeSocket(), self._FakeSocket(fail_send=True)
+        manager.track(legacy, uuid.uuid4(), legacy.send)
+        manager.track(dead, uuid.uuid4(), dead.send)
+
+        now[0] += 3600
+        assert asyncio.run(manager.ping_and_reap(interval=30, grace=10)) == 1
+        assert legacy.closed_with is None
+        assert dead not in manager.connections
+        stats = manager.stats()
+        assert stats["connections"] == 1
+        assert stats["oldest_age_seconds"] == 3600.0
+
+    def test_ws_stats_requires_admin(self, client, admin_headers, viewer_headers):
+        assert client.get("/api/admin/ws/stats", headers=viewer_headers).status_code == 403
+        response = client.get("/api/admin/ws/stats", headers=admin_headers)
+        assert response.status_code == 200
+        assert {"connections", "oldest_age_seconds", "reaped_total"} <= response.json().keys()
+
+
+class TestAdmissionLimits:
+    """Test suite untuk batas koneksi WebSocket per user dan per process"""
+
+    def test_per_user_and_per_process_limits(self):
+        from app.core.ws_manager import ConnectionManager
+
+        async def send(message):
+            pass
+
+        manager = ConnectionManager(max_per_user=2, max_per_process=3)
+        alice, bob = uuid.uuid4(), uuid.uuid4()
+        sockets = [object() for _ in range(5)]
+
+        assert manager.track(sockets[0], alice, send) is not None
+        assert manager.track(sockets[1], alice, send) is not None
+        assert manager.track(sockets[2], alice, send) is None  # batas per user
+        assert manager.track(sockets[3], bob, send) is not None
+        assert manager.track(sockets[4], bob, send) is None  # batas per process
+
+        manager.untrack(sockets[0])
+        assert manager.track(sockets[2], alice, send) is not None
+
+        stats = manager.stats()
+        assert stats["connections"] == 3
+        assert stats["users"] == 2
+        assert stats["max_connections_per_user_in_use"] == 2
+        assert stats["rejected_total"] == 2
+
+    def test_over_limit_socket_closed_with_4029(
+        self, client, test_admin_user, test_device_claimed, test_sensor_logs, monkeypatch
+    ):
+        from app.core.ws_manager import ws_manager, WS_CLOSE_TOO_MANY_CONNECTIONS
+
+        monkeypatch.setattr(ws_manager, "max_per_user", 1)
+        token = _create_token(test_admin_user)
+        with client.websocket_connect(f"/api/ws/devices/{test_device_claimed.id}?token={token}") as first:
+            assert first.receive_json()["type"] == "sensor_data"
+            with client.websocket_connect(f"/api/ws/devices?token={token}") as second:
+                with pytest.raises(WebSocketDisconnect) as exc:
+                    second.receive_json()
+        assert exc.value.code == WS_CLOSE_TOO_MANY_CONNECTIONS